@@ -1,102 +1,786 @@
+import csv
+import glob
+import hashlib
+import json
+import mmap
+import os
+import re
+import threading
+import weakref
+from bisect import bisect_left
+from collections import Counter
+from dataclasses import dataclass, replace
+from functools import cached_property
+from itertools import repeat
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+import numpy as np
 import pandas as pd
 
-def txt_to_dataframe():
+from colony_bands import DEFAULT_SCHEME, BandScheme, assign_bands, reband
+from colony_cache import invalidate, tag_version
+from colony_geo import GeoIndex, load_geo_index
+from colony_spatial import SpatialIndex
 
-    #CREATING DATAFRAME FROM TXT FILE CONTAINING LIST OF ANCIENT GREEK CITIES
-    #Creating single column dataframe with all data within text file
-    file='GR03-Ancient Greek Cities Before Hellenistic Period 20200131.txt'
-    raw_df=pd.read_csv(file,sep='^',header=None)
-    raw_df.columns=['Raw Data']
-    #print(raw_df)
+# Source files shipped with the repository
+DATA_FILE='GR03-Ancient Greek Cities Before Hellenistic Period 20200131.txt'
+COUNTRY_MAPPING_FILE='GR03-Country Code Mapping.csv'
+GEO_COORDINATES_FILE='GR03-Selected Capital Geo Coordinates Modified.csv'
+SOURCE_FILES=(DATA_FILE, COUNTRY_MAPPING_FILE, GEO_COORDINATES_FILE)
 
+# Optional per-city coordinates ("City Code,Latitude,Longitude"); cities
+# missing from it are placed at their modern country's capital
+CITY_COORDINATES_FILE=os.getenv('COLONY_CITY_COORDINATES', 'GR03-City Geo Coordinates.csv')
 
-    #Create a list of out dataframe
-    raw_df_list=raw_df['Raw Data'].tolist()
+# Parsed tables are cached on disk; bump CACHE_FORMAT_VERSION whenever the
+# layout of the cached tables changes so stale caches are ignored
+CACHE_DIR=os.getenv('COLONY_CACHE_DIR', '.colony_cache')
+CACHE_FORMAT_VERSION=3
 
-    #Create new list - each item being city code and name
-    import re
-    city_list = [re.findall(r'[A-Z]+[0-9]+\.\s[A-Za-z]+/?[A-Za-z]*?\s?[A-Za-z]*?',city) for city in raw_df_list]
+# "Modern <Country>" section header, optionally followed by a "* footnote"
+HEADER_PATTERN=re.compile(r'^Modern\s+([^*]+?)\s*(?:\*.*)?$')
 
-    #Creating a flatlist out of city_list
-    import itertools
-    new_city_list= list(itertools.chain(*city_list))
+# City entry such as "TR2. Heraclea Pontica" or "AL1. Lissos/Lissus": a letter
+# code, a number, then a name made of words that are not themselves city codes
+_WORD=r"[^\W\d_][\w'’-]*"
+CITY_PATTERN=re.compile(
+    r'\b([A-Z]+)([0-9]+)\.\s('+_WORD+r'(?:\s*/\s*'+_WORD+r'|\s(?![A-Z]+[0-9]+\.)'+_WORD+r')*)'
+)
 
-    #Creating new dataframe
-    clean_df=pd.DataFrame(new_city_list)
-    clean_df.columns=['City Code and Name']
+# Start of a section header line, matched on raw bytes when planning chunks
+SECTION_PATTERN=re.compile(rb'^Modern\s', re.MULTILINE)
 
+# Target size of one unit of work for parallel ingestion
+DEFAULT_CHUNK_BYTES=8*1024*1024
 
-    #Breaking down string
-    clean_df['City Code']= clean_df['City Code and Name'].str.split('.').str.get(0).str.strip()
-    clean_df['Country Code']= clean_df['City Code and Name'].str.extract('([A-Z]+)',expand=True)
-    clean_df['City Name']= clean_df['City Code and Name'].str.split('.').str.get(1).str.strip()
+# Sidecar file, stored next to a corpus file, holding its section byte offsets
+SECTION_INDEX_SUFFIX='.sections.json'
 
-    # Load csv containing the mapping country code - country name
-    mapping_df=pd.read_csv('GR03-Country Code Mapping.csv')
 
-    #Converting each column into lists
-    country_code= mapping_df['Key'].tolist()
-    country_name= mapping_df['Value'].tolist()
+class CityRecord(NamedTuple):
+    """A single colony parsed from the source text."""
+    code: str
+    country_code: str
+    country: str
+    city: str
 
-    #Converting lists into a dictionary
-    map_dict=dict(zip(country_code,country_name))
 
-    clean_df['Country Name']= clean_df['Country Code'].map(map_dict)
+def load_country_mapping(file: str = COUNTRY_MAPPING_FILE) -> Dict[str, str]:
+    """Return the country code -> country name mapping."""
+    with open(file, newline='', encoding='utf-8') as handle:
+        return {row['Key']: row['Value'] for row in csv.DictReader(handle)}
 
-    return clean_df
 
+def _iter_records(lines: Iterable[str], mapping: Dict[str, str], header: Optional[str] = None) -> Iterator[CityRecord]:
+    """Yield the city records found in ``lines``, starting under ``header``."""
+    for line in lines:
+        header_match=HEADER_PATTERN.match(line)
+        if header_match:
+            header=header_match.group(1)
+            continue
+        for country_code, number, city in CITY_PATTERN.findall(line):
+            yield CityRecord(
+                country_code+number,
+                country_code,
+                mapping.get(country_code, header),
+                city,
+            )
 
-def create_df_for_viz():
-    clean_df=txt_to_dataframe()
 
-    city_count_geo_df=clean_df['Country Name'].value_counts().rename_axis('Country').reset_index(name='No of Cities')
+def iter_cities(file: str = DATA_FILE, mapping: Optional[Dict[str, str]] = None) -> Iterator[CityRecord]:
+    """Stream city records from the colony text file in a single pass.
+
+    The file is read line by line while tracking the current "Modern <Country>"
+    header. The country name comes from the code mapping and falls back to the
+    header text for codes the mapping does not know.
+    """
+    if mapping is None:
+        mapping=load_country_mapping()
+
+    with open(file, encoding='utf-8') as handle:
+        yield from _iter_records(handle, mapping)
 
-    #Importing Geo-Coordinates
-    geo_df=pd.read_csv('GR03-Selected Capital Geo Coordinates Modified.csv')
 
-    #Converting each column into lists
-    country_list= geo_df['CountryName'].tolist()
-    latitude_list= geo_df['CapitalLatitude'].tolist()
-    longitude_list= geo_df['CapitalLongitude'].tolist()
+# Column order of CityRecord fields in the city table
+RECORD_COLUMNS=['City Code', 'Country Code', 'Country Name', 'City Name']
 
-    #Converting lists into a dictionary
-    lat_dict=dict(zip(country_list,latitude_list))
-    long_dict=dict(zip(country_list,longitude_list))
 
+def _finish_city_table(clean_df: pd.DataFrame) -> pd.DataFrame:
+    #Country columns repeat a handful of values across every row; categories
+    #keep corpus order so ties in value_counts() stay in order of appearance
+    for column in ('Country Code', 'Country Name'):
+        clean_df[column]=pd.Categorical(clean_df[column], categories=clean_df[column].dropna().unique())
 
-    #Adding latitude & longitude to city_count_geo_df
-    city_count_geo_df['Latitude']= city_count_geo_df['Country'].map(lat_dict)
-    city_count_geo_df['Longitude']= city_count_geo_df['Country'].map(long_dict)
+    return clean_df[['City Code', 'Country Code', 'City Name', 'Country Name']]
 
-    #Drop the following countries
-    city_count_geo_df=city_count_geo_df[city_count_geo_df.Country != 'Serbia']
 
-    # Create function to assign category based on number of cities
-    def assign_category(row):
-        value=row['No of Cities']
-        if value > 90:
-            category='90+ colonies'
+def _record_columns(records: Iterable[CityRecord]) -> Tuple[List[str], ...]:
+    #One list per RECORD_COLUMNS entry, filled as the records stream past
+    columns=([], [], [], [])
+    for record in records:
+        for column, value in zip(columns, record):
+            column.append(value)
+    return columns
 
-        elif value > 60 and value < 90:
-            category='60 - 90 colonies'
 
-        elif value > 30 and value < 60:
-            category='30 - 60 colonies'
+def _city_table_from_columns(columns: Sequence[List[str]]) -> pd.DataFrame:
+    return _finish_city_table(pd.DataFrame(dict(zip(RECORD_COLUMNS, columns))))
 
-        elif value > 10 and value < 20:
-            category='10 - 20 colonies'
 
+def txt_to_dataframe(file: str = DATA_FILE):
+
+    #CREATING DATAFRAME FROM TXT FILE CONTAINING LIST OF ANCIENT GREEK CITIES
+    #Records are streamed straight from the file into per-column lists, so
+    #neither the text nor a list of record tuples is ever held in memory
+    return _city_table_from_columns(_record_columns(iter_cities(file)))
+
+
+# =============================================================================
+# Parallel ingestion of large or multi-file corpora
+# =============================================================================
+
+class Chunk(NamedTuple):
+    """A byte range of a corpus file and the section header in effect at its start."""
+    file: str
+    start: int
+    end: int
+    header: Optional[str]
+
+
+def _header_at(data: mmap.mmap, offset: int) -> Optional[str]:
+    end=data.find(b'\n', offset)
+    line=data[offset:end if end!=-1 else len(data)].decode('utf-8')
+    header_match=HEADER_PATTERN.match(line)
+    return header_match.group(1) if header_match else None
+
+
+def plan_chunks(file: str, chunk_bytes: int = DEFAULT_CHUNK_BYTES) -> List[Chunk]:
+    """Split ``file`` into chunks of roughly ``chunk_bytes``.
+
+    Chunks end on the first "Modern <Country>" boundary past the target size.
+    A section more than ``chunk_bytes`` long is cut at a line break instead,
+    and the chunk records the header it continues under.
+    """
+    size=os.path.getsize(file)
+    if size==0:
+        return []
+
+    with open(file, 'rb') as handle, mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        boundaries=[match.start() for match in SECTION_PATTERN.finditer(data)]
+        headers=[_header_at(data, offset) for offset in boundaries]
+
+        chunks=[]
+        start=0
+        while start<size:
+            target=start+chunk_bytes
+            if target>=size:
+                end=size
+            else:
+                position=bisect_left(boundaries, target)
+                if position<len(boundaries) and boundaries[position]-target<chunk_bytes:
+                    end=boundaries[position]
+                else:
+                    newline=data.find(b'\n', target)
+                    end=size if newline==-1 else newline+1
+            #Header of the last section that opened before this chunk
+            previous=bisect_left(boundaries, start)-1
+            chunks.append(Chunk(file, start, end, headers[previous] if previous>=0 else None))
+            start=end
+
+    return chunks
+
+
+def _parse_chunk(chunk: Chunk, mapping: Dict[str, str]) -> Tuple[List[str], List[str], List[str], List[str]]:
+    with open(chunk.file, 'rb') as handle:
+        handle.seek(chunk.start)
+        text=handle.read(chunk.end-chunk.start).decode('utf-8')
+
+    return _record_columns(_iter_records(text.splitlines(), mapping, chunk.header))
+
+
+def resolve_sources(sources: Union[str, Sequence[str]]) -> List[str]:
+    """Expand files, directories (their ``*.txt`` files) and glob patterns."""
+    if isinstance(sources, str):
+        sources=[sources]
+
+    files=[]
+    for source in sources:
+        if os.path.isdir(source):
+            files.extend(sorted(glob.glob(os.path.join(source, '*.txt'))))
+        elif any(char in source for char in '*?['):
+            files.extend(sorted(glob.glob(source)))
         else:
-            category='Less than 10 colonies'
+            files.append(source)
+
+    if not files:
+        raise FileNotFoundError(f'No corpus files match {sources!r}')
+    return files
+
+
+def load_corpus(
+    sources: Union[str, Sequence[str]] = DATA_FILE,
+    max_workers: Optional[int] = None,
+    chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+) -> pd.DataFrame:
+    """Parse one or many corpus files into the ``txt_to_dataframe()`` table.
+
+    The files are cut into section-aligned chunks that are parsed across a
+    process pool. Results are merged in file and chunk order, so the table is
+    identical to parsing the files one after another. ``max_workers=1`` (or
+    a corpus that fits in one chunk) parses in-process.
+    """
+    mapping=load_country_mapping()
+    chunks=[chunk for file in resolve_sources(sources) for chunk in plan_chunks(file, chunk_bytes)]
+
+    if max_workers==1 or len(chunks)<=1:
+        parts=[_parse_chunk(chunk, mapping) for chunk in chunks]
+    else:
+        #Imported here so that loading the module does not pull in multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers) as pool:
+            parts=list(pool.map(_parse_chunk, chunks, repeat(mapping)))
+
+    return _city_table_from_columns([
+        [value for part in parts for value in part[position]]
+        for position in range(len(RECORD_COLUMNS))
+    ])
+
+
+# =============================================================================
+# Section index for random access to the source text
+# =============================================================================
+
+def build_section_index(file: str = DATA_FILE, mapping: Optional[Dict[str, str]] = None) -> Dict[str, List[Tuple[int, int]]]:
+    """Scan ``file`` once and map each country to the byte ranges of its sections.
+
+    A range is listed under every country that has at least one city in it.
+    """
+    if mapping is None:
+        mapping=load_country_mapping()
+
+    index={}
+    size=os.path.getsize(file)
+    if size==0:
+        return index
+
+    with open(file, 'rb') as handle, mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        starts=sorted({0, *(match.start() for match in SECTION_PATTERN.finditer(data))})
+        for start, end in zip(starts, starts[1:]+[size]):
+            text=data[start:end].decode('utf-8')
+            header_match=HEADER_PATTERN.match(text.split('\n', 1)[0])
+            header=header_match.group(1) if header_match else None
+            countries={mapping.get(country_code, header) for country_code, _, _ in CITY_PATTERN.findall(text)}
+            for country in countries - {None}:
+                index.setdefault(country, []).append((start, end))
+
+    return index
+
+
+def load_section_index(file: str = DATA_FILE, mapping: Optional[Dict[str, str]] = None) -> Dict[str, List[Tuple[int, int]]]:
+    """Return the section index of ``file``, rebuilding its sidecar when stale."""
+    sidecar=file+SECTION_INDEX_SUFFIX
+    stat=os.stat(file)
+    try:
+        with open(sidecar, encoding='utf-8') as handle:
+            stored=json.load(handle)
+        if stored['size']==stat.st_size and stored['mtime_ns']==stat.st_mtime_ns:
+            return {country: [tuple(span) for span in spans] for country, spans in stored['sections'].items()}
+    except Exception:
+        # Missing or unreadable sidecar: rebuild it below
+        pass
+
+    index=build_section_index(file, mapping)
+    try:
+        with open(sidecar, 'w', encoding='utf-8') as handle:
+            json.dump({'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sections': index}, handle)
+    except OSError:
+        pass
+    return index
+
+
+def read_country_cities(
+    countries: Union[str, Sequence[str]],
+    file: str = DATA_FILE,
+    mapping: Optional[Dict[str, str]] = None,
+) -> pd.DataFrame:
+    """Parse only the sections holding ``countries`` into the ``txt_to_dataframe()`` table.
+
+    The file is memory-mapped and only the indexed byte ranges are decoded,
+    so the cost follows the size of the requested sections, not the corpus.
+    """
+    if isinstance(countries, str):
+        countries=[countries]
+    if mapping is None:
+        mapping=load_country_mapping()
+
+    wanted=set(countries)
+    index=load_section_index(file, mapping)
+    spans=sorted({span for country in wanted for span in index.get(country, [])})
+
+    if not spans:
+        return _city_table_from_columns(_record_columns(()))
+    with open(file, 'rb') as handle, mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        columns=_record_columns(
+            record
+            for start, end in spans
+            for record in _iter_records(data[start:end].decode('utf-8').splitlines(), mapping)
+            if record.country in wanted
+        )
+
+    return _city_table_from_columns(columns)
+
+
+def create_df_for_viz(clean_df: Optional[pd.DataFrame] = None, scheme: BandScheme = DEFAULT_SCHEME):
+    if clean_df is None:
+        clean_df=txt_to_dataframe()
+
+    city_count_geo_df=clean_df['Country Name'].value_counts().rename_axis('Country').reset_index(name='No of Cities')
+    city_count_geo_df=city_count_geo_df[city_count_geo_df['No of Cities']>0]
+    city_count_geo_df['Country']=city_count_geo_df['Country'].astype(object)
+    city_count_geo_df['No of Cities']=city_count_geo_df['No of Cities'].astype('int32')
+
+    return _describe_countries(city_count_geo_df, scheme)
+
+
+def geo_index(file: str = GEO_COORDINATES_FILE) -> GeoIndex:
+    """Return the shared capital-coordinates index, loaded once per file version.
+
+    Countries in the code mapping without coordinates are reported when the
+    index is (re)loaded.
+    """
+    return load_geo_index(file, load_country_mapping().values())
+
+
+def _describe_countries(city_count_geo_df: pd.DataFrame, scheme: BandScheme = DEFAULT_SCHEME) -> pd.DataFrame:
+    #Adds coordinates, band and trace text to a Country / No of Cities table
 
-        return category
+    # Attach capital coordinates; countries without any are left off the map
+    city_count_geo_df, _ = geo_index().join(city_count_geo_df, key='Country')
 
-    # Assign category using function above
-    city_count_geo_df['Category']= city_count_geo_df.apply(assign_category,axis=1)
+    # Assign intensity band in one vectorized pass
+    city_count_geo_df['Category']= assign_bands(city_count_geo_df['No of Cities'],scheme)
 
     # Text to display on Bubble map for each trace
     city_count_geo_df['Trace_Text']= city_count_geo_df.Country+'<br>'+\
      (city_count_geo_df['No of Cities']).astype(str)+' colonies'
 
 
-    return city_count_geo_df
+    return city_count_geo_df.reset_index(drop=True)
+
+
+def load_city_coordinates(file: str = CITY_COORDINATES_FILE) -> pd.DataFrame:
+    """Return the per-city ``City Code, Latitude, Longitude`` table.
+
+    The file is optional: when it does not exist the table is empty.
+    """
+    columns=['City Code', 'Latitude', 'Longitude']
+    if os.path.exists(file):
+        coords_df=pd.read_csv(file, usecols=columns).drop_duplicates('City Code', keep='last')
+    else:
+        coords_df=pd.DataFrame(columns=columns)
+    return coords_df.astype({'City Code': object, 'Latitude': 'float32', 'Longitude': 'float32'})
+
+
+def locate_cities(
+    cities_df: pd.DataFrame,
+    city_coords: Optional[pd.DataFrame] = None,
+    geo: Optional[GeoIndex] = None,
+) -> pd.DataFrame:
+    """Return the city table with a ``Latitude``/``Longitude`` per city.
+
+    Coordinates come from ``city_coords`` (default ``load_city_coordinates()``)
+    and fall back to the country's capital from ``geo`` (default
+    ``geo_index()``); ``Exact`` tells the two apart. Cities with neither are
+    dropped.
+    """
+    if city_coords is None:
+        city_coords=load_city_coordinates()
+    if geo is None:
+        geo=geo_index()
+
+    located_df=cities_df.copy()
+    exact=city_coords.set_index('City Code')
+    positions=exact.index.get_indexer(located_df['City Code'].astype(object))
+    found=positions>=0
+
+    capitals=geo.positions(located_df['Country Name'].astype(object))
+    latitude=np.where(capitals>=0, geo.latitude[capitals], np.nan).astype('float32')
+    longitude=np.where(capitals>=0, geo.longitude[capitals], np.nan).astype('float32')
+    latitude[found]=exact['Latitude'].to_numpy()[positions[found]]
+    longitude[found]=exact['Longitude'].to_numpy()[positions[found]]
+
+    located_df['Latitude']=latitude
+    located_df['Longitude']=longitude
+    located_df['Exact']=found
+    return located_df.dropna(subset=['Latitude', 'Longitude']).reset_index(drop=True)
+
+
+def memory_report(df: pd.DataFrame) -> pd.Series:
+    """Return the bytes used by each column (and the index) of ``df``."""
+    return df.memory_usage(index=True, deep=True).rename('Bytes')
+
+
+def source_fingerprint(files: Tuple[str, ...] = SOURCE_FILES) -> str:
+    """Return a short key identifying the current state of the source files.
+
+    The key combines path, size and modification time of every file, so any
+    edit to the corpus or either CSV produces a new key.
+    """
+    digest=hashlib.sha256(f'v{CACHE_FORMAT_VERSION}'.encode())
+    for file in files:
+        stat=os.stat(file)
+        digest.update(f'{os.path.abspath(file)}|{stat.st_size}|{stat.st_mtime_ns}'.encode())
+    return digest.hexdigest()[:16]
+
+
+def _source_files(sources: Optional[Union[str, Sequence[str]]] = None) -> Tuple[str, ...]:
+    corpus_files=resolve_sources(sources) if sources is not None else [DATA_FILE]
+    return (*corpus_files, COUNTRY_MAPPING_FILE, GEO_COORDINATES_FILE)
+
+
+def _source_set_key(files: Tuple[str, ...]) -> str:
+    #Identifies which files a cache was built from, whatever their contents
+    return hashlib.sha256('|'.join(os.path.abspath(file) for file in files).encode()).hexdigest()[:8]
+
+
+def load_datasets(
+    use_cache: bool = True,
+    sources: Optional[Union[str, Sequence[str]]] = None,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Return ``(create_df_for_viz() table, txt_to_dataframe() table)``.
+
+    Both tables are stored together in one pickle under ``CACHE_DIR`` keyed by
+    ``source_fingerprint()``, so a warm start is a single file read. When a
+    fresh cache is written, older caches of the same source files are
+    removed; caches of other source sets (another process's ``sources``)
+    are left alone.
+    ``sources`` selects other corpus files, directories or globs, which are
+    then ingested with ``load_corpus()``.
+    """
+    cache_file=None
+    if use_cache:
+        files=_source_files(sources)
+        cache_prefix=f'colonies-{_source_set_key(files)}-'
+        cache_file=os.path.join(CACHE_DIR, f'{cache_prefix}{source_fingerprint(files)}.pkl')
+        try:
+            cached=pd.read_pickle(cache_file)
+            return cached['viz'], cached['cities']
+        except Exception:
+            # Missing, unreadable or truncated cache: rebuild it below
+            pass
+
+    cities_df=txt_to_dataframe() if sources is None else load_corpus(sources)
+    viz_df=create_df_for_viz(cities_df)
+
+    if cache_file is not None:
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            tmp_file=f'{cache_file}.{os.getpid()}.tmp'
+            pd.to_pickle({'viz': viz_df, 'cities': cities_df}, tmp_file)
+            os.replace(tmp_file, cache_file)
+            for name in os.listdir(CACHE_DIR):
+                if name.startswith(cache_prefix) and name.endswith('.pkl') and \
+                        os.path.join(CACHE_DIR, name)!=cache_file:
+                    os.remove(os.path.join(CACHE_DIR, name))
+        except OSError:
+            # A read-only checkout still works, it just parses every time
+            pass
+
+    return viz_df, cities_df
+
+
+# =============================================================================
+# Country lookups
+# =============================================================================
+
+class CountryIndex:
+    """Country -> aggregate row and city slice, built once per pair of tables.
+
+    The cities are stably sorted by country, so each country's cities are one
+    contiguous slice (still in corpus order) and every lookup costs the size
+    of its result rather than a scan of either table. Both the
+    ``txt_to_dataframe()`` column names and the "Country"/"City" variants are
+    accepted.
+    """
+
+    def __init__(self, summary_df: pd.DataFrame, cities_df: pd.DataFrame):
+        country_column='Country' if 'Country' in cities_df.columns else 'Country Name'
+        city_column='City' if 'City' in cities_df.columns else 'City Name'
+
+        codes, countries=pd.factorize(cities_df[country_column].astype(object), sort=False)
+        order=np.argsort(codes, kind='stable')
+        ends=np.cumsum(np.bincount(codes[codes>=0], minlength=len(countries)))
+        # Rows without a country sort first; skip them
+        offset=int((codes<0).sum())
+        self._slices={
+            country: (offset+int(end-count), offset+int(end))
+            for country, end, count in zip(countries, ends, np.diff(ends, prepend=0))
+        }
+        self._cities=cities_df[city_column].to_numpy(dtype=object)[order]
+
+        self._summary=summary_df
+        self._rows={country: row for row, country in enumerate(summary_df['Country'])}
+
+    def __contains__(self, country: str) -> bool:
+        return country in self._rows
+
+    def cities(self, country: str) -> List[str]:
+        """City names of ``country`` in corpus order (empty if unknown)."""
+        start, end=self._slices.get(country, (0, 0))
+        return self._cities[start:end].tolist()
+
+    def details(self, country: str, sample: int = 10) -> Optional[Dict[str, object]]:
+        """Summary of one country, or None if it is not in the aggregate table."""
+        return self.details_many([country], sample)[0]
+
+    def details_many(self, countries: Sequence[str], sample: int = 10) -> List[Optional[Dict[str, object]]]:
+        """``details()`` for many countries, reading their rows in one pass."""
+        rows=[self._rows.get(country) for country in countries]
+        found=[row for row in rows if row is not None]
+        records=iter(self._summary.iloc[found][
+            ['No of Cities', 'Category', 'Latitude', 'Longitude']
+        ].itertuples(index=False, name=None))
+
+        details=[]
+        for country, row in zip(countries, rows):
+            if row is None:
+                details.append(None)
+                continue
+            count, category, latitude, longitude=next(records)
+            start, end=self._slices.get(country, (0, 0))
+            details.append({
+                'country': country,
+                'num_colonies': int(count),
+                'category': category,
+                'latitude': float(latitude),
+                'longitude': float(longitude),
+                'cities': self._cities[start:min(end, start+sample)].tolist(),
+                'total_cities': end-start,
+            })
+        return details
+
+
+_country_indexes: Dict[Tuple[int, int], CountryIndex]={}
+_country_indexes_lock=threading.Lock()
+
+
+def country_index(summary_df: pd.DataFrame, cities_df: pd.DataFrame) -> CountryIndex:
+    """Return the ``CountryIndex`` for this pair of tables, built on first use.
+
+    The index lives as long as both tables do; tables are treated as
+    read-only.
+    """
+    key=(id(summary_df), id(cities_df))
+    with _country_indexes_lock:
+        index=_country_indexes.get(key)
+    if index is None:
+        index=CountryIndex(summary_df, cities_df)
+        with _country_indexes_lock:
+            if key not in _country_indexes:
+                _country_indexes[key]=index
+                for table in (summary_df, cities_df):
+                    weakref.finalize(table, _country_indexes.pop, key, None)
+            index=_country_indexes[key]
+    return index
+
+
+@dataclass(frozen=True)
+class ColonyDataset:
+    """Immutable bundle of the parsed tables, meant to be shared process-wide.
+
+    ``summary_df`` is the ``create_df_for_viz()`` table and ``cities_df`` the
+    ``txt_to_dataframe()`` table. Consumers must treat both as read-only;
+    derived indexes are computed on first access and then reused.
+    """
+    summary_df: pd.DataFrame
+    cities_df: pd.DataFrame
+    version: str
+
+    def __post_init__(self):
+        # Results memoized from these tables are keyed on the dataset version
+        tag_version(self.summary_df, self.version)
+        tag_version(self.cities_df, self.version)
+
+    @cached_property
+    def countries(self) -> Tuple[str, ...]:
+        """Countries present in the aggregated table, sorted by name."""
+        return tuple(sorted(self.summary_df['Country']))
+
+    @cached_property
+    def country_rows(self) -> Dict[str, int]:
+        """Country -> positional row in ``summary_df``."""
+        return {country: position for position, country in enumerate(self.summary_df['Country'])}
+
+    @cached_property
+    def cities_by_country(self) -> Dict[str, Tuple[str, ...]]:
+        """Country -> city names, in corpus order."""
+        grouped=self.cities_df.groupby('Country Name', sort=False, observed=True)['City Name']
+        return {country: tuple(names) for country, names in grouped}
+
+    @cached_property
+    def country_index(self) -> CountryIndex:
+        """Country lookups over both tables, see ``CountryIndex``."""
+        return country_index(self.summary_df, self.cities_df)
+
+    @cached_property
+    def spatial(self) -> SpatialIndex:
+        """Grid index over the located cities, see ``locate_cities()``."""
+        return SpatialIndex(locate_cities(self.cities_df))
+
+    def rebanded(self, scheme: BandScheme) -> 'ColonyDataset':
+        """Return a dataset whose ``Category`` column follows ``scheme``.
+
+        Only the aggregated table is recomputed; the corpus is not reparsed.
+        The city table is a shallow copy (its data is shared), so tagging it
+        with the new version leaves results memoized on this dataset intact.
+        """
+        return replace(
+            self,
+            summary_df=reband(self.summary_df, scheme),
+            cities_df=self.cities_df.copy(deep=False),
+            version=f'{self.version}:{scheme.name}',
+        )
+
+
+def load_colony_dataset(
+    use_cache: bool = True,
+    sources: Optional[Union[str, Sequence[str]]] = None,
+) -> ColonyDataset:
+    """Load the tables once and wrap them in a ``ColonyDataset``."""
+    summary_df, cities_df=load_datasets(use_cache, sources)
+    return ColonyDataset(summary_df, cities_df, source_fingerprint(_source_files(sources)))
+
+
+# =============================================================================
+# Incremental reload of an edited corpus
+# =============================================================================
+
+class CorpusReloader:
+    """Keep a ``ColonyDataset`` in step with an editable corpus file.
+
+    ``refresh()`` hashes every "Modern <Country>" section, reparses only the
+    sections whose bytes changed and patches the aggregated rows of the
+    countries they touch. ``dataset`` always holds the latest immutable
+    snapshot and ``generation`` counts the snapshots built so far. Edits to
+    the mapping or coordinates CSVs still need a fresh reloader.
+    """
+
+    def __init__(self, file: str = DATA_FILE, scheme: BandScheme = DEFAULT_SCHEME):
+        self.file=file
+        self.scheme=scheme
+        self.generation=0
+        self.dataset: Optional[ColonyDataset]=None
+        self._mapping=load_country_mapping()
+        self._sections: Dict[str, Tuple[Tuple[List[str], ...], Counter]]={}
+        self._order: List[str]=[]
+        self._counts: Counter=Counter()
+        self._stat: Optional[Tuple[int, int]]=None
+        self._lock=threading.Lock()
+        self._stop=threading.Event()
+        self._thread: Optional[threading.Thread]=None
+        self.refresh()
+
+    def _parse_section(self, section: bytes) -> Tuple[Tuple[List[str], ...], Counter]:
+        columns=_record_columns(_iter_records(section.decode('utf-8').splitlines(), self._mapping))
+        return columns, Counter(columns[2])
+
+    def refresh(self) -> bool:
+        """Pick up edits to the corpus file; return True when a new snapshot was built."""
+        with self._lock:
+            stat=os.stat(self.file)
+            if self._stat==(stat.st_size, stat.st_mtime_ns):
+                return False
+
+            with open(self.file, 'rb') as handle:
+                data=handle.read()
+            starts=sorted({0, *(match.start() for match in SECTION_PATTERN.finditer(data))})
+            sections=[data[start:end] for start, end in zip(starts, starts[1:]+[len(data)]) if end>start]
+            order=[hashlib.blake2b(section, digest_size=16).hexdigest() for section in sections]
+            file_stat=(stat.st_size, stat.st_mtime_ns)
+
+            if self.dataset is not None and order==self._order:
+                self._stat=file_stat
+                return False
+
+            # Reparse new sections only and adjust counts by what came and went
+            parsed={digest: self._sections[digest] for digest in order if digest in self._sections}
+            for section, digest in zip(sections, order):
+                if digest not in parsed:
+                    parsed[digest]=self._parse_section(section)
+
+            previous, current=Counter(self._order), Counter(order)
+            counts=Counter(self._counts)
+            changed=set()
+            for digests, sign, lookup in ((previous-current, -1, self._sections), (current-previous, 1, parsed)):
+                for digest, times in digests.items():
+                    for country, count in lookup[digest][1].items():
+                        counts[country]+=sign*times*count
+                        changed.add(country)
+
+            #Built from locals only: if anything below raises, the reloader keeps
+            #its last good state and retries the same edit on the next refresh
+            cities_df=_city_table_from_columns([
+                [value for digest in order for value in parsed[digest][0][position]]
+                for position in range(len(RECORD_COLUMNS))
+            ])
+
+            if self.dataset is None:
+                summary_df=create_df_for_viz(cities_df, self.scheme)
+            else:
+                summary_df=self._patch_summary(self.dataset.summary_df, changed, counts, cities_df)
+            dataset=ColonyDataset(
+                summary_df,
+                cities_df,
+                source_fingerprint((self.file, COUNTRY_MAPPING_FILE, GEO_COORDINATES_FILE)),
+            )
+
+            previous=self.dataset
+            self._sections, self._order, self._counts, self._stat=parsed, order, counts, file_stat
+            self.generation+=1
+            self.dataset=dataset
+            if previous is not None and previous.version!=self.dataset.version:
+                invalidate(previous.version)
+            return True
+
+    def _patch_summary(self, summary_df: pd.DataFrame, changed: set, counts: Counter, cities_df: pd.DataFrame) -> pd.DataFrame:
+        kept=summary_df[~summary_df['Country'].isin(changed)]
+        countries=[country for country in changed if counts[country]>0]
+        rows=pd.DataFrame({
+            'Country': pd.Series(countries, dtype=object),
+            'No of Cities': pd.Series([counts[country] for country in countries], dtype='int32'),
+        })
+        patched=pd.concat([kept, _describe_countries(rows, self.scheme)], ignore_index=True)
+
+        # Same order as value_counts(): most colonies first, ties in corpus order
+        first_seen={country: position for position, country in enumerate(cities_df['Country Name'].cat.categories)}
+        return (
+            patched.assign(_first_seen=patched['Country'].map(first_seen))
+            .sort_values(['No of Cities', '_first_seen'], ascending=[False, True], kind='stable')
+            .drop(columns='_first_seen')
+            .reset_index(drop=True)
+        )
+
+    def watch(self, interval: float = 2.0, on_change: Optional[Callable[[ColonyDataset], None]] = None) -> None:
+        """Poll the corpus every ``interval`` seconds from a daemon thread."""
+        if self._thread is not None:
+            return
+
+        def poll():
+            while not self._stop.wait(interval):
+                try:
+                    if self.refresh() and on_change is not None:
+                        on_change(self.dataset)
+                except Exception:
+                    # A file caught mid-write is picked up on the next poll
+                    continue
+
+        self._thread=threading.Thread(target=poll, name='corpus-reloader', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the polling thread started by ``watch()``."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread=None
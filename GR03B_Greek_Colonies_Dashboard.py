@@ -2,87 +2,72 @@ import dash
 from dash import dcc, html, Input, Output
 import pandas as pd
 import webbrowser
-import plotly.graph_objects as go
-from GR03A_DataFrame import create_df_for_viz,txt_to_dataframe
+from GR03A_DataFrame import load_datasets
+from colony_bands import CLASSIC_SCHEME
+from figure_factory import bubble_map
 from dash import dash_table
 
 def create_app():
 
-    # Load dataframe to plot bubble map
-    df=create_df_for_viz()
-    # list of category for each trace
-    category = df['Category'].unique()
-    # list of colours to assign to each trace
-    colors = ["royalblue","crimson","lightseagreen","orange","limegreen"]
+    # Load dataframes (bubble map table and city list) from the parsed-data cache
+    df,cities_only_df=load_datasets()
+    # colour of each category trace (shared band labels)
+    color_map = CLASSIC_SCHEME.color_map
 
-    # Function to generate bubble map figure using Plotly Express
+    # Function to generate bubble map figure straight from the summary columns
     def generate_bubble_map():
-        # Prepare data with marker size
-        plot_df = df.copy()
-        plot_df['marker_size'] = plot_df['No of Cities'] * 20
-        
-        # Create color mapping
-        color_map = dict(zip(category, colors))
-        
-        # Create figure using Plotly Express for better built-in geography
-        figure = px.scatter_geo(
-            plot_df,
-            lon='Longitude',
-            lat='Latitude',
-            color='Category',
-            size='marker_size',
-            hover_name='Country',
-            hover_data={'No of Cities': True, 'Longitude': False, 'Latitude': False,
-                       'marker_size': False, 'Category': False},
-            color_discrete_map=color_map,
-            size_max=50
-        )
-        
-        # Update traces for styling
-        for trace in figure.data:
-            trace.marker.line = dict(color='rgb(40,40,40)', width=0.5)
-            trace.marker.opacity = 0.8
-
-        figure.update_layout(
-            title_text = '<b>Number of Colonies by Location</b> <br>Before Philip II of Macedon (Pre-Hellenic)',
-            title_x=0.5,
-            showlegend = True,
-            width=1050,
-            height=1050,
-            legend=dict(
-                orientation='h',
-                title=None
-            ),
-            margin=go.layout.Margin(
-                b=100
-            ),
-            geo = dict(
-                projection_type='natural earth',
-                showland=True,
-                landcolor='rgb(0, 0, 0)',
-                showocean=True,
-                oceancolor='rgb(50, 50, 100)',
-                showcountries=True,
-                countrycolor='rgb(100, 100, 100)',
-                countrywidth=1,
-                showcoastlines=True,
-                coastlinecolor='rgb(150, 150, 150)',
-                coastlinewidth=1,
-                showframe=False,
-                showrivers=True,
-                rivercolor='rgb(255, 255, 255)',
-                riverwidth=0.5,
-                center=dict(lon=20, lat=40),
-                projection_scale=3.5,
-                bgcolor='rgb(20, 20, 40)'
+        figure = bubble_map(
+            df['Latitude'],
+            df['Longitude'],
+            df['No of Cities'] * 20,
+            df['Category'],
+            df['Country'],
+            colors=color_map,
+            size_max=50,
+            customdata=df[['No of Cities']].to_numpy(),
+            hovertemplate='<b>%{hovertext}</b><br><br>No of Cities=%{customdata[0]}<extra></extra>',
+            # Styling shared by every trace
+            marker={'line': dict(color='rgb(40,40,40)', width=0.5), 'opacity': 0.8},
+            layout=dict(
+                title=dict(
+                    text='<b>Number of Colonies by Location</b> <br>Before Philip II of Macedon (Pre-Hellenic)',
+                    x=0.5
+                ),
+                showlegend = True,
+                width=1050,
+                height=1050,
+                legend=dict(
+                    orientation='h',
+                    title=None
+                ),
+                margin=dict(
+                    b=100
+                ),
+                geo = dict(
+                    projection=dict(type='natural earth', scale=3.5),
+                    showland=True,
+                    landcolor='rgb(0, 0, 0)',
+                    showocean=True,
+                    oceancolor='rgb(50, 50, 100)',
+                    showcountries=True,
+                    countrycolor='rgb(100, 100, 100)',
+                    countrywidth=1,
+                    showcoastlines=True,
+                    coastlinecolor='rgb(150, 150, 150)',
+                    coastlinewidth=1,
+                    showframe=False,
+                    showrivers=True,
+                    rivercolor='rgb(255, 255, 255)',
+                    riverwidth=0.5,
+                    center=dict(lon=20, lat=40),
+                    bgcolor='rgb(20, 20, 40)'
+                )
             )
         )
 
         return figure
 
-    # loading dataframe to use in datatable
-    cities_only_df=txt_to_dataframe()
-    #selecting relevant fields only
+    #selecting relevant fields only for the datatable
     cities_only_df=cities_only_df[['Country Name','City Name']].copy()
 
 
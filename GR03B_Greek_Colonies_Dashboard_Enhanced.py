@@ -1,18 +1,17 @@
 import dash
 from dash import dcc, html, dash_table, Input, Output, State
 import pandas as pd
+import numpy as np
 import plotly.graph_objects as go
-import plotly.express as px
-from GR03A_DataFrame import create_df_for_viz, txt_to_dataframe
+from GR03A_DataFrame import load_datasets
+from colony_bands import PASTEL_SCHEME
+from colony_search import NameIndex
+from figure_factory import bubble_map
+from figure_payload import compact_figure
+from figure_templates import Highlight, MapTemplate
 
-# Color palette constants
-COLORS = {
-    '90+ colonies': '#FF6B6B',          # Coral red
-    '60 - 90 colonies': '#4ECDC4',      # Turquoise
-    '30 - 60 colonies': '#FFE66D',      # Golden yellow
-    '10 - 20 colonies': '#95E1D3',      # Mint green
-    'Less than 10 colonies': '#A8E6CF'  # Light mint
-}
+# Color palette constants, keyed by the shared band labels (highest band first)
+COLORS = PASTEL_SCHEME.color_map
 
 # UI constants
 STATS_CARD_WIDTH = '20%'
@@ -20,109 +19,94 @@ TOP_COUNTRY_CARD_WIDTH = '38%'
 MAP_COLUMN_WIDTH = '65%'
 CHARTS_COLUMN_WIDTH = '33%'
 
+# Rows shown for a typo-tolerant search
+FUZZY_RESULTS = 25
+
+# Bubble sizes: colonies x 22, or x 20 with the selected country at x 25 and
+# fully opaque while the others fade
+MAP_HIGHLIGHT = Highlight(idle_scale=22, scale=20, boost=1.25, size_max=50,
+                          opacity=1.0, dimmed=0.4, idle_opacity=0.85)
+
 def create_enhanced_app():
     # Load dataframes
-    df = create_df_for_viz()
-    cities_df = txt_to_dataframe()
+    df, cities_df = load_datasets()
     cities_only_df = cities_df[['Country Name', 'City Name']].copy()
+    city_search = NameIndex(cities_only_df['City Name'].tolist()).warm()
     
-    # Create enhanced bubble map using Plotly Express for better built-in geography
-    def generate_enhanced_bubble_map(selected_country=None):
-        # Prepare data for visualization
-        plot_df = df.copy()
-        
-        # Add size and opacity columns based on selection
-        if selected_country:
-            plot_df['marker_size'] = plot_df.apply(
-                lambda row: row['No of Cities'] * 25 if row['Country'] == selected_country else row['No of Cities'] * 20,
-                axis=1
-            )
-            plot_df['marker_opacity'] = plot_df.apply(
-                lambda row: 1.0 if row['Country'] == selected_country else 0.4,
-                axis=1
+    # Create the enhanced bubble map once, with nothing selected; selections
+    # are applied to it as patches (see MAP_HIGHLIGHT)
+    def build_bubble_map_template():
+        # Create figure straight from the summary columns
+        fig = bubble_map(
+            df['Latitude'],
+            df['Longitude'],
+            df['No of Cities'] * MAP_HIGHLIGHT.idle_scale,
+            df['Category'],
+            df['Country'],
+            colors=COLORS,
+            size_max=MAP_HIGHLIGHT.size_max,
+            customdata=df[['No of Cities']].to_numpy(),
+            hovertemplate='<b>%{hovertext}</b><br><br>No of Cities=%{customdata[0]}<extra></extra>',
+            # Better styling
+            marker={'line': dict(color='white', width=2)},
+            # Enhanced layout with beautiful styling
+            layout=dict(
+                title={
+                    'text': '<b>Ancient Greek Colonies Distribution</b><br>' +
+                            '<sub>Pre-Hellenic Period (Before Philip II of Macedon)</sub>',
+                    'x': 0.5,
+                    'xanchor': 'center',
+                    'font': {'size': 24, 'color': '#2C3E50', 'family': 'Arial Black'}
+                },
+                showlegend=True,
+                width=1200,
+                height=800,
+                legend=dict(
+                    orientation='h',
+                    yanchor='bottom',
+                    y=-0.05,
+                    xanchor='center',
+                    x=0.5,
+                    font=dict(size=12, color='#2C3E50'),
+                    bgcolor='rgba(255,255,255,0.95)',
+                    bordercolor='#BDC3C7',
+                    borderwidth=2,
+                    title=None
+                ),
+                margin=dict(l=0, r=0, t=80, b=50),
+                geo=dict(
+                    projection=dict(type='natural earth', scale=3.5),
+                    showland=True,
+                    landcolor='#ECF0F1',
+                    showocean=True,
+                    oceancolor='#85C1E9',
+                    showlakes=True,
+                    lakecolor='#AED6F1',
+                    showrivers=True,
+                    rivercolor='#5DADE2',
+                    showcountries=True,
+                    countrycolor='#7F8C8D',
+                    countrywidth=1.2,
+                    showcoastlines=True,
+                    coastlinecolor='#34495E',
+                    coastlinewidth=1.5,
+                    showframe=True,
+                    framecolor='#BDC3C7',
+                    framewidth=2,
+                    bgcolor='#D6EAF8',
+                    center=dict(lon=20, lat=40)
+                ),
+                paper_bgcolor='#ECF0F1',
+                plot_bgcolor='#ECF0F1'
             )
-        else:
-            plot_df['marker_size'] = plot_df['No of Cities'] * 22
-            plot_df['marker_opacity'] = 0.85
-        
-        # Create figure using Plotly Express
-        fig = px.scatter_geo(
-            plot_df,
-            lon='Longitude',
-            lat='Latitude',
-            color='Category',
-            size='marker_size',
-            hover_name='Country',
-            hover_data={'No of Cities': True, 'Longitude': False, 'Latitude': False, 
-                       'marker_size': False, 'marker_opacity': False, 'Category': False},
-            color_discrete_map=COLORS,
-            size_max=50
-        )
-        
-        # Update traces for better styling
-        for trace in fig.data:
-            trace.marker.line = dict(color='white', width=2)
-            if selected_country:
-                # Apply opacity from dataframe
-                category = trace.name
-                cat_data = plot_df[plot_df['Category'] == category]
-                trace.marker.opacity = cat_data['marker_opacity'].tolist()
-            else:
-                trace.marker.opacity = 0.85
-        
-        # Enhanced layout with beautiful styling
-        fig.update_layout(
-            title={
-                'text': '<b>Ancient Greek Colonies Distribution</b><br>' +
-                        '<sub>Pre-Hellenic Period (Before Philip II of Macedon)</sub>',
-                'x': 0.5,
-                'xanchor': 'center',
-                'font': {'size': 24, 'color': '#2C3E50', 'family': 'Arial Black'}
-            },
-            showlegend=True,
-            width=1200,
-            height=800,
-            legend=dict(
-                orientation='h',
-                yanchor='bottom',
-                y=-0.05,
-                xanchor='center',
-                x=0.5,
-                font=dict(size=12, color='#2C3E50'),
-                bgcolor='rgba(255,255,255,0.95)',
-                bordercolor='#BDC3C7',
-                borderwidth=2,
-                title=None
-            ),
-            margin=dict(l=0, r=0, t=80, b=50),
-            geo=dict(
-                projection_type='natural earth',
-                showland=True,
-                landcolor='#ECF0F1',
-                showocean=True,
-                oceancolor='#85C1E9',
-                showlakes=True,
-                lakecolor='#AED6F1',
-                showrivers=True,
-                rivercolor='#5DADE2',
-                showcountries=True,
-                countrycolor='#7F8C8D',
-                countrywidth=1.2,
-                showcoastlines=True,
-                coastlinecolor='#34495E',
-                coastlinewidth=1.5,
-                showframe=True,
-                framecolor='#BDC3C7',
-                framewidth=2,
-                bgcolor='#D6EAF8',
-                center=dict(lon=20, lat=40),
-                projection_scale=3.5
-            ),
-            paper_bgcolor='#ECF0F1',
-            plot_bgcolor='#ECF0F1'
         )
         
-        return fig
+        return MapTemplate(fig, dict(zip(df['Country'], df['No of Cities'])), MAP_HIGHLIGHT)
+    
+    map_template = build_bubble_map_template()
+    
+    def generate_enhanced_bubble_map(selected_country=None):
+        return map_template.render(selected_country)
     
     # Create bar chart for top countries
     def generate_bar_chart():
@@ -364,7 +348,7 @@ def create_enhanced_app():
                 # Map
                 dcc.Graph(
                     id='bubble-map',
-                    figure=generate_enhanced_bubble_map(),
+                    figure=compact_figure(generate_enhanced_bubble_map()),
                     style={'borderRadius': '10px', 'overflow': 'hidden'}
                 )
             ], style={'width': MAP_COLUMN_WIDTH, 'display': 'inline-block', 'verticalAlign': 'top', 'padding': '20px'}),
@@ -375,7 +359,7 @@ def create_enhanced_app():
                 html.Div([
                     dcc.Graph(
                         id='bar-chart',
-                        figure=generate_bar_chart(),
+                        figure=compact_figure(generate_bar_chart()),
                         style={'height': '400px'}
                     )
                 ], style={
@@ -390,7 +374,7 @@ def create_enhanced_app():
                 html.Div([
                     dcc.Graph(
                         id='pie-chart',
-                        figure=generate_pie_chart(),
+                        figure=compact_figure(generate_pie_chart()),
                         style={'height': '400px'}
                     )
                 ], style={
@@ -429,6 +413,12 @@ def create_enhanced_app():
                                 'borderRadius': '5px',
                                 'fontSize': '12px'
                             }
+                        ),
+                        dcc.Checklist(
+                            id='fuzzy-search',
+                            options=[{'label': ' Match misspellings', 'value': 'fuzzy'}],
+                            value=[],
+                            style={'fontSize': '12px', 'color': '#2C3E50', 'marginBottom': '10px'}
                         )
                     ]),
                     dash_table.DataTable(
@@ -510,26 +500,41 @@ def create_enhanced_app():
          Output('selected-info', 'children')],
         [Input('country-selector', 'value'),
          Input('reset-button', 'n_clicks'),
-         Input('search-box', 'value')]
+         Input('search-box', 'value'),
+         Input('fuzzy-search', 'value')]
     )
-    def update_visualization(selected_country, reset_clicks, search_term):
+    def update_visualization(selected_country, reset_clicks, search_term, fuzzy_search=None):
         # Handle reset button
         if selected_country == 'ALL':
             selected_country = None
         
-        # Update map
-        fig = generate_enhanced_bubble_map(selected_country)
+        # Update map: a new selection only patches the highlight on the
+        # client's figure, and searching leaves the map as it is
+        triggers = {prop.split('.')[0] for prop in dash.callback_context.triggered_prop_ids}
+        if not triggers:
+            fig = compact_figure(generate_enhanced_bubble_map(selected_country))
+        elif triggers & {'country-selector', 'reset-button'}:
+            fig = map_template.patch(selected_country)
+        else:
+            fig = dash.no_update
         
         # Filter table data
-        filtered_df = cities_only_df.copy()
+        filtered_df = cities_only_df
+        if search_term and fuzzy_search:
+            # Closest names by edit distance, from the prebuilt BK-tree; the
+            # country filter narrows the candidates before the top ones are taken
+            pool = None
+            if selected_country:
+                pool = np.flatnonzero(cities_only_df['Country Name'].to_numpy() == selected_country).tolist()
+            matches = city_search.fuzzy(search_term, k=FUZZY_RESULTS, rows=pool)
+            filtered_df = filtered_df.iloc[[match.row for match in matches]]
+        elif search_term:
+            # Ranked matches from the prebuilt name index
+            filtered_df = filtered_df.iloc[city_search.search(search_term, limit=None).rows]
+        
         if selected_country:
             filtered_df = filtered_df[filtered_df['Country Name'] == selected_country]
         
-        if search_term:
-            filtered_df = filtered_df[
-                filtered_df['City Name'].str.contains(search_term, case=False, na=False)
-            ]
-        
         # Update info panel
         if selected_country:
             country_data = df[df['Country'] == selected_country].iloc[0]
@@ -23,10 +23,14 @@ import dash
 from dash import Input, Output, State, dcc, html, dash_table
 import dash_bootstrap_components as dbc
 import pandas as pd
-import plotly.express as px
 import plotly.graph_objects as go
 
-from GR03A_DataFrame import create_df_for_viz, txt_to_dataframe
+from GR03A_DataFrame import load_datasets
+from colony_bands import DEFAULT_SCHEME
+from colony_cache import LRUCache
+from figure_factory import bar_chart, bubble_map, concentration_curve, group_treemap
+from figure_payload import compact_figure
+from figure_templates import Highlight, MapTemplate
 
 
 # ---------------------------------------------------------------------------
@@ -45,13 +49,7 @@ THEME_COLORS = {
     "sand": "#E8D3A5",  # Coastal sand
 }
 
-CATEGORY_COLORS = {
-    "90+ colonies": "#C0392B",
-    "60 - 90 colonies": "#E67E22",
-    "30 - 60 colonies": "#F1C40F",
-    "10 - 20 colonies": "#27AE60",
-    "Less than 10 colonies": "#2980B9",
-}
+CATEGORY_COLORS = DEFAULT_SCHEME.color_map
 
 PROJECTION_OPTIONS = [
     {"label": "Natural Earth", "value": "natural earth"},
@@ -59,6 +57,17 @@ PROJECTION_OPTIONS = [
     {"label": "Mercator", "value": "mercator"},
 ]
 
+# Bubble sizes per marker mode; the selected country grows by 40% and the
+# others fade
+PROPORTIONAL_HIGHLIGHT = Highlight(idle_scale=18, scale=18, boost=1.4, size_max=70)
+UNIFORM_HIGHLIGHT = Highlight(idle_scale=25, scale=25, boost=1.4, size_max=70)
+
+# Base maps kept per filter result, projection and marker mode
+MAP_TEMPLATE_ENTRIES = 32
+
+# Inputs that only change which country is highlighted
+SELECTION_TRIGGERS = {"country-selector", "bubble-map", "bar-chart", "treemap-chart", "reset-button"}
+
 
 def create_professional_app() -> dash.Dash:
     """Create the enhanced professional dashboard application."""
@@ -66,8 +75,7 @@ def create_professional_app() -> dash.Dash:
     # ------------------------------------------------------------------
     # Load and prepare data
     # ------------------------------------------------------------------
-    df = create_df_for_viz()
-    cities_df = txt_to_dataframe()
+    df, cities_df = load_datasets()
     cities_df = cities_df.rename(columns={"Country Name": "Country", "City Name": "City"})
 
     # Derive summary statistics
@@ -78,6 +86,8 @@ def create_professional_app() -> dash.Dash:
     max_country = str(max_country_row["Country"])
     max_colonies = int(max_country_row["No of Cities"])
 
+    map_templates = LRUCache(maxsize=MAP_TEMPLATE_ENTRIES)
+
     # Range for slider controls
     min_colonies = int(math.floor(df["No of Cities"].min()))
     max_colonies_range = int(math.ceil(df["No of Cities"].max()))
@@ -552,12 +562,18 @@ def create_professional_app() -> dash.Dash:
             filtered = filtered[(filtered["No of Cities"] >= start) & (filtered["No of Cities"] <= end)]
         return filtered
 
+    def compact(fig, **options):
+        # Trim figures before they are sent; patches and no_update pass through
+        if fig is dash.no_update or isinstance(fig, dash.Patch):
+            return fig
+        return compact_figure(fig, **options)
+
     def generate_map(
         plot_df: pd.DataFrame,
         selected_country: str,
         projection: str,
         size_mode: str,
-    ) -> go.Figure:
+    ) -> go.Figure | dict:
         if plot_df.empty:
             fig = go.Figure()
             fig.update_layout(
@@ -576,34 +592,22 @@ def create_professional_app() -> dash.Dash:
             )
             return fig
 
-        plot_df = plot_df.copy()
+        return map_template(plot_df, projection, size_mode).render(selected_country)
+
+    def map_template(plot_df: pd.DataFrame, projection: str, size_mode: str) -> MapTemplate:
+        # Base map for one filter/projection/size combination; selections are
+        # patches on top of it
+        key = (tuple(plot_df.index), projection, size_mode)
+        template = map_templates.get(key)
+        if template is not None:
+            return template
 
         if size_mode == "uniform":
-            plot_df["marker_size"] = 25
+            highlight = UNIFORM_HIGHLIGHT
+            units = dict.fromkeys(plot_df["Country"], 1.0)
         else:
-            plot_df["marker_size"] = plot_df["No of Cities"].astype(float) * 18
-
-        plot_df["marker_opacity"] = 0.85
-        if selected_country and selected_country != "ALL" and selected_country in plot_df["Country"].values:
-            plot_df.loc[plot_df["Country"] != selected_country, "marker_opacity"] = 0.25
-            plot_df.loc[plot_df["Country"] == selected_country, "marker_size"] *= 1.4
-
-        fig = px.scatter_geo(
-            plot_df,
-            lon="Longitude",
-            lat="Latitude",
-            color="Category",
-            size="marker_size",
-            hover_name="Country",
-            hover_data={"No of Cities": True, "marker_size": False},
-            color_discrete_map=CATEGORY_COLORS,
-            size_max=70,
-            custom_data=["Country", "No of Cities"],
-        )
-
-        for trace in fig.data:
-            trace.marker.line = dict(color="#FFFFFF", width=2)
-            trace.marker.opacity = plot_df.loc[plot_df["Category"] == trace.name, "marker_opacity"].tolist()
+            highlight = PROPORTIONAL_HIGHLIGHT
+            units = dict(zip(plot_df["Country"], plot_df["No of Cities"].astype(float)))
 
         geo_config = dict(
             projection={"type": projection or "natural earth"},
@@ -621,46 +625,59 @@ def create_professional_app() -> dash.Dash:
             bgcolor="rgba(0,0,0,0)",
         )
 
-        if selected_country and selected_country != "ALL" and selected_country in plot_df["Country"].values:
-            country_data = plot_df.loc[plot_df["Country"] == selected_country].iloc[0]
-            geo_config.update(
-                center=dict(lon=float(country_data["Longitude"]), lat=float(country_data["Latitude"])),
-                projection_scale=9 if projection == "orthographic" else 6,
-            )
-        else:
-            geo_config.update(center=dict(lon=20, lat=40), projection_scale=3.4)
-
-        fig.update_layout(
-            title=dict(
-                text=(
-                    "<b style=\"font-family:Cinzel,serif;font-size:28px;\">Ancient Greek Colonies Distribution</b><br>"
-                    "<span style=\"color:#B0C6D5;font-size:14px;\">Interact to explore colonisation intensity</span>"
+        fig = bubble_map(
+            plot_df["Latitude"],
+            plot_df["Longitude"],
+            plot_df["Country"].map(units) * highlight.idle_scale,
+            plot_df["Category"],
+            plot_df["Country"],
+            colors=CATEGORY_COLORS,
+            size_max=highlight.size_max,
+            customdata=plot_df[["Country", "No of Cities"]].to_numpy(dtype=object),
+            hovertemplate="<b>%{customdata[0]}</b><br>Colonies: %{customdata[1]}<extra></extra>",
+            marker={"line": dict(color="#FFFFFF", width=2)},
+            layout=dict(
+                title=dict(
+                    text=(
+                        "<b style=\"font-family:Cinzel,serif;font-size:28px;\">Ancient Greek Colonies Distribution</b><br>"
+                        "<span style=\"color:#B0C6D5;font-size:14px;\">Interact to explore colonisation intensity</span>"
+                    ),
+                    x=0.5,
+                    xanchor="center",
                 ),
-                x=0.5,
-                xanchor="center",
-            ),
-            geo=geo_config,
-            legend=dict(
-                orientation="h",
-                yanchor="bottom",
-                y=-0.1,
-                xanchor="center",
-                x=0.5,
-                bgcolor="rgba(10,23,35,0.9)",
-                font=dict(color="#ECF0F1"),
+                geo=geo_config,
+                legend=dict(
+                    orientation="h",
+                    yanchor="bottom",
+                    y=-0.1,
+                    xanchor="center",
+                    x=0.5,
+                    bgcolor="rgba(10,23,35,0.9)",
+                    font=dict(color="#ECF0F1"),
+                ),
+                paper_bgcolor="rgba(0,0,0,0)",
+                plot_bgcolor="rgba(0,0,0,0)",
+                margin=dict(l=0, r=0, t=60, b=0),
             ),
-            paper_bgcolor="rgba(0,0,0,0)",
-            plot_bgcolor="rgba(0,0,0,0)",
-            margin=dict(l=0, r=0, t=60, b=0),
         )
 
-        fig.update_traces(
-            hovertemplate="<b>%{customdata[0]}</b><br>Colonies: %{customdata[1]}<extra></extra>"
-        )
+        positions = plot_df.set_index("Country")[["Longitude", "Latitude"]]
 
-        return fig
+        def focus(selected: Optional[str]) -> dict:
+            # Zoom onto the selected country, or back out to the Mediterranean
+            if selected is None:
+                return {("center",): dict(lon=20, lat=40), ("projection", "scale"): 3.4}
+            lon, lat = positions.loc[selected]
+            return {
+                ("center",): dict(lon=float(lon), lat=float(lat)),
+                ("projection", "scale"): 9 if projection == "orthographic" else 6,
+            }
+
+        template = MapTemplate(fig, units, highlight, focus)
+        map_templates.put(key, template)
+        return template
 
-    def generate_top_countries_bar(plot_df: pd.DataFrame, selected_country: str) -> go.Figure:
+    def generate_top_countries_bar(plot_df: pd.DataFrame, selected_country: str) -> go.Figure | dict:
         if plot_df.empty:
             fig = go.Figure()
             fig.update_layout(
@@ -684,36 +701,28 @@ def create_professional_app() -> dash.Dash:
             else:
                 colors.append(THEME_COLORS["secondary"])
 
-        fig = go.Figure(
-            data=
-            [
-                go.Bar(
-                    y=df_sorted["Country"],
-                    x=df_sorted["No of Cities"],
-                    orientation="h",
-                    marker=dict(color=colors, line=dict(color="rgba(255,255,255,0.6)", width=1)),
-                    text=df_sorted["No of Cities"],
-                    textposition="outside",
-                    customdata=df_sorted["Country"],
-                    hovertemplate="<b>%{y}</b><br>Colonies: %{x}<extra></extra>",
-                )
-            ]
-        )
-
-        fig.update_layout(
-            title=dict(text="<b>Top Host Regions</b>", x=0.5, font=dict(color="#ECF0F1")),
-            xaxis_title="Colonies",
-            yaxis_title="",
-            paper_bgcolor="rgba(0,0,0,0)",
-            plot_bgcolor="rgba(0,0,0,0)",
-            font=dict(color="#ECF0F1"),
-            margin=dict(l=10, r=30, t=50, b=10),
-            xaxis=dict(gridcolor="rgba(255,255,255,0.1)"),
-            hovermode="closest",
+        return bar_chart(
+            df_sorted["No of Cities"],
+            df_sorted["Country"],
+            orientation="h",
+            marker=dict(color=colors, line=dict(color="rgba(255,255,255,0.6)", width=1)),
+            text=df_sorted["No of Cities"],
+            textposition="outside",
+            customdata=df_sorted["Country"],
+            hovertemplate="<b>%{y}</b><br>Colonies: %{x}<extra></extra>",
+            layout=dict(
+                title=dict(text="<b>Top Host Regions</b>", x=0.5, font=dict(color="#ECF0F1")),
+                paper_bgcolor="rgba(0,0,0,0)",
+                plot_bgcolor="rgba(0,0,0,0)",
+                font=dict(color="#ECF0F1"),
+                margin=dict(l=10, r=30, t=50, b=10),
+                xaxis=dict(title=dict(text="Colonies"), gridcolor="rgba(255,255,255,0.1)"),
+                yaxis=dict(title=dict(text="")),
+                hovermode="closest",
+            ),
         )
-        return fig
 
-    def generate_category_distribution(plot_df: pd.DataFrame) -> go.Figure:
+    def generate_category_distribution(plot_df: pd.DataFrame) -> go.Figure | dict:
         if plot_df.empty:
             fig = go.Figure()
             fig.update_layout(
@@ -730,33 +739,26 @@ def create_professional_app() -> dash.Dash:
             return fig
 
         category_counts = plot_df.groupby("Category").size().reindex(CATEGORY_COLORS.keys(), fill_value=0)
-        fig = go.Figure(
-            data=[
-                go.Bar(
-                    x=category_counts.index,
-                    y=category_counts.values,
-                    marker=dict(
-                        color=[CATEGORY_COLORS.get(cat, THEME_COLORS["secondary"]) for cat in category_counts.index],
-                        line=dict(color="rgba(255,255,255,0.6)", width=1),
-                    ),
-                    hovertemplate="%{x}<br>Countries: %{y}<extra></extra>",
-                )
-            ]
-        )
-        fig.update_layout(
-            title=dict(text="<b>Distribution Across Colony Bands</b>", x=0.5, font=dict(color="#ECF0F1")),
-            xaxis_title="Intensity Band",
-            yaxis_title="Countries",
-            paper_bgcolor="rgba(0,0,0,0)",
-            plot_bgcolor="rgba(0,0,0,0)",
-            font=dict(color="#ECF0F1"),
-            margin=dict(l=20, r=20, t=50, b=40),
-            xaxis=dict(showgrid=False),
-            yaxis=dict(gridcolor="rgba(255,255,255,0.1)"),
+        return bar_chart(
+            category_counts.index,
+            category_counts.values,
+            marker=dict(
+                color=[CATEGORY_COLORS.get(cat, THEME_COLORS["secondary"]) for cat in category_counts.index],
+                line=dict(color="rgba(255,255,255,0.6)", width=1),
+            ),
+            hovertemplate="%{x}<br>Countries: %{y}<extra></extra>",
+            layout=dict(
+                title=dict(text="<b>Distribution Across Colony Bands</b>", x=0.5, font=dict(color="#ECF0F1")),
+                paper_bgcolor="rgba(0,0,0,0)",
+                plot_bgcolor="rgba(0,0,0,0)",
+                font=dict(color="#ECF0F1"),
+                margin=dict(l=20, r=20, t=50, b=40),
+                xaxis=dict(title=dict(text="Intensity Band"), showgrid=False),
+                yaxis=dict(title=dict(text="Countries"), gridcolor="rgba(255,255,255,0.1)"),
+            ),
         )
-        return fig
 
-    def generate_treemap(plot_df: pd.DataFrame) -> go.Figure:
+    def generate_treemap(plot_df: pd.DataFrame) -> go.Figure | dict:
         if plot_df.empty:
             fig = go.Figure()
             fig.update_layout(
@@ -772,27 +774,23 @@ def create_professional_app() -> dash.Dash:
             )
             return fig
 
-        fig = px.treemap(
-            plot_df,
-            path=[px.Constant("Colonies"), "Category", "Country"],
-            values="No of Cities",
-            color="Category",
-            color_discrete_map=CATEGORY_COLORS,
-            custom_data=["Country", "No of Cities"],
-        )
-        fig.update_traces(
+        return group_treemap(
+            "Colonies",
+            plot_df["Category"].astype(str),
+            plot_df["Country"],
+            plot_df["No of Cities"],
+            colors=CATEGORY_COLORS,
             hovertemplate="<b>%{customdata[0]}</b><br>Colonies: %{customdata[1]}<extra></extra>",
             textinfo="label+percent entry",
+            layout=dict(
+                title=dict(text="<b>Category Hierarchy</b>", x=0.5, font=dict(color="#ECF0F1")),
+                paper_bgcolor="rgba(0,0,0,0)",
+                plot_bgcolor="rgba(0,0,0,0)",
+                margin=dict(l=0, r=0, t=50, b=0),
+            ),
         )
-        fig.update_layout(
-            title=dict(text="<b>Category Hierarchy</b>", x=0.5, font=dict(color="#ECF0F1")),
-            paper_bgcolor="rgba(0,0,0,0)",
-            plot_bgcolor="rgba(0,0,0,0)",
-            margin=dict(l=0, r=0, t=50, b=0),
-        )
-        return fig
 
-    def generate_distribution_chart(plot_df: pd.DataFrame) -> go.Figure:
+    def generate_distribution_chart(plot_df: pd.DataFrame) -> go.Figure | dict:
         if plot_df.empty:
             fig = go.Figure()
             fig.update_layout(
@@ -808,53 +806,39 @@ def create_professional_app() -> dash.Dash:
             )
             return fig
 
-        sorted_counts = plot_df.sort_values("No of Cities", ascending=False)
-        sorted_counts["Rank"] = range(1, len(sorted_counts) + 1)
-        sorted_counts["Cumulative Share"] = sorted_counts["No of Cities"].cumsum() / sorted_counts["No of Cities"].sum()
-
-        fig = go.Figure()
-        fig.add_trace(
-            go.Scatter(
-                x=sorted_counts["Rank"],
-                y=sorted_counts["No of Cities"],
+        return concentration_curve(
+            plot_df["No of Cities"],
+            counts_trace=dict(
                 mode="lines+markers",
                 line=dict(color=THEME_COLORS["secondary"], width=3),
                 marker=dict(size=8, color=THEME_COLORS["accent"]),
                 hovertemplate="Rank %{x}: %{y} colonies<extra></extra>",
                 name="Colonies",
-            )
-        )
-        fig.add_trace(
-            go.Scatter(
-                x=sorted_counts["Rank"],
-                y=sorted_counts["Cumulative Share"],
+            ),
+            share_trace=dict(
                 mode="lines",
                 line=dict(color=THEME_COLORS["warning"], dash="dash"),
-                yaxis="y2",
                 name="Cumulative Share",
                 hovertemplate="Rank %{x}: %{y:.0%} cumulative<extra></extra>",
-            )
-        )
-
-        fig.update_layout(
-            title=dict(text="<b>Colonies Concentration Curve</b>", x=0.5, font=dict(color="#ECF0F1")),
-            xaxis_title="Ranked host regions",
-            yaxis_title="Colonies",
-            paper_bgcolor="rgba(0,0,0,0)",
-            plot_bgcolor="rgba(0,0,0,0)",
-            font=dict(color="#ECF0F1"),
-            margin=dict(l=50, r=50, t=50, b=40),
-            yaxis=dict(gridcolor="rgba(255,255,255,0.1)"),
-            yaxis2=dict(
-                overlaying="y",
-                side="right",
-                range=[0, 1],
-                tickformat=",%",
-                gridcolor="rgba(255,255,255,0)",
             ),
-            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="center", x=0.5),
+            layout=dict(
+                title=dict(text="<b>Colonies Concentration Curve</b>", x=0.5, font=dict(color="#ECF0F1")),
+                paper_bgcolor="rgba(0,0,0,0)",
+                plot_bgcolor="rgba(0,0,0,0)",
+                font=dict(color="#ECF0F1"),
+                margin=dict(l=50, r=50, t=50, b=40),
+                xaxis=dict(title=dict(text="Ranked host regions")),
+                yaxis=dict(title=dict(text="Colonies"), gridcolor="rgba(255,255,255,0.1)"),
+                yaxis2=dict(
+                    overlaying="y",
+                    side="right",
+                    range=[0, 1],
+                    tickformat=",%",
+                    gridcolor="rgba(255,255,255,0)",
+                ),
+                legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="center", x=0.5),
+            ),
         )
-        return fig
 
     def generate_gauge(plot_df: pd.DataFrame, selected_country: str) -> go.Figure:
         fig = go.Figure()
@@ -1009,11 +993,18 @@ def create_professional_app() -> dash.Dash:
         if selected_country not in filtered_df["Country"].values:
             selected_country = "ALL"
 
-        map_fig = generate_map(filtered_df, selected_country, projection_value, marker_mode)
+        triggers = {prop.split(".")[0] for prop in dash.callback_context.triggered_prop_ids}
+        if triggers and triggers <= SELECTION_TRIGGERS and not filtered_df.empty:
+            # Same filters as the figures on screen: patch the map's highlight
+            # and leave the charts that ignore the selection alone
+            map_fig = map_template(filtered_df, projection_value, marker_mode).patch(selected_country)
+            category_fig = treemap_fig = distribution_fig = dash.no_update
+        else:
+            map_fig = generate_map(filtered_df, selected_country, projection_value, marker_mode)
+            category_fig = generate_category_distribution(filtered_df)
+            treemap_fig = generate_treemap(filtered_df)
+            distribution_fig = generate_distribution_chart(filtered_df)
         bar_fig = generate_top_countries_bar(filtered_df, selected_country)
-        category_fig = generate_category_distribution(filtered_df)
-        treemap_fig = generate_treemap(filtered_df)
-        distribution_fig = generate_distribution_chart(filtered_df)
         gauge_fig = generate_gauge(filtered_df, selected_country)
 
         if filtered_df.empty:
@@ -1062,11 +1053,12 @@ def create_professional_app() -> dash.Dash:
         filtered_records = filtered_df.to_dict("records")
 
         return (
-            map_fig,
-            bar_fig,
-            category_fig,
-            treemap_fig,
-            distribution_fig,
+            compact(map_fig),
+            # Bar clicks read the country from customdata
+            compact(bar_fig, keep_customdata=True),
+            compact(category_fig),
+            compact(treemap_fig),
+            compact(distribution_fig),
             filtered_cities.to_dict("records"),
             table_columns,
             info_panel,
@@ -1077,7 +1069,7 @@ def create_professional_app() -> dash.Dash:
             top_country_count,
             selected_country,
             summary_text,
-            gauge_fig,
+            compact(gauge_fig),
             filtered_records,
         )
 
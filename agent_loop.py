@@ -0,0 +1,270 @@
+"""Tool-calling agent loop for Ancient Greek Colonization Explorer
+
+The chat model is offered the ``agent_tools`` analysis functions as
+OpenAI-style tools and answers from their results instead of guessing from
+the static data context. ``run_agent()`` streams a completion; when the
+model asks for tools, every call of that round is executed concurrently
+(off the event loop) and the results are sent back together, so a
+multi-part question costs one extra round trip rather than one per part.
+After ``max_rounds`` tool rounds (``config.MAX_TOOL_ROUNDS`` by default) the
+model must answer with what it has.
+
+Charts are requested through the ``show_visualization`` tool; the loop only
+collects those requests and hands them to the caller as each tool round
+ends, so they can be rendered while the final answer streams.
+"""
+
+import asyncio
+import json
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+import config
+from agent_tools import (
+    compare_countries,
+    find_nearby_colonies,
+    get_colony_statistics,
+    get_country_details,
+    get_regional_analysis,
+    search_colonies,
+)
+from GR03A_DataFrame import ColonyDataset
+
+
+# Longest tool result sent back to the model, in characters
+MAX_RESULT_CHARS = 6000
+
+# Visualization kinds show_visualization accepts
+VISUALIZATIONS = ("map", "bar", "category", "comparison")
+PROJECTIONS = ("natural earth", "orthographic", "mercator")
+
+
+class Tool(NamedTuple):
+    """A function the model can call: its description, JSON-schema
+    parameters and ``run(dataset, arguments, visualizations)``."""
+    description: str
+    parameters: Dict[str, Any]
+    run: Callable[[ColonyDataset, Dict[str, Any], List[Dict[str, Any]]], Any]
+
+
+class AgentReply(NamedTuple):
+    """Final answer text, the visualizations requested, the number of tool
+    calls made and of completions requested."""
+    content: str
+    visualizations: List[Dict[str, Any]]
+    tool_calls: int
+    rounds: int
+
+
+def _object(properties: Dict[str, Any], required: tuple = ()) -> Dict[str, Any]:
+    return {"type": "object", "properties": properties, "required": list(required)}
+
+
+# =============================================================================
+# Tools
+# =============================================================================
+
+def _country_details(dataset, arguments, visualizations):
+    details = get_country_details(dataset.summary_df, dataset.cities_df, arguments["country"])
+    if details is None:
+        return {"error": f"No colonies recorded for {arguments['country']!r}",
+                "known_countries": list(dataset.countries)}
+    return details
+
+
+def _nearby(dataset, arguments, visualizations):
+    return find_nearby_colonies(
+        dataset.spatial, float(arguments["latitude"]), float(arguments["longitude"]),
+        k=int(arguments.get("k", 5)), radius_km=arguments.get("radius_km"),
+    )
+
+
+def _show_visualization(dataset, arguments, visualizations):
+    kind = arguments.get("visualization")
+    if kind not in VISUALIZATIONS:
+        return {"error": f"Unknown visualization {kind!r}, expected one of {list(VISUALIZATIONS)}"}
+    parameters = {key: value for key, value in arguments.items() if key != "visualization" and value is not None}
+    visualizations.append({"visualization": kind, "parameters": parameters})
+    return {"status": "The chart will be shown below your answer"}
+
+
+TOOLS: Dict[str, Tool] = {
+    "get_colony_statistics": Tool(
+        "Overall statistics: total colonies and regions, mean/median/max/min colonies per region, "
+        "the top 5 regions and how many regions fall in each intensity category.",
+        _object({}),
+        lambda dataset, arguments, visualizations: get_colony_statistics(dataset.summary_df),
+    ),
+    "get_regional_analysis": Tool(
+        "Markdown overview of the top regions, intensity categories and geographic spread.",
+        _object({}),
+        lambda dataset, arguments, visualizations: get_regional_analysis(dataset.summary_df),
+    ),
+    "get_country_details": Tool(
+        "Colony count, intensity category, coordinates and colony names of one modern country or region.",
+        _object({"country": {"type": "string", "description": "Country name as in the dataset, e.g. 'Italy'"}},
+                ("country",)),
+        _country_details,
+    ),
+    "compare_countries": Tool(
+        "Markdown table comparing the colony counts, categories and sample colonies of several countries.",
+        _object({"countries": {"type": "array", "items": {"type": "string"}, "minItems": 2}}, ("countries",)),
+        lambda dataset, arguments, visualizations: compare_countries(
+            dataset.summary_df, dataset.cities_df, arguments["countries"]),
+    ),
+    "search_colonies": Tool(
+        "Find colonies by name (accent-insensitive, falls back to fuzzy matching for misspellings). "
+        "Returns each match's colony and country.",
+        _object({
+            "query": {"type": "string"},
+            "limit": {"type": "integer", "minimum": 1, "maximum": 50, "default": 20},
+        }, ("query",)),
+        lambda dataset, arguments, visualizations: search_colonies(
+            dataset.cities_df, arguments["query"], limit=int(arguments.get("limit", 20))),
+    ),
+    "find_nearby_colonies": Tool(
+        "Colonies nearest to a point, with their distance in km; give radius_km to get every colony "
+        "within that distance instead of the k nearest.",
+        _object({
+            "latitude": {"type": "number"},
+            "longitude": {"type": "number"},
+            "k": {"type": "integer", "minimum": 1, "maximum": 50, "default": 5},
+            "radius_km": {"type": "number"},
+        }, ("latitude", "longitude")),
+        _nearby,
+    ),
+    "show_visualization": Tool(
+        "Show the user a chart below your answer: a colony map, a bar chart of the top regions, "
+        "the category distribution, or a comparison table of several countries.",
+        _object({
+            "visualization": {"type": "string", "enum": list(VISUALIZATIONS)},
+            "country": {"type": "string", "description": "Country to highlight (map, bar)"},
+            "countries": {"type": "array", "items": {"type": "string"}, "description": "For comparison"},
+            "projection": {"type": "string", "enum": list(PROJECTIONS)},
+            "top_n": {"type": "integer", "minimum": 1, "maximum": 50},
+        }, ("visualization",)),
+        _show_visualization,
+    ),
+}
+
+
+def tool_schemas() -> List[Dict[str, Any]]:
+    """The ``tools`` parameter of a chat completion request."""
+    return [
+        {"type": "function", "function": {"name": name, "description": tool.description,
+                                          "parameters": tool.parameters}}
+        for name, tool in TOOLS.items()
+    ]
+
+
+def _result_text(result: Any) -> str:
+    text = result if isinstance(result, str) else json.dumps(result, default=str, ensure_ascii=False)
+    if len(text) > MAX_RESULT_CHARS:
+        text = text[:MAX_RESULT_CHARS] + " ...(truncated)"
+    return text
+
+
+async def execute_tool_call(
+    dataset: ColonyDataset,
+    name: str,
+    arguments: str,
+    visualizations: List[Dict[str, Any]],
+) -> str:
+    """Run one tool call in a worker thread; failures are reported to the model as errors."""
+    tool = TOOLS.get(name)
+    if tool is None:
+        return _result_text({"error": f"Unknown tool {name!r}"})
+    try:
+        parsed = json.loads(arguments or "{}")
+        result = await asyncio.to_thread(tool.run, dataset, parsed, visualizations)
+    except Exception as error:
+        return _result_text({"error": f"{type(error).__name__}: {error}"})
+    return _result_text(result)
+
+
+# =============================================================================
+# Agent Loop
+# =============================================================================
+
+async def _stream_round(client, request: Dict[str, Any], on_token, separator: str = "") -> tuple:
+    #Stream one completion; returns (text, tool calls merged from their deltas).
+    #separator goes before the text, if there is any
+    response = await client.chat.completions.create(stream=True, **request)
+    parts: List[str] = []
+    calls: Dict[int, Dict[str, Any]] = {}
+    async for chunk in response:
+        # Some chunks (e.g. usage reports) carry no choices
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta
+        if delta.content:
+            token = delta.content if parts else separator + delta.content
+            parts.append(token)
+            if on_token is not None:
+                await on_token(token)
+        for call in delta.tool_calls or ():
+            merged = calls.setdefault(call.index, {"id": None, "name": "", "arguments": []})
+            if call.id:
+                merged["id"] = call.id
+            if call.function is not None:
+                merged["name"] += call.function.name or ""
+                merged["arguments"].append(call.function.arguments or "")
+    tool_calls = [
+        {"id": call["id"] or f"call_{index}", "type": "function",
+         "function": {"name": call["name"], "arguments": "".join(call["arguments"]) or "{}"}}
+        for index, call in sorted(calls.items())
+    ]
+    return "".join(parts), tool_calls
+
+
+async def run_agent(
+    client,
+    dataset: ColonyDataset,
+    messages: List[Dict[str, Any]],
+    model: str,
+    max_rounds: int = config.MAX_TOOL_ROUNDS,
+    on_token: Optional[Callable[[str], Awaitable[None]]] = None,
+    on_visualization: Optional[Callable[[Dict[str, Any]], Any]] = None,
+    **options: Any,
+) -> AgentReply:
+    """Answer the conversation in ``messages``, calling tools as the model asks.
+
+    ``client`` is an ``AsyncOpenAI`` client and ``options`` further request
+    parameters (``max_tokens``, ``temperature``). Answer text is passed to
+    ``on_token`` as it streams; text the model writes before a tool round
+    stays part of the answer. Each chart request is also passed to
+    ``on_visualization`` when its round ends, so the caller can start on it
+    while the model is still answering. ``messages`` is not modified.
+    """
+    messages = list(messages)
+    visualizations: List[Dict[str, Any]] = []
+    answer = ""
+    tool_calls = 0
+    rounds = 0
+    while True:
+        request = dict(options, model=model, messages=messages, tools=tool_schemas())
+        if rounds == max_rounds:
+            # Out of rounds: the model has to answer from what it has
+            request["tool_choice"] = "none"
+        text, calls = await _stream_round(client, request, on_token, "\n\n" if answer else "")
+        answer += text
+        rounds += 1
+        if not calls or rounds > max_rounds:
+            break
+        tool_calls += len(calls)
+        messages.append({"role": "assistant", "content": text.lstrip() or None, "tool_calls": calls})
+        # One list per call keeps charts in the order the model asked for them
+        requested = [[] for _ in calls]
+        results = await asyncio.gather(*(
+            execute_tool_call(dataset, call["function"]["name"], call["function"]["arguments"], charts)
+            for call, charts in zip(calls, requested)
+        ))
+        for charts in requested:
+            visualizations.extend(charts)
+            if on_visualization is not None:
+                for chart in charts:
+                    on_visualization(chart)
+        messages.extend(
+            {"role": "tool", "tool_call_id": call["id"], "content": result}
+            for call, result in zip(calls, results)
+        )
+    return AgentReply(answer, visualizations, tool_calls, rounds)
@@ -2,54 +2,106 @@
 
 This module contains utility functions that the agent can use to analyze data
 and generate visualizations.
+
+Plotly is only imported by the visualization tools, on their first call, so
+the analysis tools can be used without paying for it.
 """
 
-from typing import List, Dict, Any, Optional
+from typing import TYPE_CHECKING, List, Dict, Any, Optional
+import numpy as np
 import pandas as pd
-import plotly.graph_objects as go
-import plotly.express as px
+
+from colony_bands import DEFAULT_SCHEME
+from colony_cache import LRUCache, memoize, table_version
+from colony_search import DEFAULT_PAGE_SIZE, name_index
+from figure_factory import bar_chart, bubble_map, to_figure
+from figure_payload import compact_figure, to_json
+from figure_templates import Highlight, MapTemplate
+from GR03A_DataFrame import DATA_FILE, country_index, read_country_cities
+
+if TYPE_CHECKING:
+    import plotly.graph_objects as go
+    from colony_spatial import SpatialIndex
 
 
 # =============================================================================
 # Data Analysis Tools
 # =============================================================================
 
+# Summaries are reused until the table they were computed from changes
+_summary_cache = LRUCache(maxsize=64)
+
+
+@memoize(_summary_cache, copy_result=False)
+def summarize_colonies(df: pd.DataFrame) -> Dict[str, Any]:
+    """Compute every aggregate the analysis tools report in one pass over ``df``.
+
+    The result is shared between callers and must not be modified.
+    """
+    counts = df["No of Cities"].to_numpy()
+    # Most colonies first, ties in table order (same as nlargest)
+    ranked = df.iloc[np.argsort(-counts, kind="stable")][["Country", "No of Cities"]]
+    category_counts = df["Category"].value_counts()
+    return {
+        "total": int(counts.sum()),
+        "countries": len(counts),
+        "country_names": frozenset(df["Country"]),
+        "mean": float(counts.mean()),
+        "median": float(np.median(counts)),
+        "max": int(counts.max()),
+        "min": int(counts.min()),
+        "ranked": ranked.reset_index(drop=True),
+        # Bands with no countries are left out
+        "category_counts": {category: int(n) for category, n in category_counts.items() if n > 0},
+        "categories_seen": list(pd.unique(df["Category"].to_numpy())),
+    }
+
+
+@memoize(_summary_cache)
 def get_colony_statistics(df: pd.DataFrame) -> Dict[str, Any]:
     """Get overall statistics about colonies."""
+    summary = summarize_colonies(df)
     stats = {
-        "total_colonies": int(df["No of Cities"].sum()),
-        "total_countries": len(df),
-        "average_colonies": float(df["No of Cities"].mean()),
-        "median_colonies": float(df["No of Cities"].median()),
-        "max_colonies": int(df["No of Cities"].max()),
-        "min_colonies": int(df["No of Cities"].min()),
+        "total_colonies": summary["total"],
+        "total_countries": summary["countries"],
+        "average_colonies": summary["mean"],
+        "median_colonies": summary["median"],
+        "max_colonies": summary["max"],
+        "min_colonies": summary["min"],
     }
     
     # Top 5 countries
-    top_5 = df.nlargest(5, "No of Cities")[["Country", "No of Cities"]].to_dict("records")
-    stats["top_5_countries"] = top_5
+    stats["top_5_countries"] = summary["ranked"].head(5).to_dict("records")
     
-    # Category distribution
-    category_dist = df["Category"].value_counts().to_dict()
-    stats["category_distribution"] = category_dist
+    # Category distribution (bands with no countries are left out)
+    stats["category_distribution"] = dict(summary["category_counts"])
     
     return stats
 
 
-def get_country_details(df: pd.DataFrame, cities_df: pd.DataFrame, country: str) -> Optional[Dict[str, Any]]:
-    """Get detailed information about a specific country."""
+def get_country_details(
+    df: pd.DataFrame,
+    cities_df: Optional[pd.DataFrame],
+    country: str,
+    file: str = DATA_FILE,
+) -> Optional[Dict[str, Any]]:
+    """Get detailed information about a specific country.
+
+    Lookups go through the ``CountryIndex`` of the two tables, built on the
+    first call. When ``cities_df`` is None the city list is read from the
+    country's sections of ``file``, the source text ``df`` was built from,
+    instead of a preloaded table.
+    """
+    if cities_df is not None:
+        return country_index(df, cities_df).details(country)
+
     country_data = df[df["Country"] == country]
     
     if country_data.empty:
         return None
     
     country_row = country_data.iloc[0]
-    
-    # Get list of cities - handle both column name formats
-    country_col = "Country" if "Country" in cities_df.columns else "Country Name"
-    city_col = "City" if "City" in cities_df.columns else "City Name"
-    
-    cities = cities_df[cities_df[country_col] == country][city_col].tolist()
+    cities = read_country_cities(country, file)["City Name"].tolist()
     
     details = {
         "country": country,
@@ -64,30 +116,61 @@ def get_country_details(df: pd.DataFrame, cities_df: pd.DataFrame, country: str)
     return details
 
 
-def search_colonies(cities_df: pd.DataFrame, query: str) -> List[Dict[str, str]]:
-    """Search for colonies by name."""
+def search_colonies(
+    cities_df: pd.DataFrame,
+    query: str,
+    limit: Optional[int] = 20,
+    offset: int = 0,
+    fuzzy: Optional[bool] = None,
+) -> List[Dict[str, Any]]:
+    """Search for colonies by name.
+
+    Matching is case- and accent-insensitive and also covers each spelling of
+    "A/B" names. Results are ranked (exact, prefix, word prefix, substring)
+    and paginated with ``limit``/``offset``.
+
+    With ``fuzzy=True`` the closest names by edit distance are returned
+    instead, each with its ``Distance``, so misspellings such as "Naukratis"
+    still find "Naucratis". The default (``None``) falls back to fuzzy
+    matching when the substring search finds nothing.
+    """
     # Handle both column name formats
     country_col = "Country" if "Country" in cities_df.columns else "Country Name"
     city_col = "City" if "City" in cities_df.columns else "City Name"
     
-    # Case-insensitive search
-    mask = cities_df[city_col].str.contains(query, case=False, na=False)
-    results = cities_df[mask][[country_col, city_col]].head(20)
+    index = name_index(cities_df, city_col)
+    distances = None
+    if fuzzy:
+        rows = []
+    else:
+        rows = index.search(query, limit, offset).rows
+    if fuzzy or (fuzzy is None and not rows and offset == 0):
+        matches = index.fuzzy(query, limit or DEFAULT_PAGE_SIZE)
+        rows = [match.row for match in matches]
+        distances = [match.distance for match in matches]
+    
+    results = cities_df.iloc[rows][[country_col, city_col]]
     
     # Rename columns to standard format for output
     results = results.rename(columns={country_col: "Country", city_col: "City"})
+    if distances is not None:
+        results["Distance"] = distances
     
     return results.to_dict("records")
 
 
-def compare_countries(df: pd.DataFrame, cities_df: pd.DataFrame, countries: List[str]) -> str:
-    """Compare multiple countries side by side."""
-    comparison_data = []
-    
-    for country in countries:
-        details = get_country_details(df, cities_df, country)
-        if details:
-            comparison_data.append(details)
+def compare_countries(
+    df: pd.DataFrame,
+    cities_df: Optional[pd.DataFrame],
+    countries: List[str],
+    file: str = DATA_FILE,
+) -> str:
+    """Compare multiple countries side by side (see ``get_country_details()`` for ``file``)."""
+    if cities_df is not None:
+        found = country_index(df, cities_df).details_many(countries)
+    else:
+        found = [get_country_details(df, None, country, file) for country in countries]
+    comparison_data = [details for details in found if details]
     
     if not comparison_data:
         return "No data found for the specified countries."
@@ -104,81 +187,108 @@ def compare_countries(df: pd.DataFrame, cities_df: pd.DataFrame, countries: List
     return comparison
 
 
+def find_nearby_colonies(
+    spatial: "SpatialIndex",
+    latitude: float,
+    longitude: float,
+    k: int = 5,
+    radius_km: Optional[float] = None,
+) -> List[Dict[str, Any]]:
+    """Find the colonies closest to a point.
+
+    Returns the ``k`` nearest colonies, or every colony within ``radius_km``
+    when a radius is given, nearest first. ``exact`` is False for colonies
+    placed at their modern country's capital.
+    """
+    if radius_km is None:
+        found = spatial.nearest(latitude, longitude, k)
+    else:
+        found = spatial.within_radius(latitude, longitude, radius_km)
+
+    return [
+        {
+            "city": row["City Name"],
+            "country": row["Country Name"],
+            "distance_km": round(float(row["Distance (km)"]), 1),
+            "exact": bool(row["Exact"]),
+        }
+        for _, row in found.iterrows()
+    ]
+
+
 # =============================================================================
 # Visualization Tools
 # =============================================================================
 
-def generate_map_visualization(
-    df: pd.DataFrame, 
-    params: Dict[str, Any]
-) -> go.Figure:
-    """Generate a map visualization of colonies."""
-    selected_country = params.get("country")
-    projection = params.get("projection", "natural earth")
-    
-    plot_df = df.copy()
-    
-    # Add marker sizes
-    plot_df["marker_size"] = plot_df["No of Cities"] * 15
-    
-    # Adjust opacity if country is selected
-    plot_df["marker_opacity"] = 0.85
-    if selected_country and selected_country in plot_df["Country"].values:
-        plot_df.loc[plot_df["Country"] != selected_country, "marker_opacity"] = 0.25
-        plot_df.loc[plot_df["Country"] == selected_country, "marker_size"] *= 1.5
+# Marker sizes are colonies x 15; a selected country grows by half and the
+# others fade
+MAP_HIGHLIGHT = Highlight(idle_scale=15, scale=15, boost=1.5, size_max=50)
+
+# Base maps per table version and projection, highlighted by patching
+_template_cache = LRUCache(maxsize=16)
+
+
+@memoize(_template_cache, copy_result=False)
+def map_template(df: pd.DataFrame, projection: str = "natural earth") -> MapTemplate:
+    """Build the colony map with nothing selected, as a template to highlight.
+
+    The template is shared between callers and must not be modified.
+    """
+    counts = df["No of Cities"]
     
     # Create the map
-    fig = px.scatter_geo(
-        plot_df,
-        lon="Longitude",
-        lat="Latitude",
-        color="Category",
-        size="marker_size",
-        hover_name="Country",
-        hover_data={"No of Cities": True, "marker_size": False},
-        color_discrete_map={
-            "90+ colonies": "#C0392B",
-            "60 - 90 colonies": "#E67E22",
-            "30 - 60 colonies": "#F1C40F",
-            "10 - 20 colonies": "#27AE60",
-            "Less than 10 colonies": "#2980B9",
-        },
-        size_max=50,
-        projection=projection,
-    )
-    
-    # Update layout
-    fig.update_layout(
-        title=dict(
-            text="<b>Ancient Greek Colonies Distribution</b>",
-            x=0.5,
-            xanchor="center",
+    spec = bubble_map(
+        df["Latitude"],
+        df["Longitude"],
+        counts * MAP_HIGHLIGHT.idle_scale,
+        df["Category"],
+        df["Country"],
+        colors=DEFAULT_SCHEME.color_map,
+        size_max=MAP_HIGHLIGHT.size_max,
+        order=DEFAULT_SCHEME.display_order,
+        customdata=counts.to_numpy()[:, None],
+        hovertemplate=(
+            "<b>%{hovertext}</b><br><br>Category={group}<br>Latitude=%{lat}<br>"
+            "Longitude=%{lon}<br>No of Cities=%{customdata[0]}<extra></extra>"
         ),
-        geo=dict(
-            projection={"type": projection},
-            showland=True,
-            landcolor="#E8D3A5",
-            showocean=True,
-            oceancolor="#5DADE2",
-            showcoastlines=True,
-            coastlinecolor="#0F5C7E",
+        layout=dict(
+            title=dict(
+                text="<b>Ancient Greek Colonies Distribution</b>",
+                x=0.5,
+                xanchor="center",
+            ),
+            geo=dict(
+                projection={"type": projection},
+                showland=True,
+                landcolor="#E8D3A5",
+                showocean=True,
+                oceancolor="#5DADE2",
+                showcoastlines=True,
+                coastlinecolor="#0F5C7E",
+            ),
+            margin=dict(l=0, r=0, t=60, b=0),
+            height=600,
         ),
-        margin=dict(l=0, r=0, t=60, b=0),
-        height=600,
     )
     
-    # Apply opacity
-    for trace in fig.data:
-        trace.marker.opacity = plot_df.loc[plot_df["Category"] == trace.name, "marker_opacity"].tolist()
-    
-    return fig
+    return MapTemplate(spec, dict(zip(df["Country"], counts)), MAP_HIGHLIGHT)
 
 
-def generate_bar_chart(
-    df: pd.DataFrame,
+def _render_map(df: pd.DataFrame, params: Dict[str, Any]) -> Dict[str, Any]:
+    #Figure dict of the map, sharing unchanged parts with the cached template
+    template = map_template(df, params.get("projection") or "natural earth")
+    return template.render(params.get("country"))
+
+
+def generate_map_visualization(
+    df: pd.DataFrame, 
     params: Dict[str, Any]
-) -> go.Figure:
-    """Generate a bar chart of top countries."""
+) -> "go.Figure":
+    """Generate a map visualization of colonies."""
+    return to_figure(_render_map(df, params))
+
+
+def _bar_chart(df: pd.DataFrame, params: Dict[str, Any]) -> Dict[str, Any]:
     top_n = params.get("top_n", 10)
     selected_country = params.get("country")
     
@@ -186,145 +296,178 @@ def generate_bar_chart(
     df_sorted = df.nlargest(top_n, "No of Cities")
     
     # Color bars
-    colors = []
-    for country in df_sorted["Country"]:
-        if selected_country and country == selected_country:
-            colors.append("#E67E22")
-        else:
-            colors.append("#2A8CCB")
-    
-    fig = go.Figure(
-        data=[
-            go.Bar(
-                x=df_sorted["Country"],
-                y=df_sorted["No of Cities"],
-                marker=dict(
-                    color=colors,
-                    line=dict(color="rgba(255,255,255,0.6)", width=1)
-                ),
-                text=df_sorted["No of Cities"],
-                textposition="outside",
-            )
-        ]
+    colors = np.where(df_sorted["Country"] == selected_country, "#E67E22", "#2A8CCB").tolist()
+    
+    return bar_chart(
+        df_sorted["Country"],
+        df_sorted["No of Cities"],
+        marker=dict(
+            color=colors,
+            line=dict(color="rgba(255,255,255,0.6)", width=1)
+        ),
+        text=df_sorted["No of Cities"],
+        textposition="outside",
+        layout=dict(
+            title=dict(text=f"<b>Top {top_n} Regions by Colony Count</b>"),
+            xaxis=dict(title=dict(text="Country/Region"), tickangle=-45),
+            yaxis=dict(title=dict(text="Number of Colonies")),
+            height=500,
+            margin=dict(l=50, r=50, t=80, b=100),
+        ),
     )
+
+
+def generate_bar_chart(
+    df: pd.DataFrame,
+    params: Dict[str, Any]
+) -> "go.Figure":
+    """Generate a bar chart of top countries."""
+    return to_figure(_bar_chart(df, params))
+
+
+def _category_distribution(df: pd.DataFrame, params: Dict[str, Any]) -> Dict[str, Any]:
+    category_colors = DEFAULT_SCHEME.color_map
     
-    fig.update_layout(
-        title=f"<b>Top {top_n} Regions by Colony Count</b>",
-        xaxis_title="Country/Region",
-        yaxis_title="Number of Colonies",
-        height=500,
-        margin=dict(l=50, r=50, t=80, b=100),
-        xaxis=dict(tickangle=-45),
-    )
+    category_counts = df.groupby("Category").size().reindex(DEFAULT_SCHEME.display_order, fill_value=0)
     
-    return fig
+    return bar_chart(
+        category_counts.index,
+        category_counts.values,
+        marker=dict(
+            color=[category_colors[cat] for cat in category_counts.index],
+            line=dict(color="rgba(255,255,255,0.6)", width=1),
+        ),
+        text=category_counts.values,
+        textposition="outside",
+        layout=dict(
+            title=dict(text="<b>Distribution Across Colony Intensity Bands</b>"),
+            xaxis=dict(title=dict(text="Colony Range"), tickangle=-45),
+            yaxis=dict(title=dict(text="Number of Countries")),
+            height=500,
+            margin=dict(l=50, r=50, t=80, b=120),
+        ),
+    )
 
 
 def generate_category_distribution(
     df: pd.DataFrame,
     params: Dict[str, Any]
-) -> go.Figure:
+) -> "go.Figure":
     """Generate a category distribution chart."""
-    category_order = [
-        "90+ colonies",
-        "60 - 90 colonies", 
-        "30 - 60 colonies",
-        "10 - 20 colonies",
-        "Less than 10 colonies"
-    ]
-    
-    category_colors = {
-        "90+ colonies": "#C0392B",
-        "60 - 90 colonies": "#E67E22",
-        "30 - 60 colonies": "#F1C40F",
-        "10 - 20 colonies": "#27AE60",
-        "Less than 10 colonies": "#2980B9",
-    }
-    
-    category_counts = df.groupby("Category").size().reindex(category_order, fill_value=0)
-    
-    fig = go.Figure(
-        data=[
-            go.Bar(
-                x=category_counts.index,
-                y=category_counts.values,
-                marker=dict(
-                    color=[category_colors[cat] for cat in category_counts.index],
-                    line=dict(color="rgba(255,255,255,0.6)", width=1),
-                ),
-                text=category_counts.values,
-                textposition="outside",
-            )
-        ]
-    )
-    
-    fig.update_layout(
-        title="<b>Distribution Across Colony Intensity Bands</b>",
-        xaxis_title="Colony Range",
-        yaxis_title="Number of Countries",
-        height=500,
-        margin=dict(l=50, r=50, t=80, b=120),
-        xaxis=dict(tickangle=-45),
-    )
-    
-    return fig
+    return to_figure(_category_distribution(df, params))
 
 
 def generate_comparison_chart(
     df: pd.DataFrame,
     countries: List[str]
-) -> go.Figure:
+) -> "go.Figure":
     """Generate a comparison chart for specific countries."""
     comparison_df = df[df["Country"].isin(countries)]
     
-    fig = go.Figure(
-        data=[
-            go.Bar(
-                x=comparison_df["Country"],
-                y=comparison_df["No of Cities"],
-                marker=dict(
-                    color="#2A8CCB",
-                    line=dict(color="rgba(255,255,255,0.6)", width=1)
-                ),
-                text=comparison_df["No of Cities"],
-                textposition="outside",
-            )
-        ]
-    )
-    
-    fig.update_layout(
-        title="<b>Country Comparison</b>",
-        xaxis_title="Country",
-        yaxis_title="Number of Colonies",
-        height=400,
-    )
-    
-    return fig
+    return to_figure(bar_chart(
+        comparison_df["Country"],
+        comparison_df["No of Cities"],
+        marker=dict(
+            color="#2A8CCB",
+            line=dict(color="rgba(255,255,255,0.6)", width=1)
+        ),
+        text=comparison_df["No of Cities"],
+        textposition="outside",
+        layout=dict(
+            title=dict(text="<b>Country Comparison</b>"),
+            xaxis=dict(title=dict(text="Country")),
+            yaxis=dict(title=dict(text="Number of Colonies")),
+            height=400,
+        ),
+    ))
+
+
+# =============================================================================
+# Figure Cache
+# =============================================================================
+
+# Serialized figures kept for repeat requests; bounded by count and by the
+# size of their JSON
+FIGURE_CACHE_ENTRIES = 128
+FIGURE_CACHE_BYTES = 32 * 1024 * 1024
+
+_figure_cache = LRUCache(maxsize=FIGURE_CACHE_ENTRIES, max_bytes=FIGURE_CACHE_BYTES, sizeof=len)
+
+# Figure dict builders behind generate_map_visualization, generate_bar_chart
+# and generate_category_distribution
+FIGURE_BUILDERS = {
+    "map": _render_map,
+    "bar": _bar_chart,
+    "category": _category_distribution,
+}
+
+
+def _figure_params(kind: str, df: pd.DataFrame, params: Dict[str, Any]) -> tuple:
+    """Reduce request parameters to the ones that change the figure.
+
+    Unknown countries highlight nothing, so they are dropped; defaults are
+    filled in so "no projection" and "natural earth" share an entry.
+    """
+    country = params.get("country")
+    if country not in summarize_colonies(df)["country_names"]:
+        country = None
+    if kind == "map":
+        return (("country", country), ("projection", params.get("projection") or "natural earth"))
+    if kind == "bar":
+        return (("country", country), ("top_n", int(params.get("top_n", 10))))
+    return ()
+
+
+def figure_json(kind: str, df: pd.DataFrame, params: Optional[Dict[str, Any]] = None) -> str:
+    """Return the chart ``kind`` ("map", "bar" or "category") as Plotly JSON.
+
+    Figures are laid out to fill their container, trimmed for the wire
+    (see ``figure_payload``) and cached per table version and normalized
+    parameters, so repeat requests are served without building anything.
+    """
+    if kind not in FIGURE_BUILDERS:
+        raise ValueError(f"Unknown figure kind: {kind!r}")
+    normalized = _figure_params(kind, df, params or {})
+    key = ((table_version(df),), "figure", kind, normalized)
+
+    cached = _figure_cache.get(key)
+    if cached is None:
+        # Serialize the trimmed figure dict directly, without a Figure object
+        spec = compact_figure(FIGURE_BUILDERS[kind](df, dict(normalized)))
+        spec["layout"]["autosize"] = True
+        cached = to_json(spec)
+        _figure_cache.put(key, cached)
+    return cached
+
+
+def figure_cache_stats() -> Dict[str, Any]:
+    """Entries, bytes and hit/miss counters of the figure cache."""
+    return _figure_cache.stats()
 
 
+@memoize(_summary_cache)
 def get_regional_analysis(df: pd.DataFrame) -> str:
     """Generate a regional analysis summary."""
-    total_colonies = int(df["No of Cities"].sum())
+    summary = summarize_colonies(df)
+    total_colonies = summary["total"]
     
     analysis = "## Regional Analysis\n\n"
     
     # Top regions
-    top_3 = df.nlargest(3, "No of Cities")
     analysis += "### Top 3 Regions:\n"
-    for _, row in top_3.iterrows():
-        percentage = (row["No of Cities"] / total_colonies) * 100
-        analysis += f"- **{row['Country']}**: {int(row['No of Cities'])} colonies ({percentage:.1f}% of total)\n"
+    for country, count in summary["ranked"].head(3).itertuples(index=False, name=None):
+        percentage = (count / total_colonies) * 100
+        analysis += f"- **{country}**: {int(count)} colonies ({percentage:.1f}% of total)\n"
     
     # Category breakdown
     analysis += "\n### By Intensity:\n"
-    for category in df["Category"].unique():
-        count = len(df[df["Category"] == category])
-        analysis += f"- **{category}**: {count} regions\n"
+    for category in summary["categories_seen"]:
+        analysis += f"- **{category}**: {summary['category_counts'].get(category, 0)} regions\n"
     
     # Geographic spread
     analysis += f"\n### Geographic Spread:\n"
-    analysis += f"- Total regions with colonies: {len(df)}\n"
-    analysis += f"- Average colonies per region: {df['No of Cities'].mean():.1f}\n"
-    analysis += f"- Median colonies per region: {df['No of Cities'].median():.0f}\n"
+    analysis += f"- Total regions with colonies: {summary['countries']}\n"
+    analysis += f"- Average colonies per region: {summary['mean']:.1f}\n"
+    analysis += f"- Median colonies per region: {summary['median']:.0f}\n"
     
     return analysis
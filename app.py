@@ -4,21 +4,26 @@ This is the main Chainlit application file that implements an agentic chat inter
 for exploring Ancient Greek colonization data using OpenRouter LLMs.
 """
 
-import json
-from typing import Optional, Dict, List, Any
+import asyncio
+from typing import Optional, Callable, Dict, List, Any
+import httpx
 import pandas as pd
-from openai import OpenAI
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
 
 import chainlit as cl
 from chainlit.input_widget import Select
 
 import config
-from GR03A_DataFrame import create_df_for_viz, txt_to_dataframe
+from agent_loop import AgentReply, run_agent
+from chat_history import ChatHistory, estimate_tokens, prompt_budget
+from colony_cache import LRUCache, memoize
+from intent_router import IntentRouter
+from visualization_stream import VisualizationStream
+from GR03A_DataFrame import ColonyDataset, CorpusReloader, load_colony_dataset
 from agent_tools import (
     compare_countries,
-    generate_map_visualization,
-    generate_bar_chart,
-    generate_category_distribution,
+    figure_json,
+    summarize_colonies,
 )
 
 
@@ -26,8 +31,20 @@ from agent_tools import (
 # OpenRouter Client Setup
 # =============================================================================
 
-def get_openrouter_client() -> OpenAI:
-    """Initialize and return OpenRouter client."""
+# One async client per process: every chat session shares its connection pool
+_client: Optional[AsyncOpenAI] = None
+
+
+def get_openrouter_client() -> AsyncOpenAI:
+    """Return the process-wide OpenRouter client, creating it on first use.
+
+    Requests are awaited on the event loop, so a slow completion only holds
+    its own connection from the shared pool instead of blocking other chats.
+    """
+    global _client
+    if _client is not None:
+        return _client
+    
     api_key = config.OPENROUTER_API_KEY
     
     if not api_key:
@@ -36,36 +53,106 @@ def get_openrouter_client() -> OpenAI:
             "Get your API key from: https://openrouter.ai/keys"
         )
     
-    return OpenAI(
+    timeout = httpx.Timeout(config.LLM_READ_TIMEOUT, connect=config.LLM_CONNECT_TIMEOUT)
+    _client = AsyncOpenAI(
         base_url=config.OPENROUTER_BASE_URL,
         api_key=api_key,
         default_headers={
             "HTTP-Referer": config.OPENROUTER_SITE_URL,
             "X-Title": config.OPENROUTER_APP_NAME,
-        }
+        },
+        timeout=timeout,
+        max_retries=config.LLM_MAX_RETRIES,
+        http_client=DefaultAsyncHttpxClient(
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=config.LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=config.LLM_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=config.LLM_KEEPALIVE_EXPIRY,
+            ),
+        ),
     )
+    return _client
+
+
+async def close_openrouter_client():
+    """Close the shared client's pooled connections."""
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
 
 
 # =============================================================================
 # Data Loading
 # =============================================================================
 
-def load_data() -> tuple[pd.DataFrame, pd.DataFrame]:
-    """Load and cache the colonization data."""
-    df = create_df_for_viz()
-    cities_df = txt_to_dataframe()
-    return df, cities_df
+# Loaded once per process and shared read-only by every chat session
+_dataset_task: Optional[asyncio.Task] = None
+
+
+def _load_dataset_source():
+    """Load the dataset, or start a reloader that keeps it current."""
+    if config.ENABLE_DATA_RELOAD:
+        reloader = CorpusReloader(config.DATA_FILE)
+        reloader.watch(config.DATA_RELOAD_INTERVAL)
+        return reloader
+    return load_colony_dataset()
+
+
+async def get_shared_dataset() -> ColonyDataset:
+    """Return the process-wide dataset, loading it off the event loop on first use.
+
+    Concurrent callers during the first load all await the same task, so the
+    data is parsed (or read from the on-disk cache) exactly once. With
+    ``ENABLE_DATA_RELOAD`` each call returns the latest reloaded snapshot.
+    """
+    global _dataset_task
+    if _dataset_task is None:
+        _dataset_task = asyncio.ensure_future(asyncio.to_thread(_load_dataset_source))
+    try:
+        source = await asyncio.shield(_dataset_task)
+        return source.dataset if isinstance(source, CorpusReloader) else source
+    except Exception:
+        # Let the next session retry instead of caching the failure
+        _dataset_task = None
+        raise
 
 
 # =============================================================================
 # Agent System
 # =============================================================================
 
+# Answers exact dataset questions without an LLM call
+_router = IntentRouter()
+
+
+def report_router_stats():
+    """Print how many messages the intent router answered since the process started."""
+    stats = _router.stats()
+    total = stats["hits"] + stats["misses"]
+    intents = ", ".join(f"{intent}: {hits}" for intent, hits in sorted(stats["intents"].items()))
+    print(f"Intent router: {stats['hits']}/{total} messages answered locally "
+          f"({stats['hit_rate']:.0%}){f' - {intents}' if intents else ''}")
+
+
+@cl.on_app_shutdown
+async def shutdown():
+    """Report the router's hit rate and close the shared client's connections."""
+    report_router_stats()
+    await close_openrouter_client()
+
+# The agent context only changes with the dataset, so it is built once per version
+_context_cache = LRUCache(maxsize=8)
+
+
+@memoize(_context_cache, copy_result=False)
 def create_agent_context(df: pd.DataFrame, cities_df: pd.DataFrame) -> str:
     """Create context about the available data for the agent."""
-    total_colonies = int(df["No of Cities"].sum())
-    total_countries = len(df)
-    top_country = df.loc[df["No of Cities"].idxmax()]
+    summary = summarize_colonies(df)
+    total_colonies = summary["total"]
+    total_countries = summary["countries"]
+    top_country = summary["ranked"].iloc[0]
     
     context = f"""
 === DATA CONTEXT ===
@@ -76,7 +163,7 @@ Total Countries/Regions: {total_countries}
 Most Colonized Region: {top_country['Country']} ({int(top_country['No of Cities'])} colonies)
 
 Countries with most colonies:
-{df.nlargest(5, 'No of Cities')[['Country', 'No of Cities']].to_string(index=False)}
+{summary["ranked"].head(5).to_string(index=False)}
 
 You can help users by:
 1. Answering questions about specific countries or regions
@@ -84,33 +171,48 @@ You can help users by:
 3. Generating visualizations (suggest when appropriate)
 4. Explaining historical patterns
 
-When a user asks for visualizations, respond with a JSON block in this format:
+{VISUALIZATION_INSTRUCTIONS if not config.ENABLE_TOOL_CALLING else TOOL_INSTRUCTIONS}"""
+    return context
+
+
+# How the model asks for charts without tool calling
+VISUALIZATION_INSTRUCTIONS = """When a user asks for visualizations, respond with a JSON block in this format:
 ```json
-{{
+{
   "visualization": "map" | "bar" | "category" | "comparison",
-  "parameters": {{
+  "parameters": {
     "country": "Country Name" (optional),
     "countries": ["Country1", "Country2"] (for comparison),
     "projection": "natural earth" | "orthographic" | "mercator"
-  }}
-}}
+  }
+}
 ```
 """
-    return context
+
+TOOL_INSTRUCTIONS = """Use the tools for any figure you report (counts, colony names, rankings) rather than
+estimating it, and request independent lookups together in one round. When a user asks
+for a visualization, call show_visualization; the chart appears below your answer.
+"""
 
 
 async def call_llm(
     messages: List[Dict[str, str]],
     model: Optional[str] = None,
-    stream: bool = True
+    stream: bool = True,
+    on_visualization: Optional[Callable[[Dict[str, Any]], Any]] = None,
 ) -> str:
-    """Call the LLM via OpenRouter."""
-    client = cl.user_session.get("openrouter_client")
+    """Call the LLM via OpenRouter.
+
+    Visualization requests (fenced JSON blocks) are passed to
+    ``on_visualization`` as soon as they have streamed and are not shown in
+    the message; the returned text is the response as written.
+    """
+    client = get_openrouter_client()
     model = model or cl.user_session.get("model", config.DEFAULT_MODEL)
     model_config = config.AVAILABLE_MODELS.get(model, {})
     
     try:
-        response = client.chat.completions.create(
+        response = await client.chat.completions.create(
             model=model,
             messages=messages,
             max_tokens=model_config.get("max_tokens", config.DEFAULT_MAX_TOKENS),
@@ -122,17 +224,28 @@ async def call_llm(
             msg = cl.Message(content="")
             await msg.send()
             
-            full_response = ""
+            parts = []
+            visualizations = VisualizationStream(on_visualization)
             async for chunk in response:
-                if chunk.choices[0].delta.content:
+                # Some chunks (e.g. usage reports) carry no choices
+                if chunk.choices and chunk.choices[0].delta.content:
                     content = chunk.choices[0].delta.content
-                    full_response += content
-                    await msg.stream_token(content)
+                    parts.append(content)
+                    shown = visualizations.feed(content)
+                    if shown:
+                        await msg.stream_token(shown)
             
+            rest = visualizations.close()
+            if rest:
+                await msg.stream_token(rest)
             await msg.update()
-            return full_response
+            return "".join(parts)
         else:
-            return response.choices[0].message.content
+            content = response.choices[0].message.content
+            visualizations = VisualizationStream(on_visualization)
+            visualizations.feed(content or "")
+            visualizations.close()
+            return content
             
     except Exception as e:
         error_msg = f"Error calling LLM: {str(e)}"
@@ -140,22 +253,77 @@ async def call_llm(
         raise
 
 
-def extract_visualization_request(response: str) -> Optional[Dict[str, Any]]:
-    """Extract visualization request from LLM response if present."""
-    if "```json" in response:
-        try:
-            # Extract JSON block
-            start = response.find("```json") + 7
-            end = response.find("```", start)
-            json_str = response[start:end].strip()
-            viz_request = json.loads(json_str)
+async def call_agent(
+    messages: List[Dict[str, str]],
+    dataset: ColonyDataset,
+    model: Optional[str] = None,
+    stream: bool = True,
+    on_visualization: Optional[Callable[[Dict[str, Any]], Any]] = None,
+) -> AgentReply:
+    """Answer via OpenRouter, letting the model call the ``agent_loop`` tools.
+
+    Charts requested through ``show_visualization`` are passed to
+    ``on_visualization`` as soon as their tool round ends.
+    """
+    client = get_openrouter_client()
+    model = model or cl.user_session.get("model", config.DEFAULT_MODEL)
+    model_config = config.AVAILABLE_MODELS.get(model, {})
+    
+    try:
+        msg = cl.Message(content="")
+        if stream:
+            await msg.send()
+        reply = await run_agent(
+            client,
+            dataset,
+            messages,
+            model,
+            on_token=msg.stream_token if stream else None,
+            on_visualization=on_visualization,
+            max_tokens=model_config.get("max_tokens", config.DEFAULT_MAX_TOKENS),
+            temperature=model_config.get("temperature", config.DEFAULT_TEMPERATURE),
+        )
+        if stream:
+            await msg.update()
+        else:
+            msg.content = reply.content
+            await msg.send()
+        return reply
             
-            if "visualization" in viz_request:
-                return viz_request
-        except (json.JSONDecodeError, ValueError):
-            # If JSON parsing fails, return None to indicate no valid visualization request was found
-            pass
-    return None
+    except Exception as e:
+        error_msg = f"Error calling LLM: {str(e)}"
+        await cl.Message(content=f"❌ {error_msg}").send()
+        raise
+
+
+def model_prompt_budget(model: str) -> int:
+    """Token budget for a whole prompt to ``model`` (see ``config.MAX_PROMPT_TOKENS``)."""
+    return prompt_budget(
+        config.AVAILABLE_MODELS.get(model, {}),
+        cap=config.MAX_PROMPT_TOKENS,
+        default_window=config.DEFAULT_CONTEXT_WINDOW,
+        default_reply=config.DEFAULT_MAX_TOKENS,
+    )
+
+
+async def summarize_history(previous_summary: str, messages: List[Dict[str, str]]) -> str:
+    """Fold ``messages`` into the rolling summary of a conversation.
+
+    Runs in the background between turns, so it never posts to the chat.
+    """
+    transcript = "\n\n".join(f"{message['role'].upper()}: {message['content']}" for message in messages)
+    if previous_summary:
+        transcript = f"PREVIOUS SUMMARY: {previous_summary}\n\n{transcript}"
+    response = await get_openrouter_client().chat.completions.create(
+        model=config.SUMMARY_MODEL,
+        messages=[
+            {"role": "system", "content": config.SUMMARY_PROMPT},
+            {"role": "user", "content": transcript},
+        ],
+        max_tokens=config.SUMMARY_MAX_TOKENS,
+        temperature=0.2,
+    )
+    return response.choices[0].message.content or ""
 
 
 # =============================================================================
@@ -165,13 +333,13 @@ def extract_visualization_request(response: str) -> Optional[Dict[str, Any]]:
 @cl.on_chat_start
 async def start():
     """Initialize chat session."""
-    # Load data
-    df, cities_df = load_data()
+    # Shared dataset - loaded once per process, not per session
+    dataset = await get_shared_dataset()
+    df, cities_df = dataset.summary_df, dataset.cities_df
     
-    # Initialize OpenRouter client
+    # Make sure the shared OpenRouter client can be created
     try:
-        client = get_openrouter_client()
-        cl.user_session.set("openrouter_client", client)
+        get_openrouter_client()
     except ValueError as e:
         await cl.Message(
             content=f"❌ **Configuration Error**\n\n{str(e)}\n\n"
@@ -179,15 +347,14 @@ async def start():
         ).send()
         return
     
-    # Store data in session
-    cl.user_session.set("df", df)
-    cl.user_session.set("cities_df", cities_df)
+    # Session state (the dataset itself stays process-wide)
     cl.user_session.set("model", config.DEFAULT_MODEL)
-    cl.user_session.set("chat_history", [])
+    cl.user_session.set("chat_history", ChatHistory(max_messages=config.MAX_CHAT_HISTORY))
     
     # Create agent context
     context = create_agent_context(df, cities_df)
     cl.user_session.set("agent_context", context)
+    cl.user_session.set("agent_context_version", dataset.version)
     
     # Welcome message
     welcome_message = f"""# Welcome to the Ancient Greek Colonization Explorer! 🏛️
@@ -253,74 +420,118 @@ async def main(message: cl.Message):
     """Handle incoming messages."""
     user_message = message.content
     
-    # Get session data
-    df = cl.user_session.get("df")
-    cities_df = cl.user_session.get("cities_df")
+    # Get shared data and session state
+    dataset = await get_shared_dataset()
+    df, cities_df = dataset.summary_df, dataset.cities_df
     agent_context = cl.user_session.get("agent_context")
-    chat_history = cl.user_session.get("chat_history", [])
+    if cl.user_session.get("agent_context_version") != dataset.version:
+        # The corpus was reloaded since this session last built its context
+        agent_context = create_agent_context(df, cities_df)
+        cl.user_session.set("agent_context", agent_context)
+        cl.user_session.set("agent_context_version", dataset.version)
+    chat_history = cl.user_session.get("chat_history")
+    if chat_history is None:
+        chat_history = ChatHistory(max_messages=config.MAX_CHAT_HISTORY)
+        cl.user_session.set("chat_history", chat_history)
+    
+    # Exact dataset questions are answered locally, without an LLM round trip
+    route = _router.route(user_message, dataset) if config.ENABLE_INTENT_ROUTER else None
+    if route is not None:
+        if route.visualizations:
+            await generate_visualization(route.visualizations[0], df, cities_df, content=route.content)
+            for viz_request in route.visualizations[1:]:
+                await generate_visualization(viz_request, df, cities_df)
+        else:
+            await cl.Message(content=route.content).send()
+        # Kept in the history so the LLM can follow up on it
+        chat_history.append("user", user_message)
+        chat_history.append("assistant", route.content)
+        return
     
-    # Build messages for LLM
-    messages = [
-        {"role": "system", "content": config.AGENT_SYSTEM_PROMPT + "\n" + agent_context}
-    ]
+    # Build messages for LLM: system prompt, rolling summary and the newest
+    # turns that fit the model's budget (never waits on a summary in progress)
+    system_prompt = config.AGENT_SYSTEM_PROMPT + "\n" + agent_context
+    budget = model_prompt_budget(cl.user_session.get("model", config.DEFAULT_MODEL))
+    messages = chat_history.build(system_prompt, user_message, budget)
     
-    # Add chat history (keep last N messages)
-    messages.extend(chat_history[-config.MAX_CHAT_HISTORY:])
+    # Charts are built and sent as soon as they are requested, while the
+    # rest of the answer is still streaming
+    charts = []
     
-    # Add current user message
-    messages.append({"role": "user", "content": user_message})
+    def show_chart(viz_request: Dict[str, Any]):
+        charts.append(asyncio.ensure_future(generate_visualization(viz_request, df, cities_df)))
     
     # Call LLM
     try:
-        response = await call_llm(messages, stream=config.ENABLE_STREAMING)
-        
-        # Update chat history
-        chat_history.append({"role": "user", "content": user_message})
-        chat_history.append({"role": "assistant", "content": response})
-        cl.user_session.set("chat_history", chat_history)
+        if config.ENABLE_TOOL_CALLING:
+            reply = await call_agent(messages, dataset, stream=config.ENABLE_STREAMING, on_visualization=show_chart)
+            response = reply.content
+        else:
+            response = await call_llm(messages, stream=config.ENABLE_STREAMING, on_visualization=show_chart)
         
-        # Check for visualization requests
-        viz_request = extract_visualization_request(response)
-        if viz_request:
-            await generate_visualization(viz_request, df, cities_df)
+        # Update chat history, then summarize older turns before the next one
+        chat_history.append("user", user_message)
+        chat_history.append("assistant", response)
+        chat_history.compact(summarize_history, budget - estimate_tokens(system_prompt))
             
     except Exception as e:
         await cl.Message(
             content=f"❌ An error occurred: {str(e)}\n\nPlease try again."
         ).send()
+    finally:
+        # Charts requested before a failure still finish and report their errors
+        await asyncio.gather(*charts)
+
 
+# Message text and element name for each cached figure kind
+FIGURE_MESSAGES = {
+    "map": ("📍 Here's the map visualization:", "colony_map"),
+    "bar": ("📊 Here's the bar chart:", "bar_chart"),
+    "category": ("📈 Here's the category distribution:", "category_chart"),
+}
 
-async def generate_visualization(viz_request: Dict[str, Any], df: pd.DataFrame, cities_df: pd.DataFrame):
-    """Generate and send a visualization based on the request."""
+
+def plotly_element(spec: str, **kwargs: Any) -> cl.Plotly:
+    """``cl.Plotly`` showing an already serialized figure (see ``figure_json``).
+
+    The element goes through its normal initialisation with an empty figure,
+    which takes about a millisecond, and then takes the cached JSON as its
+    content, so the real figure is not re-validated or re-serialized.
+    """
+    import plotly.graph_objects as go
+
+    element = cl.Plotly(figure=go.Figure(), **kwargs)
+    element.content = spec
+    return element
+
+
+async def generate_visualization(
+    viz_request: Dict[str, Any],
+    df: pd.DataFrame,
+    cities_df: pd.DataFrame,
+    content: Optional[str] = None,
+):
+    """Generate and send a visualization based on the request.
+
+    ``content`` replaces the default message text above the chart.
+    """
     viz_type = viz_request.get("visualization")
     params = viz_request.get("parameters", {})
     
     try:
-        if viz_type == "map":
-            fig = generate_map_visualization(df, params)
-            await cl.Message(
-                content="📍 Here's the map visualization:",
-                elements=[cl.Plotly(figure=fig, name="colony_map", display="inline")]
-            ).send()
-            
-        elif viz_type == "bar":
-            fig = generate_bar_chart(df, params)
-            await cl.Message(
-                content="📊 Here's the bar chart:",
-                elements=[cl.Plotly(figure=fig, name="bar_chart", display="inline")]
-            ).send()
-            
-        elif viz_type == "category":
-            fig = generate_category_distribution(df, params)
-            await cl.Message(
-                content="📈 Here's the category distribution:",
-                elements=[cl.Plotly(figure=fig, name="category_chart", display="inline")]
-            ).send()
+        if viz_type in FIGURE_MESSAGES:
+            default_content, name = FIGURE_MESSAGES[viz_type]
+            # Built off the event loop, so streaming answers keep flowing
+            spec = await asyncio.to_thread(figure_json, viz_type, df, params)
+            figure = plotly_element(spec, name=name, display="inline")
+            await cl.Message(content=content or default_content, elements=[figure]).send()
             
         elif viz_type == "comparison":
             countries = params.get("countries", [])
             if countries:
                 comparison_data = compare_countries(df, cities_df, countries)
+                if content:
+                    comparison_data = f"{content}\n\n{comparison_data}"
                 await cl.Message(content=comparison_data).send()
                 
     except Exception as e:
@@ -0,0 +1,179 @@
+"""Figure build micro-benchmark for Ancient Greek Colonization Explorer
+
+Times each chart of ``figure_factory`` against the ``plotly.express`` /
+validated ``graph_objects`` code it replaced, on the real country summary
+and on synthetic summaries with more countries:
+
+    python benchmark_figures.py --sizes 100 1000 --repeat 20
+
+Times are the median of ``--repeat`` builds, in milliseconds, after one
+warm-up build (so Plotly's import and template loading are not counted).
+"""
+
+import argparse
+import json
+import statistics
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from colony_bands import DEFAULT_SCHEME, assign_bands
+from figure_factory import bar_chart, bubble_map, concentration_curve, group_treemap
+
+
+COLORS = DEFAULT_SCHEME.color_map
+DEFAULT_SIZES = (100, 1_000)
+
+
+def synthetic_summary(countries: int, seed: int = 0) -> pd.DataFrame:
+    """A country summary table shaped like ``create_df_for_viz()`` output."""
+    rng = np.random.default_rng(seed)
+    counts = np.maximum(1, (100 / np.arange(1, countries + 1) ** 0.8).astype('int32'))
+    summary = pd.DataFrame({
+        'Country': [f'Region {i}' for i in range(1, countries + 1)],
+        'No of Cities': counts,
+        'Latitude': rng.uniform(-60, 70, countries).astype('float32'),
+        'Longitude': rng.uniform(-180, 180, countries).astype('float32'),
+    })
+    summary['Category'] = assign_bands(summary['No of Cities'])
+    return summary
+
+
+# =============================================================================
+# Builders: before and after
+# =============================================================================
+
+def express_map(df: pd.DataFrame):
+    import plotly.express as px
+
+    fig = px.scatter_geo(
+        df.assign(marker_size=df['No of Cities'] * 18), lon='Longitude', lat='Latitude',
+        color='Category', size='marker_size', hover_name='Country',
+        hover_data={'No of Cities': True, 'marker_size': False}, color_discrete_map=COLORS,
+        size_max=70, custom_data=['Country', 'No of Cities'],
+    )
+    for trace in fig.data:
+        trace.marker.line = dict(color='#FFFFFF', width=2)
+    return fig
+
+
+def factory_map(df: pd.DataFrame):
+    return bubble_map(
+        df['Latitude'], df['Longitude'], df['No of Cities'] * 18, df['Category'], df['Country'],
+        colors=COLORS, size_max=70, customdata=df[['Country', 'No of Cities']].to_numpy(dtype=object),
+        marker={'line': dict(color='#FFFFFF', width=2)},
+    )
+
+
+def graph_objects_bar(df: pd.DataFrame):
+    import plotly.graph_objects as go
+
+    top = df.nlargest(10, 'No of Cities')
+    return go.Figure(data=[go.Bar(
+        x=top['No of Cities'], y=top['Country'], orientation='h', text=top['No of Cities'],
+        marker=dict(color=['#2A8CCB'] * len(top)), customdata=top['Country'],
+    )])
+
+
+def factory_bar(df: pd.DataFrame):
+    top = df.nlargest(10, 'No of Cities')
+    return bar_chart(
+        top['No of Cities'], top['Country'], orientation='h', text=top['No of Cities'],
+        marker=dict(color=['#2A8CCB'] * len(top)), customdata=top['Country'],
+    )
+
+
+def express_treemap(df: pd.DataFrame):
+    import plotly.express as px
+
+    return px.treemap(
+        df.astype({'Category': str}), path=[px.Constant('Colonies'), 'Category', 'Country'],
+        values='No of Cities', color='Category', color_discrete_map=COLORS,
+        custom_data=['Country', 'No of Cities'],
+    )
+
+
+def factory_treemap(df: pd.DataFrame):
+    return group_treemap('Colonies', df['Category'].astype(str), df['Country'], df['No of Cities'], colors=COLORS)
+
+
+def graph_objects_curve(df: pd.DataFrame):
+    import plotly.graph_objects as go
+
+    ranked = df.sort_values('No of Cities', ascending=False)
+    ranks = list(range(1, len(ranked) + 1))
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=ranks, y=ranked['No of Cities'], mode='lines+markers'))
+    fig.add_trace(go.Scatter(
+        x=ranks, y=ranked['No of Cities'].cumsum() / ranked['No of Cities'].sum(), mode='lines', yaxis='y2',
+    ))
+    fig.update_layout(yaxis2=dict(overlaying='y', side='right', range=[0, 1]))
+    return fig
+
+
+def factory_curve(df: pd.DataFrame):
+    return concentration_curve(
+        df['No of Cities'], counts_trace=dict(mode='lines+markers'), share_trace=dict(mode='lines'),
+        layout=dict(yaxis2=dict(overlaying='y', side='right', range=[0, 1])),
+    )
+
+
+FIGURES = {
+    'map': (express_map, factory_map),
+    'bar': (graph_objects_bar, factory_bar),
+    'treemap': (express_treemap, factory_treemap),
+    'concentration': (graph_objects_curve, factory_curve),
+}
+
+
+# =============================================================================
+# Timing
+# =============================================================================
+
+def median_ms(build: Callable[[pd.DataFrame], Any], df: pd.DataFrame, repeat: int) -> float:
+    build(df)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        build(df)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def run_benchmark(sizes: Sequence[int] = DEFAULT_SIZES, repeat: int = 20) -> List[Dict[str, Any]]:
+    """Time every figure on the real summary and on synthetic ones of ``sizes`` countries."""
+    from GR03A_DataFrame import create_df_for_viz
+
+    tables = [('corpus', create_df_for_viz())] + [(str(size), synthetic_summary(size)) for size in sizes]
+    results = []
+    for table, df in tables:
+        for name, (before, after) in FIGURES.items():
+            before_ms, after_ms = median_ms(before, df, repeat), median_ms(after, df, repeat)
+            results.append({
+                'table': table, 'countries': len(df), 'figure': name,
+                'before_ms': before_ms, 'after_ms': after_ms, 'speedup': before_ms / after_ms,
+            })
+    return results
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description="Compare figure build times before and after figure_factory.")
+    parser.add_argument('--sizes', type=int, nargs='*', default=list(DEFAULT_SIZES), help="synthetic summary sizes in countries")
+    parser.add_argument('--repeat', type=int, default=20, help="timed builds per figure")
+    parser.add_argument('--output', default=None, help="also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    results = run_benchmark(args.sizes, args.repeat)
+    print(f"{'table':>8} {'countries':>9} {'figure':>14} {'before ms':>10} {'after ms':>9} {'speedup':>8}")
+    for row in results:
+        print(f"{row['table']:>8} {row['countries']:>9} {row['figure']:>14} "
+              f"{row['before_ms']:>10.2f} {row['after_ms']:>9.2f} {row['speedup']:>7.1f}x")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as handle:
+            json.dump(results, handle, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""Scaling benchmark for the Ancient Greek Colonization Explorer data pipeline
+
+For each corpus size this script writes a synthetic corpus (see
+``synthetic_corpus.py``) and measures, in a fresh interpreter:
+
+- parse time of ``txt_to_dataframe()`` (and optionally ``load_corpus()``)
+- aggregation time of ``create_df_for_viz()``
+- build time of the map and bar chart figures from ``agent_tools`` (with
+  the one-off Plotly import reported separately)
+- the in-memory size of both tables and the peak resident memory
+
+Results are written as JSON so runs can be compared and capacity limits
+derived from them:
+
+    python benchmark_pipeline.py --sizes 1000 100000 1000000 --output bench.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence
+
+import pandas as pd
+
+from synthetic_corpus import write_corpus
+
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000, 1_000_000)
+DEFAULT_OUTPUT = 'benchmark-results.json'
+
+
+def _peak_rss_bytes() -> Optional[int]:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def measure_corpus(file: str, parallel: bool = False) -> Dict[str, Any]:
+    """Run every pipeline stage on ``file`` and return the measurements.
+
+    Meant to run in its own interpreter so the peak memory belongs to this
+    corpus alone.
+    """
+    from GR03A_DataFrame import create_df_for_viz, load_corpus, memory_report, txt_to_dataframe
+    from agent_tools import generate_bar_chart, generate_map_visualization
+
+    # Plotly is imported lazily by the first figure; keep that out of the figure timings
+    _, plotly_import_s = _timed(__import__, 'plotly.express')
+
+    cities_df, parse_s = _timed(txt_to_dataframe, file)
+    viz_df, aggregate_s = _timed(create_df_for_viz, cities_df)
+    _, map_s = _timed(generate_map_visualization, viz_df, {})
+    _, bar_s = _timed(generate_bar_chart, viz_df, {})
+
+    result = {
+        'rows': len(cities_df),
+        'countries': len(viz_df),
+        'parse_s': parse_s,
+        'aggregate_s': aggregate_s,
+        'map_figure_s': map_s,
+        'bar_figure_s': bar_s,
+        'plotly_import_s': plotly_import_s,
+        'cities_table_bytes': int(memory_report(cities_df).sum()),
+        'summary_table_bytes': int(memory_report(viz_df).sum()),
+    }
+    if parallel:
+        _, result['parallel_parse_s'] = _timed(load_corpus, file)
+    result['peak_rss_bytes'] = _peak_rss_bytes()
+    return result
+
+
+def run_benchmark(
+    sizes: Sequence[int] = DEFAULT_SIZES,
+    skew: float = 1.0,
+    seed: int = 0,
+    parallel: bool = False,
+    workdir: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Benchmark every corpus size and return the JSON-ready report."""
+    results: List[Dict[str, Any]] = []
+    with tempfile.TemporaryDirectory(dir=workdir) as scratch:
+        for cities in sizes:
+            file = os.path.join(scratch, f'corpus-{cities}.txt')
+            _, generate_s = _timed(write_corpus, file, cities, skew, seed=seed)
+
+            command = [sys.executable, os.path.abspath(__file__), '--measure', file]
+            if parallel:
+                command.append('--parallel')
+            output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+            measured = json.loads(output.strip().splitlines()[-1])
+
+            results.append({'cities': cities, 'corpus_bytes': os.path.getsize(file),
+                            'generate_s': generate_s, **measured})
+            os.remove(file)
+            print(f"{cities:>10} cities: parse {measured['parse_s']:.3f}s, "
+                  f"aggregate {measured['aggregate_s']:.3f}s, "
+                  f"figures {measured['map_figure_s'] + measured['bar_figure_s']:.3f}s",
+                  file=sys.stderr)
+
+    return {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'environment': {
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'parameters': {'skew': skew, 'seed': seed, 'parallel': parallel},
+        'results': results,
+    }
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark the data pipeline on synthetic corpora.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES), help="corpus sizes in colonies")
+    parser.add_argument('--skew', type=float, default=1.0, help="Zipf exponent of the country distribution")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--parallel', action='store_true', help="also time the parallel load_corpus()")
+    parser.add_argument('--workdir', default=None, help="directory for the temporary corpora")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="JSON file for the results")
+    parser.add_argument('--measure', metavar='FILE', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.measure:
+        print(json.dumps(measure_corpus(args.measure, args.parallel)))
+        return
+
+    report = run_benchmark(args.sizes, args.skew, args.seed, args.parallel, args.workdir)
+    with open(args.output, 'w', encoding='utf-8') as handle:
+        json.dump(report, handle, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+"""Token-budgeted chat history for Ancient Greek Colonization Explorer
+
+``ChatHistory`` keeps a session's messages and builds each turn's prompt
+within a token budget instead of a fixed message count: the newest messages
+are sent verbatim, and older ones are folded into a rolling summary. Tokens
+are estimated locally (no tokenizer download or API call), which is accurate
+enough to stay well inside a context window.
+
+Summaries are computed between turns: ``compact()`` starts a background task
+after a reply has been streamed, and ``build()`` never waits for it. A turn
+that arrives before the summary is ready simply drops the oldest messages
+that do not fit, so time-to-first-token does not grow with the conversation.
+"""
+
+import asyncio
+import math
+import warnings
+from typing import Any, Awaitable, Callable, Dict, List, Mapping, Optional
+
+
+# Characters per token for English prose and numbers (OpenAI/Anthropic
+# tokenizers average 3.5-4.5)
+CHARS_PER_TOKEN = 3.5
+
+# Tokens each message costs on top of its content (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Summarize once unsummarized messages take this share of the history budget
+SUMMARIZE_AT = 0.75
+
+# Share of the history budget kept verbatim when older messages are summarized
+KEEP_RECENT = 0.5
+
+SUMMARY_HEADER = "Summary of the earlier conversation:\n"
+
+# async summarize(previous_summary, messages) -> new summary
+Summarizer = Callable[[str, List[Dict[str, str]]], Awaitable[str]]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count of ``text``, rounded up."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+
+def message_tokens(message: Mapping[str, Any]) -> int:
+    """Estimated tokens of one chat message, overhead included."""
+    return estimate_tokens(message.get("content") or "") + MESSAGE_OVERHEAD_TOKENS
+
+
+def prompt_budget(
+    model_info: Mapping[str, Any],
+    cap: int,
+    default_window: int,
+    default_reply: int,
+) -> int:
+    """Tokens a prompt may use with a model from ``config.AVAILABLE_MODELS``.
+
+    The context window less the tokens reserved for the reply, but no more
+    than ``cap``: a bigger window is not a reason to send a bigger prompt.
+    """
+    window = model_info.get("context_window", default_window)
+    reply = model_info.get("max_tokens", default_reply)
+    return max(0, min(cap, window - reply))
+
+
+# =============================================================================
+# Chat History
+# =============================================================================
+
+class ChatHistory:
+    """Messages of one chat session, with a rolling summary of the older ones.
+
+    ``max_messages`` additionally caps how many messages are sent verbatim.
+    """
+
+    def __init__(self, max_messages: Optional[int] = None):
+        self.max_messages = max_messages
+        self.summary = ""
+        self._messages: List[Dict[str, str]] = []
+        self._tokens: List[int] = []
+        # Messages before this index are covered by the summary
+        self._summarized = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    @property
+    def messages(self) -> List[Dict[str, str]]:
+        """Every message of the session, summarized or not (a copy)."""
+        return list(self._messages)
+
+    @property
+    def pending_tokens(self) -> int:
+        """Estimated tokens of the messages not yet covered by the summary."""
+        return sum(self._tokens[self._summarized:])
+
+    def append(self, role: str, content: str):
+        message = {"role": role, "content": content}
+        self._messages.append(message)
+        self._tokens.append(message_tokens(message))
+
+    def build(self, system: str, user_message: str, budget: int) -> List[Dict[str, str]]:
+        """Messages for the next request, estimated to fit in ``budget`` tokens.
+
+        The system prompt and the new user message always go in; the summary
+        and then the newest messages fill what is left.
+        """
+        user = {"role": "user", "content": user_message}
+        remaining = budget - estimate_tokens(system) - message_tokens(user) - MESSAGE_OVERHEAD_TOKENS
+
+        # The summary joins the system prompt: not every provider accepts a
+        # second system message
+        if self.summary:
+            summary = "\n\n" + SUMMARY_HEADER + self.summary
+            cost = estimate_tokens(summary)
+            if cost <= remaining:
+                system += summary
+                remaining -= cost
+
+        start = len(self._messages)
+        limit = self._summarized
+        if self.max_messages is not None:
+            limit = max(limit, len(self._messages) - self.max_messages)
+        while start > limit and self._tokens[start - 1] <= remaining:
+            start -= 1
+            remaining -= self._tokens[start]
+        return [{"role": "system", "content": system}] + self._messages[start:] + [user]
+
+    # =========================================================================
+    # Rolling summary
+    # =========================================================================
+
+    def compact(self, summarize: Summarizer, budget: int) -> Optional[asyncio.Task]:
+        """Start summarizing older messages in the background if they need it.
+
+        ``budget`` is the token budget left for history (the prompt budget
+        less the system prompt). Nothing is started while a summary is still
+        being computed or while the unsummarized messages fit comfortably.
+        Returns the running task, if any.
+        """
+        if self._task is not None and not self._task.done():
+            return self._task
+        pending = self._tokens[self._summarized:]
+        over_count = self.max_messages is not None and len(pending) > self.max_messages
+        if sum(pending) <= budget * SUMMARIZE_AT and not over_count:
+            return None
+
+        #Keep the newest messages verbatim, summarize everything before them
+        keep_tokens, keep_count = budget * KEEP_RECENT, len(pending)
+        if self.max_messages is not None:
+            keep_count = self.max_messages // 2
+        end, kept = len(self._messages), 0
+        while end > self._summarized and len(self._messages) - end < keep_count \
+                and kept + self._tokens[end - 1] <= keep_tokens:
+            end -= 1
+            kept += self._tokens[end]
+        if end <= self._summarized:
+            return None
+        self._task = asyncio.ensure_future(self._summarize(summarize, self._summarized, end))
+        return self._task
+
+    async def _summarize(self, summarize: Summarizer, start: int, end: int):
+        try:
+            summary = await summarize(self.summary, self._messages[start:end])
+        except asyncio.CancelledError:
+            raise
+        except Exception as error:
+            # Not fatal: build() still keeps the prompt in budget by dropping old messages
+            warnings.warn(f"Could not summarize chat history: {error}", RuntimeWarning)
+            return
+        if self._summarized == start and summary:
+            self.summary = summary.strip()
+            self._summarized = end
+
+    async def wait(self):
+        """Wait for a summary in progress (turns themselves never do)."""
+        if self._task is not None:
+            await asyncio.shield(self._task)
@@ -0,0 +1,114 @@
+"""Colony intensity bands for Ancient Greek Colonization Explorer
+
+This module defines the declarative bin schemes used to assign the
+``Category`` column of the aggregated table, together with the colours the
+dashboards and agent tools use for each band.
+"""
+
+from dataclasses import dataclass, replace
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+# =============================================================================
+# Band Schemes
+# =============================================================================
+
+@dataclass(frozen=True)
+class BandScheme:
+    """A set of half-open bins ``[edges[i], edges[i + 1])`` with labels and colours.
+
+    Labels and colours are listed from the lowest band to the highest.
+    """
+    name: str
+    edges: Tuple[float, ...]
+    labels: Tuple[str, ...]
+    colors: Tuple[str, ...]
+
+    def __post_init__(self):
+        if len(self.edges) < 2 or any(low >= high for low, high in zip(self.edges, self.edges[1:])):
+            raise ValueError(f"Band scheme '{self.name}' needs at least two strictly increasing edges")
+        if len(self.labels) != len(self.edges) - 1:
+            raise ValueError(f"Band scheme '{self.name}' needs one label per bin")
+        if len(self.colors) != len(self.labels):
+            raise ValueError(f"Band scheme '{self.name}' needs one colour per label")
+
+    @property
+    def display_order(self) -> Tuple[str, ...]:
+        """Labels from the highest band to the lowest, as shown in legends."""
+        return self.labels[::-1]
+
+    @property
+    def color_map(self) -> Dict[str, str]:
+        """Label -> colour, highest band first."""
+        return dict(zip(self.display_order, self.colors[::-1]))
+
+    def recolored(self, name: str, colors: Sequence[str]) -> "BandScheme":
+        """The same bands under another palette, listed from the lowest band."""
+        return replace(self, name=name, colors=tuple(colors))
+
+
+DEFAULT_SCHEME = BandScheme(
+    name="default",
+    edges=(0, 10, 20, 30, 60, 90, np.inf),
+    labels=(
+        "Less than 10 colonies",
+        "10 - 20 colonies",
+        "20 - 30 colonies",
+        "30 - 60 colonies",
+        "60 - 90 colonies",
+        "90+ colonies",
+    ),
+    colors=("#2980B9", "#27AE60", "#16A085", "#F1C40F", "#E67E22", "#C0392B"),
+)
+
+# Palette of the basic dashboard
+CLASSIC_SCHEME = DEFAULT_SCHEME.recolored(
+    "classic",
+    ("orchid", "limegreen", "orange", "lightseagreen", "crimson", "royalblue"),
+)
+
+# Palette of the enhanced dashboard
+PASTEL_SCHEME = DEFAULT_SCHEME.recolored(
+    "pastel",
+    (
+        "#A8E6CF",  # Light mint
+        "#95E1D3",  # Mint green
+        "#F9A66C",  # Soft apricot
+        "#FFE66D",  # Golden yellow
+        "#4ECDC4",  # Turquoise
+        "#FF6B6B",  # Coral red
+    ),
+)
+
+
+# =============================================================================
+# Band Assignment
+# =============================================================================
+
+def assign_bands(counts: Sequence[float], scheme: BandScheme = DEFAULT_SCHEME) -> pd.Categorical:
+    """Assign each count to its band in one vectorized pass.
+
+    Returns an ordered categorical whose categories follow ``scheme.labels``;
+    counts outside the scheme's edges become missing values.
+    """
+    return pd.cut(
+        np.asarray(counts),
+        bins=np.asarray(scheme.edges, dtype=float),
+        labels=list(scheme.labels),
+        right=False,
+        ordered=True,
+    )
+
+
+def reband(
+    df: pd.DataFrame,
+    scheme: BandScheme = DEFAULT_SCHEME,
+    count_column: str = "No of Cities",
+) -> pd.DataFrame:
+    """Return a copy of ``df`` with ``Category`` recomputed under ``scheme``."""
+    rebanded = df.copy()
+    rebanded["Category"] = assign_bands(rebanded[count_column], scheme)
+    return rebanded
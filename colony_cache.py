@@ -0,0 +1,220 @@
+"""Result caching for Ancient Greek Colonization Explorer
+
+This module holds the bounded LRU cache used for results derived from the
+colony tables, and a ``memoize`` decorator that keys those results on the
+version of the tables passed in plus the remaining call arguments. Tables
+are versioned either explicitly with ``tag_version()`` (``ColonyDataset``
+does this with its source fingerprint) or, failing that, per table object.
+``invalidate()`` drops everything computed from a given version.
+"""
+
+import copy
+import functools
+import itertools
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+import pandas as pd
+
+
+# =============================================================================
+# LRU Cache
+# =============================================================================
+
+class LRUCache:
+    """Thread-safe least-recently-used cache bounded by entries and, optionally, bytes.
+
+    ``sizeof`` gives the cost of a value in bytes; when ``max_bytes`` is set
+    the least recently used entries are evicted until the total fits.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 128,
+        max_bytes: Optional[int] = None,
+        sizeof: Optional[Callable[[Any], int]] = None,
+    ):
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof or (lambda value: 0)
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        _caches.add(self)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value and mark it recently used, counting a hit or miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any):
+        """Store ``value``, evicting least recently used entries to stay in bounds."""
+        size = self._sizeof(value)
+        with self._lock:
+            if self.max_bytes is not None and size > self.max_bytes:
+                # Larger than the whole cache: not worth evicting everything for
+                self.pop(key)
+                return
+            self.pop(key)
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while len(self._entries) > self.maxsize or (
+                self.max_bytes is not None and self._bytes > self.max_bytes
+            ):
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+
+    def pop(self, key: Hashable):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry[1]
+
+    def discard_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Drop every entry whose key matches ``predicate``; return how many."""
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                self.pop(key)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Entry count, bytes held and hit/miss counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+_caches: "weakref.WeakSet[LRUCache]" = weakref.WeakSet()
+
+
+# =============================================================================
+# Table Versions
+# =============================================================================
+
+_versions: Dict[int, str] = {}
+_versions_lock = threading.Lock()
+_anonymous = itertools.count(1)
+
+
+def tag_version(df: pd.DataFrame, version: str):
+    """Declare the version of a read-only table, e.g. its source fingerprint."""
+    with _versions_lock:
+        known = id(df) in _versions
+        _versions[id(df)] = version
+    if not known:
+        weakref.finalize(df, _forget, id(df))
+
+
+def table_version(df: pd.DataFrame) -> str:
+    """Return the version of ``df``, assigning a per-object one if it has none.
+
+    Per-object versions are invalidated when the table is garbage collected.
+    """
+    with _versions_lock:
+        version = _versions.get(id(df))
+        if version is not None:
+            return version
+        version = f"table-{next(_anonymous)}"
+        _versions[id(df)] = version
+    weakref.finalize(df, _forget, id(df), version)
+    return version
+
+
+def _forget(table_id: int, version: Optional[str] = None):
+    with _versions_lock:
+        _versions.pop(table_id, None)
+    if version is not None:
+        invalidate(version)
+
+
+def invalidate(version: Optional[str] = None) -> int:
+    """Drop cached results computed from tables of ``version`` (or all of them).
+
+    Returns the number of entries removed.
+    """
+    removed = 0
+    for cache in list(_caches):
+        if version is None:
+            removed += len(cache)
+            cache.clear()
+        else:
+            removed += cache.discard_where(lambda key: version in key[0])
+    return removed
+
+
+# =============================================================================
+# Memoization
+# =============================================================================
+
+def memoize(cache: LRUCache, copy_result: bool = True):
+    """Cache a function's results in ``cache`` per table version and arguments.
+
+    DataFrame arguments are replaced by their ``table_version()``; every
+    other argument must be hashable (lists are accepted and frozen to
+    tuples). Results are deep-copied on the way out unless ``copy_result``
+    is False, so callers may modify what they get back.
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            versions = []
+            key = (
+                tuple(_key_part(value, versions) for value in args),
+                tuple((name, _key_part(value, versions)) for name, value in sorted(kwargs.items())),
+            )
+            key = (tuple(versions), function.__qualname__, key)
+
+            result = cache.get(key, _missing)
+            if result is _missing:
+                result = function(*args, **kwargs)
+                cache.put(key, result)
+            return copy.deepcopy(result) if copy_result else result
+
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
+
+
+_missing = object()
+
+
+def _key_part(value: Any, versions: list) -> Hashable:
+    #Hashable stand-in for one argument; tables contribute their version
+    if isinstance(value, pd.DataFrame):
+        version = table_version(value)
+        versions.append(version)
+        return version
+    if isinstance(value, list):
+        return tuple(value)
+    return value
@@ -0,0 +1,139 @@
+"""Country coordinates for Ancient Greek Colonization Explorer
+
+This module loads the capital coordinates CSV once into a ``GeoIndex``: one
+float32 array per axis plus a country -> row lookup. The aggregation, the map
+builders and the agent tools share the same index, and attaching coordinates
+to any number of rows is a single vectorized positional join.
+"""
+
+import os
+import threading
+import warnings
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+# Countries known to have no capital coordinates; their rows are dropped
+# from the map without a warning
+NO_COORDINATES = frozenset({'Serbia'})
+
+
+class UnmatchedCountriesWarning(UserWarning):
+    """Raised when countries in the corpus have no coordinates."""
+
+
+# =============================================================================
+# Geo Index
+# =============================================================================
+
+@dataclass(frozen=True)
+class GeoIndex:
+    """Capital coordinates keyed by country name.
+
+    ``latitude[i]`` and ``longitude[i]`` belong to ``countries[i]``;
+    ``unmatched`` lists the expected countries that have no coordinates.
+    """
+    countries: pd.Index
+    latitude: np.ndarray
+    longitude: np.ndarray
+    unmatched: Tuple[str, ...] = ()
+    _positions: Dict[str, int] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        if not (len(self.countries) == len(self.latitude) == len(self.longitude)):
+            raise ValueError("GeoIndex needs one latitude and one longitude per country")
+        object.__setattr__(self, '_positions', {country: i for i, country in enumerate(self.countries)})
+
+    @classmethod
+    def from_csv(cls, file: str, expected: Iterable[str] = ()) -> 'GeoIndex':
+        """Build the index from a ``CountryName, CapitalLatitude, CapitalLongitude`` CSV.
+
+        Countries in ``expected`` without a row in the file are recorded in
+        ``unmatched``.
+        """
+        geo_df = pd.read_csv(file).drop_duplicates('CountryName', keep='last')
+        countries = pd.Index(geo_df['CountryName'].astype(object), name='Country')
+        unmatched = tuple(sorted(set(expected) - set(countries)))
+        return cls(
+            countries,
+            geo_df['CapitalLatitude'].to_numpy(dtype='float32'),
+            geo_df['CapitalLongitude'].to_numpy(dtype='float32'),
+            unmatched,
+        )
+
+    def __len__(self) -> int:
+        return len(self.countries)
+
+    def __contains__(self, country: str) -> bool:
+        return country in self._positions
+
+    def lookup(self, country: str) -> Optional[Tuple[float, float]]:
+        """Return ``(latitude, longitude)`` for ``country``, or None if unknown."""
+        i = self._positions.get(country)
+        if i is None:
+            return None
+        return float(self.latitude[i]), float(self.longitude[i])
+
+    def positions(self, keys: Iterable[str]) -> np.ndarray:
+        """Return the row of each key in the index, -1 where it has none."""
+        return self.countries.get_indexer(pd.Index(keys, dtype=object))
+
+    def join(self, df: pd.DataFrame, key: str = 'Country') -> Tuple[pd.DataFrame, Tuple[str, ...]]:
+        """Return ``df`` with ``Latitude``/``Longitude`` attached, and the unmatched keys.
+
+        Rows whose key has no coordinates are dropped rather than passed on
+        as NaN.
+        """
+        positions = self.positions(df[key])
+        matched = positions >= 0
+        unmatched = tuple(pd.unique(df[key].to_numpy()[~matched]))
+
+        joined = df[matched].copy()
+        joined['Latitude'] = self.latitude[positions[matched]]
+        joined['Longitude'] = self.longitude[positions[matched]]
+        return joined, unmatched
+
+
+# =============================================================================
+# Loading
+# =============================================================================
+
+_cache: Dict[tuple, GeoIndex] = {}
+_cache_lock = threading.Lock()
+
+
+def load_geo_index(file: str, expected: Iterable[str] = ()) -> GeoIndex:
+    """Return the ``GeoIndex`` for ``file``, loading it only once.
+
+    The index is reloaded when the file's size or modification time changes.
+    Expected countries without coordinates (other than ``NO_COORDINATES``)
+    are reported with an ``UnmatchedCountriesWarning`` when the index loads.
+    """
+    expected = frozenset(expected)
+    stat = os.stat(file)
+    key = (os.path.abspath(file), stat.st_size, stat.st_mtime_ns, expected)
+    with _cache_lock:
+        index = _cache.get(key)
+        if index is None:
+            index = GeoIndex.from_csv(file, expected)
+            _report_unmatched(file, index.unmatched)
+            # Only the current version of each file is kept
+            for stale in [k for k in _cache if k[0] == key[0]]:
+                del _cache[stale]
+            _cache[key] = index
+    return index
+
+
+def _report_unmatched(file: str, unmatched: Iterable[str]):
+    #Warns about countries that will be missing from the map
+    unexpected = sorted(set(unmatched) - NO_COORDINATES)
+    if unexpected:
+        warnings.warn(
+            f"No coordinates in '{file}' for: {', '.join(unexpected)}; "
+            "these countries will be left off the map",
+            UnmatchedCountriesWarning,
+            stacklevel=3,
+        )
@@ -0,0 +1,379 @@
+"""Colony name search for Ancient Greek Colonization Explorer
+
+This module builds an inverted n-gram index over city names so substring
+searches only touch the names that share the query's n-grams instead of
+scanning every row. Names are case-folded and stripped of accents, and
+"A/B" names are indexed under each alternate spelling as well as in full.
+A BK-tree over the same folded names answers typo-tolerant lookups by edit
+distance without comparing the query against every name.
+"""
+
+import heapq
+import threading
+import unicodedata
+import weakref
+from bisect import bisect_left
+from functools import cached_property
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+# Longest n-gram stored in the index; shorter queries use their own n-gram
+GRAM_SIZE = 3
+
+# Results returned per page unless a limit is given
+DEFAULT_PAGE_SIZE = 20
+
+# Largest edit distance a fuzzy match may have unless told otherwise
+DEFAULT_MAX_DISTANCE = 2
+
+
+def fold(text: str) -> str:
+    """Case-fold ``text`` and drop accents, e.g. "Laüs" -> "laus"."""
+    decomposed = unicodedata.normalize('NFKD', text.casefold())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).strip()
+
+
+def name_variants(name: str) -> List[str]:
+    """Return the folded forms a name is searchable under.
+
+    "Lipara/Meligounis" yields the full name plus "lipara" and "meligounis".
+    """
+    full = fold(name)
+    variants = [full]
+    if '/' in full:
+        variants.extend(part.strip() for part in full.split('/') if part.strip())
+    return list(dict.fromkeys(variants))
+
+
+def _grams(text: str, size: int) -> Iterable[str]:
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def _char_masks(pattern: str) -> Dict[str, int]:
+    #Bit i of masks[c] is set where pattern[i] == c
+    masks: Dict[str, int] = {}
+    for i, char in enumerate(pattern):
+        masks[char] = masks.get(char, 0) | (1 << i)
+    return masks
+
+
+def _bit_parallel_distance(masks: Dict[str, int], length: int, text: str) -> int:
+    #Levenshtein distance between a pattern (given by its masks and length)
+    #and text, one column of the DP matrix per step as bit vectors (Myers /
+    #Hyyro), so the cost grows with len(text) rather than the matrix size
+    if length == 0:
+        return len(text)
+    full = (1 << length) - 1
+    last = 1 << (length - 1)
+    positive, negative, score = full, 0, length
+    for char in text:
+        equal = masks.get(char, 0)
+        vertical = equal | negative
+        horizontal = (((equal & positive) + positive) ^ positive) | equal
+        h_positive = negative | (~(horizontal | positive) & full)
+        h_negative = positive & horizontal
+        if h_positive & last:
+            score += 1
+        elif h_negative & last:
+            score -= 1
+        h_positive = ((h_positive << 1) | 1) & full
+        h_negative = (h_negative << 1) & full
+        positive = h_negative | (~(vertical | h_positive) & full)
+        negative = h_positive & vertical
+    return score
+
+
+def edit_distance(a: str, b: str) -> int:
+    """Levenshtein distance between ``a`` and ``b``."""
+    return _bit_parallel_distance(_char_masks(a), len(a), b)
+
+
+class SearchPage(NamedTuple):
+    """One page of search results."""
+    total: int
+    rows: List[int]
+
+
+class FuzzyMatch(NamedTuple):
+    """A row whose name is ``distance`` edits away from the query."""
+    row: int
+    distance: int
+
+
+# =============================================================================
+# BK-tree
+# =============================================================================
+
+class BKTree:
+    """Burkhard-Keller tree over strings under edit distance.
+
+    Each child hangs off its parent under their distance, so by the triangle
+    inequality a query only descends into children whose key lies within the
+    current tolerance of the query's distance to the parent.
+    """
+
+    def __init__(self, words: Iterable[str] = ()):
+        self._words: List[str] = []
+        # Node i is word i; _children[i] maps distance -> child node
+        self._children: List[Dict[int, int]] = []
+        for word in words:
+            self.add(word)
+
+    def __len__(self) -> int:
+        return len(self._words)
+
+    def add(self, word: str) -> int:
+        """Insert ``word`` (if new) and return its node id."""
+        node = 0
+        masks = _char_masks(word)
+        while self._words:
+            distance = _bit_parallel_distance(masks, len(word), self._words[node])
+            if distance == 0:
+                return node
+            child = self._children[node].get(distance)
+            if child is None:
+                self._children[node][distance] = len(self._words)
+                break
+            node = child
+        self._words.append(word)
+        self._children.append({})
+        return len(self._words) - 1
+
+    def nearest(
+        self,
+        query: str,
+        k: int,
+        max_distance: int = DEFAULT_MAX_DISTANCE,
+        accept: Optional[Callable[[int], bool]] = None,
+    ) -> List[Tuple[int, int]]:
+        """Return up to ``k`` ``(distance, node)`` pairs within ``max_distance``.
+
+        Closest first, ties going to the node inserted first. The tolerance
+        shrinks to the k-th best distance found so far, pruning the search.
+        When ``accept`` is given only nodes it accepts are returned (the
+        others are still searched through).
+        """
+        if not self._words or k <= 0:
+            return []
+        best: List[Tuple[int, int]] = []  # max-heap of (-distance, -node)
+        tolerance = max_distance
+        masks = _char_masks(query)
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            distance = _bit_parallel_distance(masks, len(query), self._words[node])
+            if distance <= tolerance and (accept is None or accept(node)):
+                heapq.heappush(best, (-distance, -node))
+                if len(best) > k:
+                    heapq.heappop(best)
+                if len(best) == k:
+                    tolerance = -best[0][0]
+            for key, child in self._children[node].items():
+                if distance - tolerance <= key <= distance + tolerance:
+                    stack.append(child)
+        return sorted((-distance, -node) for distance, node in best)
+
+
+# =============================================================================
+# N-gram Index
+# =============================================================================
+
+class NameIndex:
+    """Inverted index from 1- to ``GRAM_SIZE``-grams to the names containing them.
+
+    ``search()`` returns positional rows of the names passed in, best match
+    first: a whole name or alternate spelling equal to the query, then names
+    starting with it, then names with a word starting with it, then any other
+    substring match; ties go to shorter names, then to corpus order.
+
+    Variant ids are assigned in that tie-break order, so every posting list
+    is already ranked and a page is cut from merged id arrays without
+    sorting the matches in Python.
+
+    ``fuzzy()`` ranks rows by edit distance instead, using a BK-tree over the
+    distinct folded names that is built on its first use (see ``warm()``).
+    """
+
+    def __init__(self, names: Sequence[str]):
+        self.size = len(names)
+        folded = {row: name_variants(name) for row, name in enumerate(names) if isinstance(name, str)}
+        rows = sorted(folded, key=lambda row: (len(folded[row][0]), row))
+
+        self._variants: List[str] = []
+        variant_rows: List[int] = []
+        postings: Dict[str, List[int]] = {}
+        exact: Dict[str, List[int]] = {}
+        words = []
+
+        for row in rows:
+            for variant in folded[row]:
+                variant_id = len(self._variants)
+                self._variants.append(variant)
+                variant_rows.append(row)
+                exact.setdefault(variant, []).append(variant_id)
+                words.extend((word, variant_id) for word in variant.replace('/', ' ').split())
+                for size in range(1, GRAM_SIZE + 1):
+                    for gram in _grams(variant, size):
+                        postings.setdefault(gram, []).append(variant_id)
+
+        self._rows = np.asarray(variant_rows, dtype=np.int64)
+        self._postings = {gram: np.asarray(ids, dtype=np.int64) for gram, ids in postings.items()}
+        self._exact = {variant: np.asarray(ids, dtype=np.int64) for variant, ids in exact.items()}
+
+        # Sorted keys for prefix lookups by bisection
+        by_name = sorted(range(len(self._variants)), key=self._variants.__getitem__)
+        self._names_sorted = [self._variants[i] for i in by_name]
+        self._names_ids = np.asarray(by_name, dtype=np.int64)
+        words.sort()
+        self._words_sorted = [word for word, _ in words]
+        self._words_ids = np.asarray([variant_id for _, variant_id in words], dtype=np.int64)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _matching_variants(self, query: str) -> np.ndarray:
+        #Ids of the variants containing the folded query, in rank order
+        grams = _grams(query, min(len(query), GRAM_SIZE))
+        lists = sorted((self._postings.get(gram) for gram in grams), key=lambda ids: -1 if ids is None else len(ids))
+        if not lists or lists[0] is None:
+            return np.empty(0, dtype=np.int64)
+
+        candidates = lists[0]
+        for ids in lists[1:]:
+            if len(candidates) == 0:
+                break
+            candidates = np.intersect1d(candidates, ids, assume_unique=True)
+
+        # Shared n-grams do not guarantee a contiguous match for long queries
+        if len(query) > GRAM_SIZE:
+            candidates = candidates[[query in self._variants[i] for i in candidates.tolist()]]
+        return candidates
+
+    @staticmethod
+    def _prefixed(keys: List[str], ids: np.ndarray, query: str) -> np.ndarray:
+        #Ids whose key starts with query, in rank order
+        first = bisect_left(keys, query)
+        last = bisect_left(keys, query + '\U0010ffff', first)
+        return np.sort(ids[first:last])
+
+    def search(self, query: str, limit: Optional[int] = DEFAULT_PAGE_SIZE, offset: int = 0) -> SearchPage:
+        """Return the rows whose name contains ``query``, ranked and paginated.
+
+        ``limit=None`` returns every match from ``offset`` on.
+        """
+        query = fold(query)
+        if not query:
+            return SearchPage(0, [])
+
+        matches = self._matching_variants(query)
+        if len(matches) == 0:
+            return SearchPage(0, [])
+
+        # Tiers in rank order; each row keeps its first (best) position
+        ranked = self._rows[np.concatenate([
+            self._exact.get(query, np.empty(0, dtype=np.int64)),
+            self._prefixed(self._names_sorted, self._names_ids, query),
+            self._prefixed(self._words_sorted, self._words_ids, query),
+            matches,
+        ])]
+        _, first = np.unique(ranked, return_index=True)
+        ranked = ranked[np.sort(first)]
+
+        end = None if limit is None else offset + limit
+        return SearchPage(len(ranked), ranked[offset:end].tolist())
+
+    @cached_property
+    def _tree(self) -> Tuple[BKTree, List[List[int]]]:
+        #BK-tree over the distinct variants, inserted in rank order, and the
+        #variant ids of each node
+        tree = BKTree()
+        node_variants: List[List[int]] = []
+        for variant_id, variant in enumerate(self._variants):
+            node = tree.add(variant)
+            if node == len(node_variants):
+                node_variants.append([])
+            node_variants[node].append(variant_id)
+        return tree, node_variants
+
+    def warm(self) -> 'NameIndex':
+        """Build the fuzzy-search tree now rather than on the first query."""
+        self._tree
+        return self
+
+    def fuzzy(
+        self,
+        query: str,
+        k: int = DEFAULT_PAGE_SIZE,
+        max_distance: int = DEFAULT_MAX_DISTANCE,
+        rows: Optional[Iterable[int]] = None,
+    ) -> List[FuzzyMatch]:
+        """Return up to ``k`` rows whose name (or a spelling of it) is closest to ``query``.
+
+        Only names within ``max_distance`` edits count. Rows are ordered by
+        distance, then by the substring ranking's tie-break. ``rows``
+        restricts the candidates (e.g. to one country's rows) before ranking.
+        """
+        query = fold(query)
+        if not query or k <= 0:
+            return []
+        tree, node_variants = self._tree
+
+        accept = None
+        if rows is not None:
+            pool = set(rows)
+            accept = lambda node: any(int(self._rows[variant_id]) in pool for variant_id in node_variants[node])
+
+        # One row can sit under several nodes (its "A/B" spellings) and one
+        # node can hold several rows, so widen the search until the k best
+        # rows are settled: every node up to the k-th row's distance has been
+        # seen, or the tree has nothing more within max_distance
+        wanted = k
+        while True:
+            nodes = tree.nearest(query, wanted, max_distance, accept)
+            matches: Dict[int, FuzzyMatch] = {}
+            for distance, node in nodes:
+                for variant_id in node_variants[node]:
+                    row = int(self._rows[variant_id])
+                    if rows is not None and row not in pool:
+                        continue
+                    if row not in matches:
+                        matches[row] = FuzzyMatch(row, distance)
+            ranked = sorted(matches.values(), key=lambda match: (match.distance, self._rank[match.row]))
+            if len(nodes) < wanted or (len(ranked) >= k and nodes[-1][0] > ranked[k - 1].distance):
+                return ranked[:k]
+            wanted *= 2
+
+    @cached_property
+    def _rank(self) -> Dict[int, int]:
+        #Row -> position in the tie-break order
+        return {row: rank for rank, row in enumerate(dict.fromkeys(self._rows.tolist()))}
+
+
+# =============================================================================
+# Per-table index cache
+# =============================================================================
+
+_indexes: Dict[tuple, NameIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def name_index(cities_df: pd.DataFrame, column: str = 'City Name') -> NameIndex:
+    """Return the ``NameIndex`` over ``cities_df[column]``, built on first use.
+
+    The index is kept for as long as the table is alive; tables are treated
+    as read-only.
+    """
+    key = (id(cities_df), column)
+    with _indexes_lock:
+        index = _indexes.get(key)
+    if index is None:
+        index = NameIndex(cities_df[column].tolist())
+        with _indexes_lock:
+            if key not in _indexes:
+                _indexes[key] = index
+                weakref.finalize(cities_df, _indexes.pop, key, None)
+            index = _indexes[key]
+    return index
@@ -0,0 +1,179 @@
+"""Spatial index over colony locations for Ancient Greek Colonization Explorer
+
+This module buckets points into a regular latitude/longitude grid so that
+nearest-neighbour, bounding-box and radius queries only look at the cells
+around the query instead of scanning the whole table. Distances are
+great-circle distances in kilometres.
+"""
+
+import math
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+# Mean Earth radius used for great-circle distances
+EARTH_RADIUS_KM = 6371.0088
+
+# Kilometres per degree of latitude
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+# Default grid cell size in degrees (roughly 110 km of latitude)
+DEFAULT_CELL_DEGREES = 1.0
+
+
+def haversine_km(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """Great-circle distance in km from ``(lat, lon)`` to each of ``(lats, lons)``."""
+    lat1, lon1 = math.radians(lat), math.radians(lon)
+    lat2, lon2 = np.radians(lats.astype('float64')), np.radians(lons.astype('float64'))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+# =============================================================================
+# Grid Index
+# =============================================================================
+
+class SpatialIndex:
+    """Grid index over the ``Latitude``/``Longitude`` columns of a table.
+
+    Query results are rows of that table, with a ``Distance (km)`` column
+    added by ``nearest()`` and ``within_radius()``. The table is treated as
+    read-only.
+    """
+
+    def __init__(self, points: pd.DataFrame, cell_degrees: float = DEFAULT_CELL_DEGREES):
+        if cell_degrees <= 0:
+            raise ValueError("cell_degrees must be positive")
+        located = points.dropna(subset=['Latitude', 'Longitude'])
+        lats = located['Latitude'].to_numpy(dtype='float64')
+        lons = (located['Longitude'].to_numpy(dtype='float64') + 180) % 360 - 180
+
+        self.cell_degrees = cell_degrees
+        self._columns = int(math.ceil(360 / cell_degrees))
+        self._rows = int(math.ceil(180 / cell_degrees))
+
+        # Sort points by cell so that each cell is one contiguous slice
+        cells = self._cell_row(lats) * self._columns + self._cell_column(lons)
+        order = np.argsort(cells, kind='stable')
+        self.points = located.iloc[order].reset_index(drop=True)
+        self._lats = lats[order]
+        self._lons = lons[order]
+        sorted_cells = cells[order]
+        keys, starts = np.unique(sorted_cells, return_index=True)
+        ends = np.append(starts[1:], len(sorted_cells))
+        self._cells: Dict[int, Tuple[int, int]] = {
+            int(key): (int(start), int(end)) for key, start, end in zip(keys, starts, ends)
+        }
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def _cell_row(self, lats):
+        return np.clip(np.floor((np.asarray(lats) + 90) / self.cell_degrees), 0, self._rows - 1).astype(np.int64)
+
+    def _cell_column(self, lons):
+        return (np.floor((np.asarray(lons) + 180) / self.cell_degrees) % self._columns).astype(np.int64)
+
+    def _candidates(self, row_range: Tuple[int, int], column_ranges) -> np.ndarray:
+        #Positions of the points in the given grid rows and column ranges
+        slices = []
+        for row in range(max(row_range[0], 0), min(row_range[1], self._rows - 1) + 1):
+            for first, last in column_ranges:
+                for column in range(first, last + 1):
+                    span = self._cells.get(row * self._columns + column % self._columns)
+                    if span is not None:
+                        slices.append(np.arange(*span))
+        return np.concatenate(slices) if slices else np.empty(0, dtype=np.int64)
+
+    def _box_candidates(self, min_lat, min_lon, max_lat, max_lon) -> np.ndarray:
+        #Positions of the points in the cells overlapping a box; the box may
+        #cross the antimeridian (min_lon > max_lon)
+        row_range = (int(self._cell_row(min_lat)), int(self._cell_row(max_lat)))
+        if max_lon - min_lon >= 360:
+            column_ranges = [(0, self._columns - 1)]
+        else:
+            first, last = int(self._cell_column(min_lon)), int(self._cell_column(max_lon))
+            if min_lon <= max_lon:
+                column_ranges = [(first, last)]
+            elif first > last:
+                column_ranges = [(first, self._columns - 1), (0, last)]
+            else:
+                # Both edges in one cell of a wrapped box: the two ranges
+                # would overlap and together cover every column
+                column_ranges = [(0, self._columns - 1)]
+        return self._candidates(row_range, column_ranges)
+
+    def _result(self, positions: np.ndarray, distances: np.ndarray = None) -> pd.DataFrame:
+        if distances is not None:
+            order = np.argsort(distances, kind='stable')
+            positions, distances = positions[order], distances[order]
+        result = self.points.iloc[positions].reset_index(drop=True)
+        if distances is not None:
+            result['Distance (km)'] = distances
+        return result
+
+    def within_bbox(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float) -> pd.DataFrame:
+        """Return the points inside a latitude/longitude box, edges included.
+
+        A box with ``min_lon > max_lon`` crosses the antimeridian.
+        """
+        min_lon, max_lon = (min_lon + 180) % 360 - 180, (max_lon + 180) % 360 - 180
+        positions = self._box_candidates(min_lat, min_lon, max_lat, max_lon)
+        lats, lons = self._lats[positions], self._lons[positions]
+        if min_lon <= max_lon:
+            in_lon = (lons >= min_lon) & (lons <= max_lon)
+        else:
+            in_lon = (lons >= min_lon) | (lons <= max_lon)
+        positions = positions[(lats >= min_lat) & (lats <= max_lat) & in_lon]
+        return self._result(np.sort(positions))
+
+    def within_radius(self, lat: float, lon: float, radius_km: float) -> pd.DataFrame:
+        """Return the points within ``radius_km`` of ``(lat, lon)``, nearest first."""
+        positions = self._radius_candidates(lat, lon, radius_km)
+        distances = haversine_km(lat, lon, self._lats[positions], self._lons[positions])
+        keep = distances <= radius_km
+        return self._result(positions[keep], distances[keep])
+
+    def _radius_candidates(self, lat, lon, radius_km) -> np.ndarray:
+        #Points in the cells overlapping the circle's bounding box
+        dlat = radius_km / KM_PER_DEGREE
+        min_lat, max_lat = max(lat - dlat, -90.0), min(lat + dlat, 90.0)
+        # Near the poles the circle can span every longitude
+        widest = max(abs(min_lat), abs(max_lat))
+        if widest >= 90 or dlat >= 90:
+            dlon = 360.0
+        else:
+            dlon = math.degrees(math.asin(min(1.0, math.sin(math.radians(dlat)) / math.cos(math.radians(widest)))))
+            dlon = 360.0 if dlon >= 90 else dlon
+        if dlon >= 180:
+            return self._box_candidates(min_lat, -180.0, max_lat, 180.0)
+        lon = (lon + 180) % 360 - 180
+        return self._box_candidates(min_lat, (lon - dlon + 180) % 360 - 180, max_lat, (lon + dlon + 180) % 360 - 180)
+
+    def nearest(self, lat: float, lon: float, k: int = 5) -> pd.DataFrame:
+        """Return the ``k`` points closest to ``(lat, lon)``, nearest first."""
+        if k <= 0 or not len(self):
+            return self._result(np.empty(0, dtype=np.int64), np.empty(0))
+        k = min(k, len(self))
+
+        # Grow a square of cells around the query until it holds k points; the
+        # k-th of those distances then bounds an exact radius query
+        row, column = int(self._cell_row(lat)), int(self._cell_column(lon))
+        ring = 0
+        while True:
+            positions = self._candidates(
+                (row - ring, row + ring),
+                [(column - ring, column + ring)] if 2 * ring + 1 < self._columns else [(0, self._columns - 1)],
+            )
+            if len(positions) >= k:
+                break
+            ring += 1
+
+        distances = haversine_km(lat, lon, self._lats[positions], self._lons[positions])
+        bound = np.partition(distances, k - 1)[k - 1]
+        positions = self._radius_candidates(lat, lon, bound)
+        distances = haversine_km(lat, lon, self._lats[positions], self._lons[positions])
+        order = np.argsort(distances, kind='stable')[:k]
+        return self._result(positions[order], distances[order])
@@ -18,6 +18,14 @@ OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
 OPENROUTER_SITE_URL = os.getenv("OPENROUTER_SITE_URL", "https://github.com/fabricerjsjoseph/Pre-Hellenic-Colonies-Visualisation")
 OPENROUTER_APP_NAME = os.getenv("OPENROUTER_APP_NAME", "Ancient Greek Colonization Explorer")
 
+# HTTP client shared by every chat session in the process
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "10"))  # Seconds to open a connection
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "60"))  # Seconds to wait for the next streamed chunk
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))  # Concurrent requests per worker
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))  # Idle connections kept open
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "90"))  # Seconds an idle connection is kept
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))  # Retries on connection errors and 429/5xx
+
 # =============================================================================
 # LLM Model Configuration
 # =============================================================================
@@ -35,6 +43,7 @@ AVAILABLE_MODELS = {
         "name": "Claude 3.5 Sonnet",
         "description": "Best for complex historical analysis and reasoning",
         "max_tokens": 8192,
+        "context_window": 200000,
         "temperature": 0.7,
         "cost_tier": "premium",
     },
@@ -42,6 +51,7 @@ AVAILABLE_MODELS = {
         "name": "GPT-4 Turbo",
         "description": "Excellent general-purpose model with broad knowledge",
         "max_tokens": 4096,
+        "context_window": 128000,
         "temperature": 0.7,
         "cost_tier": "premium",
     },
@@ -51,6 +61,7 @@ AVAILABLE_MODELS = {
         "name": "Claude 3 Haiku",
         "description": "Fast and efficient for straightforward queries",
         "max_tokens": 4096,
+        "context_window": 200000,
         "temperature": 0.7,
         "cost_tier": "mid",
     },
@@ -58,6 +69,7 @@ AVAILABLE_MODELS = {
         "name": "GPT-3.5 Turbo",
         "description": "Fast and cost-effective for common tasks",
         "max_tokens": 4096,
+        "context_window": 16385,
         "temperature": 0.7,
         "cost_tier": "mid",
     },
@@ -67,6 +79,7 @@ AVAILABLE_MODELS = {
         "name": "Llama 3.1 70B",
         "description": "Open-source model, good performance at lower cost",
         "max_tokens": 4096,
+        "context_window": 131072,
         "temperature": 0.7,
         "cost_tier": "budget",
     },
@@ -74,6 +87,7 @@ AVAILABLE_MODELS = {
         "name": "Gemini Pro",
         "description": "Google's model, good for general tasks",
         "max_tokens": 4096,
+        "context_window": 32760,
         "temperature": 0.7,
         "cost_tier": "budget",
     },
@@ -82,6 +96,7 @@ AVAILABLE_MODELS = {
 # Model parameters
 DEFAULT_MAX_TOKENS = 4096
 DEFAULT_TEMPERATURE = 0.7
+DEFAULT_CONTEXT_WINDOW = 8192  # For models without a "context_window" entry
 
 # =============================================================================
 # Agent Configuration
@@ -113,9 +128,29 @@ When responding:
 Available data includes colonies in regions like Turkey (98 colonies), Italy (65), Greece (34), and many others across the Mediterranean and Black Sea regions."""
 
 # Chat settings
-MAX_CHAT_HISTORY = 20  # Number of messages to keep in context
+MAX_CHAT_HISTORY = 20  # Most messages sent verbatim; older ones are summarized
 ENABLE_STREAMING = True  # Stream responses for better UX
 
+# Tool calling: the model looks facts up with the agent_tools functions and
+# asks for charts through a tool (False: fenced JSON visualization requests)
+ENABLE_TOOL_CALLING = os.getenv("ENABLE_TOOL_CALLING", "true").lower() == "true"
+MAX_TOOL_ROUNDS = 3  # Tool rounds per answer before the model must reply
+
+# Answer exact dataset questions ("how many colonies in Italy?", "top 5
+# regions", "show me the map") locally instead of calling the LLM
+ENABLE_INTENT_ROUTER = os.getenv("ENABLE_INTENT_ROUTER", "true").lower() == "true"
+
+# Prompt size: each request fits the model's context window less its reply
+# tokens, and never exceeds MAX_PROMPT_TOKENS
+MAX_PROMPT_TOKENS = int(os.getenv("MAX_PROMPT_TOKENS", "8000"))
+
+# Rolling summary of older turns, computed in the background between turns
+SUMMARY_MODEL = os.getenv("SUMMARY_MODEL", "anthropic/claude-3-haiku")
+SUMMARY_MAX_TOKENS = 400
+SUMMARY_PROMPT = """Summarize the conversation below between a user and an assistant exploring Ancient Greek colonization data, for the assistant to continue from.
+
+Keep the regions, colonies, numbers, visualizations and user preferences that were discussed, and any open questions. Merge in the previous summary if there is one. Write at most a few short paragraphs in plain prose."""
+
 # =============================================================================
 # Visualization Configuration
 # =============================================================================
@@ -156,3 +191,7 @@ ENABLE_IMAGE_GENERATION = False  # Future feature
 DATA_FILE = "GR03-Ancient Greek Cities Before Hellenistic Period 20200131.txt"
 COUNTRY_MAPPING_FILE = "GR03-Country Code Mapping.csv"
 GEO_COORDINATES_FILE = "GR03-Selected Capital Geo Coordinates Modified.csv"
+
+# Live reload: watch the corpus file and patch the shared dataset in place of a restart
+ENABLE_DATA_RELOAD = os.getenv("ENABLE_DATA_RELOAD", "false").lower() == "true"
+DATA_RELOAD_INTERVAL = float(os.getenv("DATA_RELOAD_INTERVAL", "2.0"))  # Seconds between checks
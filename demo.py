@@ -7,7 +7,8 @@ This script shows how the agent tools work and what kind of analysis
 can be performed on the Greek colonization data.
 """
 
-from GR03A_DataFrame import create_df_for_viz, txt_to_dataframe
+from GR03A_DataFrame import load_datasets
+from colony_bands import DEFAULT_SCHEME
 from agent_tools import (
     get_colony_statistics,
     get_country_details,
@@ -34,8 +35,7 @@ def main():
     print("\nLoading data...")
     
     # Load data
-    df = create_df_for_viz()
-    cities_df = txt_to_dataframe()
+    df, cities_df = load_datasets()
     cities_df = cities_df.rename(columns={"Country Name": "Country", "City Name": "City"})
     
     print(f"✅ Loaded data for {len(df)} countries and {len(cities_df)} cities")
@@ -129,16 +129,8 @@ def main():
     # ==========================================================================
     print_header("Example 7: Colony Intensity Categories")
     
-    categories = [
-        "90+ colonies",
-        "60 - 90 colonies",
-        "30 - 60 colonies",
-        "10 - 20 colonies",
-        "Less than 10 colonies"
-    ]
-    
     print("\nColonies by Intensity Band:")
-    for category in categories:
+    for category in DEFAULT_SCHEME.display_order:
         countries = df[df['Category'] == category]['Country'].tolist()
         if countries:
             print(f"\n📌 {category}: {len(countries)} countries")
@@ -0,0 +1,261 @@
+"""Figure builders for Ancient Greek Colonization Explorer
+
+The charts shown by the dashboards and the chat agent are built here as
+plain Plotly figure dicts, straight from precomputed columns, instead of
+through ``plotly.express`` (which reshapes and validates a DataFrame per
+call) or validated ``graph_objects`` (which checks every property on
+assignment). The dicts produce the same visuals as the Express figures they
+replace: one trace per category in order of appearance, area-scaled
+markers, the same legend and the active default template.
+
+Dash accepts the dicts as they are; ``to_figure()`` wraps one in a
+``go.Figure`` without re-validating it, for code that needs the object.
+Plotly is only imported for the default template and colour sequence.
+"""
+
+from functools import lru_cache
+from typing import Any, Dict, Mapping, Optional, Sequence
+
+import numpy as np
+
+
+# Label Plotly Express gives a tree node whose children disagree
+MIXED_VALUE = '(?)'
+
+
+@lru_cache(maxsize=4)
+def _template(name: str) -> Dict[str, Any]:
+    import plotly.io as pio
+
+    return pio.templates[name].to_plotly_json()
+
+
+def default_template() -> Dict[str, Any]:
+    """The active default Plotly template as a dict (shared, do not modify)."""
+    import plotly.io as pio
+
+    return _template(pio.templates.default)
+
+
+def merge_layout(base: Dict[str, Any], updates: Optional[Mapping[str, Any]]) -> Dict[str, Any]:
+    """Return ``base`` with ``updates`` merged in, nested dicts key by key.
+
+    Like ``Figure.update_layout``, None removes a property; unlike it, there
+    is no underscore shorthand: write ``geo={'projection': {'scale': 3}}``
+    rather than ``geo_projection_scale=3``.
+    """
+    merged = dict(base)
+    for key, value in (updates or {}).items():
+        if value is None:
+            merged.pop(key, None)
+        elif isinstance(value, Mapping) and isinstance(merged.get(key), Mapping):
+            merged[key] = merge_layout(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def figure(data: Sequence[Dict[str, Any]], layout: Optional[Mapping[str, Any]] = None) -> Dict[str, Any]:
+    """Assemble a figure dict on the default template."""
+    return {'data': list(data), 'layout': merge_layout({'template': default_template()}, layout)}
+
+
+def to_figure(spec: Dict[str, Any]):
+    """Wrap a figure dict in a ``go.Figure`` without validating its properties."""
+    import plotly.graph_objects as go
+
+    return go.Figure(spec, _validate=False)
+
+
+def _column(values) -> np.ndarray:
+    return values.to_numpy() if hasattr(values, 'to_numpy') else np.asarray(values)
+
+
+# =============================================================================
+# Bubble map
+# =============================================================================
+
+def bubble_map(
+    lat,
+    lon,
+    size,
+    group,
+    hovertext,
+    colors: Mapping[str, str],
+    size_max: float = 20,
+    order: Optional[Sequence[str]] = None,
+    customdata=None,
+    hovertemplate: str = '<b>%{hovertext}</b><extra></extra>',
+    marker: Optional[Mapping[str, Any]] = None,
+    legend_title: str = 'Category',
+    layout: Optional[Mapping[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Scatter-geo bubble map with one trace per ``group`` value.
+
+    Equivalent to ``px.scatter_geo(..., color=group, size=size,
+    hover_name=hovertext, size_max=size_max)``. Traces follow ``order`` and
+    then order of appearance; groups with no rows get no trace. ``{group}``
+    in ``hovertemplate`` is replaced by each trace's group, and ``marker``
+    adds properties (e.g. ``line``) to every trace's markers.
+    """
+    lat, lon, size = _column(lat), _column(lon), _column(size).astype(float)
+    group, hovertext = _column(group).astype(object), _column(hovertext).astype(object)
+    customdata = None if customdata is None else _column(customdata)
+
+    present = list(dict.fromkeys(group.tolist()))
+    if order is not None:
+        present = [name for name in order if name in present] + [name for name in present if name not in order]
+    largest = size.max(initial=0)
+    sizeref = largest / size_max ** 2 if largest else 1
+
+    traces = []
+    for name in present:
+        rows = np.flatnonzero(group == name)
+        trace = {
+            'type': 'scattergeo',
+            'mode': 'markers',
+            'geo': 'geo',
+            'name': name,
+            'legendgroup': name,
+            'showlegend': True,
+            'lat': lat[rows].tolist(),
+            'lon': lon[rows].tolist(),
+            'hovertext': hovertext[rows].tolist(),
+            'hovertemplate': hovertemplate.replace('{group}', str(name)),
+            'marker': {
+                'color': colors.get(name),
+                'size': size[rows].tolist(),
+                'sizemode': 'area',
+                'sizeref': sizeref,
+                'symbol': 'circle',
+                **(marker or {}),
+            },
+        }
+        if customdata is not None:
+            trace['customdata'] = customdata[rows].tolist()
+        traces.append(trace)
+
+    base = {
+        'geo': {'domain': {'x': [0.0, 1.0], 'y': [0.0, 1.0]}},
+        'legend': {'title': {'text': legend_title}, 'tracegroupgap': 0, 'itemsizing': 'constant'},
+        'margin': {'t': 60},
+    }
+    return figure(traces, merge_layout(base, layout))
+
+
+# =============================================================================
+# Bar chart
+# =============================================================================
+
+def bar_chart(x, y, layout: Optional[Mapping[str, Any]] = None, **trace: Any) -> Dict[str, Any]:
+    """Single-trace bar chart; ``trace`` holds the other ``go.Bar`` properties."""
+    bar = {'type': 'bar', 'x': _column(x).tolist(), 'y': _column(y).tolist()}
+    for key, value in trace.items():
+        bar[key] = value.tolist() if hasattr(value, 'tolist') else value
+    return figure([bar], layout)
+
+
+# =============================================================================
+# Treemap
+# =============================================================================
+
+def _common(values: Sequence[Any]) -> Any:
+    #Value shared by every child, else the mixed marker (as Plotly Express does)
+    first = values[0]
+    return first if all(value == first for value in values) else MIXED_VALUE
+
+
+def group_treemap(
+    root: str,
+    group,
+    label,
+    value,
+    colors: Mapping[str, str],
+    hovertemplate: Optional[str] = None,
+    layout: Optional[Mapping[str, Any]] = None,
+    **trace: Any,
+) -> Dict[str, Any]:
+    """Treemap of ``root`` > ``group`` > ``label`` sized by ``value``.
+
+    Equivalent to ``px.treemap(path=[px.Constant(root), group, label],
+    values=value, color=group, custom_data=[label, value])``: every node
+    carries ``customdata`` of its label (or ``MIXED_VALUE`` when its children
+    differ) and total value, and groups keep their colour from ``colors``.
+    """
+    group = _column(group).astype(object).tolist()
+    label = _column(label).astype(object).tolist()
+    value = _column(value).astype(float).tolist()
+
+    children: Dict[Any, list] = {}
+    for row, name in enumerate(group):
+        children.setdefault(name, []).append(row)
+
+    # The root gets the next colour of the sequence, as Express does for
+    # values missing from a discrete colour map
+    colorway = default_template()['layout'].get('colorway') or ['#636efa']
+    mixed_color = colorway[len(colors) % len(colorway)]
+
+    ids, labels, parents, values, customdata, node_colors = [root], [root], [''], [sum(value)], [], []
+    customdata.append([_common(label), sum(value)])
+    node_colors.append(colors.get(_common(group), mixed_color))
+    for name, rows in children.items():
+        group_id = f'{root}/{name}'
+        for row in rows:
+            ids.append(f'{group_id}/{label[row]}')
+            labels.append(label[row])
+            parents.append(group_id)
+            values.append(value[row])
+            customdata.append([label[row], value[row]])
+            node_colors.append(colors.get(name, mixed_color))
+        total = sum(value[row] for row in rows)
+        ids.append(group_id)
+        labels.append(name)
+        parents.append(root)
+        values.append(total)
+        customdata.append([_common([label[row] for row in rows]), total])
+        node_colors.append(colors.get(name, mixed_color))
+
+    treemap = {
+        'type': 'treemap',
+        'branchvalues': 'total',
+        'domain': {'x': [0.0, 1.0], 'y': [0.0, 1.0]},
+        'ids': ids,
+        'labels': labels,
+        'parents': parents,
+        'values': values,
+        'customdata': customdata,
+        'marker': {'colors': node_colors},
+        'name': '',
+        **trace,
+    }
+    if hovertemplate is not None:
+        treemap['hovertemplate'] = hovertemplate
+    return figure([treemap], merge_layout({'legend': {'tracegroupgap': 0}, 'margin': {'t': 60}}, layout))
+
+
+# =============================================================================
+# Concentration curve
+# =============================================================================
+
+def concentration_curve(
+    counts,
+    counts_trace: Optional[Mapping[str, Any]] = None,
+    share_trace: Optional[Mapping[str, Any]] = None,
+    layout: Optional[Mapping[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Counts by rank (largest first) with their cumulative share on ``y2``.
+
+    ``counts_trace`` and ``share_trace`` add properties to the two scatter
+    traces; ``layout`` should define ``yaxis2`` (overlaying ``y``).
+    """
+    ranked = np.sort(_column(counts))[::-1]
+    ranks = np.arange(1, len(ranked) + 1).tolist()
+    total = ranked.sum()
+    share = (np.cumsum(ranked) / total if total else np.zeros(len(ranked))).tolist()
+    return figure(
+        [
+            {'type': 'scatter', 'x': ranks, 'y': ranked.tolist(), **(counts_trace or {})},
+            {'type': 'scatter', 'x': ranks, 'y': share, 'yaxis': 'y2', **(share_trace or {})},
+        ],
+        layout,
+    )
@@ -0,0 +1,270 @@
+"""Figure payload trimming for Ancient Greek Colonization Explorer
+
+Figures sent to the browser carry more than they display: the default
+template holds styling for every trace type and subplot Plotly knows,
+coordinates keep the 8+ decimals of the capitals CSV, and hover columns are
+shipped even when no hover template reads them. ``compact_figure()`` drops
+all of that without changing what is drawn:
+
+- template trace defaults are kept only for the trace types in the figure,
+  and template subplot styling only for the subplots it uses
+- latitudes and longitudes are rounded to ``COORDINATE_DECIMALS`` (about
+  10 m, far below what a world map can show)
+- ``customdata`` columns and ``hovertext`` that no hover or text template
+  reads are removed (pass ``keep_customdata=True`` when callbacks read
+  columns the templates do not)
+
+``to_json()`` serializes with orjson when it is installed. Run the module to
+report the payload of each chat chart against its budget:
+
+    python figure_payload.py
+"""
+
+import json
+import re
+import sys
+import warnings
+from typing import Any, Dict, Iterable, List, Mapping, NamedTuple, Optional, Set
+
+import numpy as np
+
+
+# Decimals kept for latitudes and longitudes
+COORDINATE_DECIMALS = 4
+
+# Largest serialized figure, in bytes, before a payload report complains
+PAYLOAD_BUDGET_BYTES = 24 * 1024
+
+# Template layout keys styling one kind of subplot, and the trace types
+# drawn on it; unknown trace types keep every subplot's styling
+SUBPLOT_TRACES = {
+    'geo': {'scattergeo', 'choropleth'},
+    'xaxis': {'scatter', 'scattergl', 'bar', 'histogram', 'box', 'violin', 'heatmap', 'contour',
+              'histogram2d', 'histogram2dcontour', 'waterfall', 'funnel', 'candlestick', 'ohlc',
+              'image', 'carpet', 'contourcarpet', 'scattercarpet'},
+    'scene': {'scatter3d', 'surface', 'mesh3d', 'cone', 'streamtube', 'volume', 'isosurface'},
+    'polar': {'scatterpolar', 'scatterpolargl', 'barpolar'},
+    'ternary': {'scatterternary'},
+    'smith': {'scattersmith'},
+    'mapbox': {'scattermapbox', 'choroplethmapbox', 'densitymapbox'},
+    'map': {'scattermap', 'choroplethmap', 'densitymap'},
+}
+SUBPLOT_TRACES['yaxis'] = SUBPLOT_TRACES['xaxis']
+# Trace types drawn without any subplot
+UNPLACED_TRACES = {'pie', 'treemap', 'sunburst', 'icicle', 'funnelarea', 'sankey', 'table',
+                   'indicator', 'parcoords', 'parcats'}
+# Trace types coloured through a colour scale
+SCALED_TRACES = {'heatmap', 'contour', 'histogram2d', 'histogram2dcontour', 'surface', 'choropleth',
+                 'choroplethmapbox', 'choroplethmap', 'densitymapbox', 'densitymap', 'cone',
+                 'streamtube', 'volume', 'isosurface', 'mesh3d', 'contourcarpet', 'parcoords'}
+
+_CUSTOMDATA_COLUMN = re.compile(r'customdata\[(\d+)\]')
+_TEMPLATE_KEYS = ('hovertemplate', 'texttemplate')
+
+
+class PayloadBudgetWarning(UserWarning):
+    """A serialized figure is larger than its payload budget."""
+
+
+class PayloadSize(NamedTuple):
+    """Serialized size of one figure against its budget."""
+    name: str
+    bytes: int
+    budget: int
+
+    @property
+    def over_budget(self) -> bool:
+        return self.bytes > self.budget
+
+
+# =============================================================================
+# Compaction
+# =============================================================================
+
+def _plain(value: Any) -> Any:
+    #Plain-Python copy of a figure fragment (numpy arrays become lists)
+    if isinstance(value, Mapping):
+        return {key: _plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _round(values: Any, decimals: int) -> Any:
+    if isinstance(values, (list, tuple, np.ndarray)):
+        return np.round(np.asarray(values, dtype=float), decimals).tolist()
+    if isinstance(values, (int, float)):
+        return round(values, decimals)
+    return values
+
+
+def _template_strings(trace: Mapping[str, Any]) -> List[str]:
+    strings = []
+    for key in _TEMPLATE_KEYS:
+        value = trace.get(key)
+        if isinstance(value, str):
+            strings.append(value)
+        elif isinstance(value, (list, tuple)):
+            strings.extend(item for item in value if isinstance(item, str))
+    return strings
+
+
+def _trim_trace(trace: Mapping[str, Any], decimals: int, keep_customdata: bool) -> Dict[str, Any]:
+    trace = dict(trace)
+    for key in ('lat', 'lon'):
+        if key in trace:
+            trace[key] = _round(trace[key], decimals)
+
+    strings = _template_strings(trace)
+    if not strings:
+        # Default hover labels may show anything
+        return trace
+    used = ' '.join(strings)
+
+    if 'hovertext' in trace and '%{hovertext' not in used:
+        trace.pop('hovertext')
+    customdata = trace.get('customdata')
+    if customdata is not None and not keep_customdata and '%{customdata}' not in used:
+        columns = [int(index) for index in _CUSTOMDATA_COLUMN.findall(used)]
+        if not columns:
+            trace.pop('customdata')
+        elif all(isinstance(row, (list, tuple)) for row in customdata):
+            width = max(columns) + 1
+            trace['customdata'] = [list(row[:width]) for row in customdata]
+    return trace
+
+
+def _uses_colorscale(trace: Mapping[str, Any]) -> bool:
+    marker = trace.get('marker') or {}
+    if trace.get('type') in SCALED_TRACES or 'coloraxis' in trace or 'coloraxis' in marker:
+        return True
+    if 'colorscale' in marker:
+        return True
+    colors = marker.get('color')
+    return isinstance(colors, list) and any(isinstance(color, (int, float)) for color in colors)
+
+
+def _trim_template(template: Mapping[str, Any], traces: List[Mapping[str, Any]]) -> Dict[str, Any]:
+    types = {trace.get('type', 'scatter') for trace in traces}
+    known = set().union(UNPLACED_TRACES, *SUBPLOT_TRACES.values())
+    layout = dict(template.get('layout') or {})
+
+    if types <= known:
+        for key, subplot_types in SUBPLOT_TRACES.items():
+            # With no traces at all Plotly still draws empty cartesian axes
+            needed = types & subplot_types or (not traces and key in ('xaxis', 'yaxis'))
+            if not needed:
+                layout.pop(key, None)
+        if not any(_uses_colorscale(trace) for trace in traces):
+            layout.pop('colorscale', None)
+            layout.pop('coloraxis', None)
+
+    data = {key: value for key, value in (template.get('data') or {}).items() if key in types}
+    return {'data': data, 'layout': layout}
+
+
+def compact_figure(
+    fig: Any,
+    decimals: int = COORDINATE_DECIMALS,
+    keep_customdata: bool = False,
+) -> Dict[str, Any]:
+    """Return a trimmed plain-dict copy of ``fig`` (a figure dict or ``go.Figure``).
+
+    The input is not modified. Anything Dash passes through untouched
+    (``Patch``, ``no_update``) should not be given here.
+    """
+    if hasattr(fig, 'to_plotly_json'):
+        fig = fig.to_plotly_json()
+    traces = [_trim_trace(trace, decimals, keep_customdata) for trace in fig.get('data') or ()]
+
+    layout = dict(fig.get('layout') or {})
+    if isinstance(layout.get('template'), Mapping):
+        layout['template'] = _trim_template(layout['template'], traces)
+    geo = layout.get('geo')
+    if isinstance(geo, Mapping) and isinstance(geo.get('center'), Mapping):
+        center = {key: _round(value, decimals) for key, value in geo['center'].items()}
+        layout['geo'] = {**geo, 'center': center}
+
+    compact = {'data': _plain(traces), 'layout': _plain(layout)}
+    for key, value in fig.items():
+        if key not in compact:
+            compact[key] = _plain(value)
+    return compact
+
+
+# =============================================================================
+# Serialization and payload reports
+# =============================================================================
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def to_json(fig: Mapping[str, Any]) -> str:
+    """Serialize a figure dict, with orjson when it is installed."""
+    try:
+        import orjson
+    except ImportError:
+        return json.dumps(fig, separators=(',', ':'), default=_json_default)
+    return orjson.dumps(fig, default=_json_default, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+
+
+def payload_report(
+    figures: Mapping[str, Mapping[str, Any]],
+    budget: int = PAYLOAD_BUDGET_BYTES,
+) -> List[PayloadSize]:
+    """Serialized size of each named figure dict; warns for any over ``budget``."""
+    sizes = [PayloadSize(name, len(to_json(fig).encode('utf-8')), budget) for name, fig in figures.items()]
+    over = [size.name for size in sizes if size.over_budget]
+    if over:
+        warnings.warn(
+            f"Figures over the {budget}-byte payload budget: {', '.join(over)}",
+            PayloadBudgetWarning,
+            stacklevel=2,
+        )
+    return sizes
+
+
+def main(argv: Optional[Iterable[str]] = None) -> int:
+    """Report the payload of every chat chart, before and after trimming."""
+    import argparse
+
+    import plotly.io as pio
+
+    from GR03A_DataFrame import create_df_for_viz
+    from agent_tools import FIGURE_BUILDERS
+
+    parser = argparse.ArgumentParser(description="Report serialized figure sizes against a budget.")
+    parser.add_argument('--budget', type=int, default=PAYLOAD_BUDGET_BYTES, help="bytes allowed per figure")
+    args = parser.parse_args(argv)
+
+    df = create_df_for_viz()
+    busiest = str(df.loc[df['No of Cities'].idxmax(), 'Country'])
+    figures = {}
+    for kind, builder in FIGURE_BUILDERS.items():
+        figures[kind] = builder(df, {})
+        figures[f'{kind} ({busiest})'] = builder(df, {'country': busiest})
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', PayloadBudgetWarning)
+        sizes = payload_report({name: compact_figure(fig) for name, fig in figures.items()}, args.budget)
+
+    failures = 0
+    for size in sizes:
+        full = len(pio.to_json(figures[size.name], validate=False).encode('utf-8'))
+        failures += size.over_budget
+        status = 'FAIL' if size.over_budget else 'OK  '
+        print(f"{status} {size.name}: {size.bytes} bytes (was {full}, budget {size.budget})")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,159 @@
+"""Bubble-map templates for Ancient Greek Colonization Explorer
+
+Highlighting a country on a bubble map only changes a handful of properties:
+the marker sizes and opacities of each trace, the size reference and,
+optionally, where the map is centred. This module keeps the fully built
+figure for the unselected state as a template and expresses a selection as
+a short list of property patches, which can be applied either
+
+- to a Dash ``Patch`` (only the changed properties travel to the browser), or
+- to a copy of the template that shares every unchanged part with it.
+
+Templates are cached by the callers under the dataset version and the
+settings that shape the base figure (filters, projection, size mode).
+"""
+
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+# A patch sets the value at a path of keys/indexes inside a figure dict
+PropertyPatch = Tuple[Tuple[Any, ...], Any]
+
+
+@dataclass(frozen=True)
+class Highlight:
+    """How a selected country stands out on a bubble map.
+
+    Marker sizes are ``unit * idle_scale`` with nothing selected; with a
+    selection they are ``unit * scale``, times ``boost`` for the selected
+    country. ``idle_opacity`` may be a scalar (one value per trace) or None
+    to use one value per point.
+    """
+    idle_scale: float
+    scale: float
+    boost: float
+    size_max: float
+    opacity: float = 0.85
+    dimmed: float = 0.25
+    idle_opacity: Optional[float] = None
+
+
+class MapTemplate:
+    """A bubble map built once, highlighted by patching.
+
+    ``figure`` is the map with nothing selected, a figure dict (or
+    ``go.Figure``) from ``figure_factory.bubble_map()`` with ``hovertext`` set
+    to the country, which is how each marker is matched to its country.
+    ``units`` maps each country to its size before scaling (its
+    colony count, or 1 for uniform markers). ``focus`` returns the
+    ``layout.geo`` properties to set for a selection (None = no selection),
+    for maps that also re-centre.
+    """
+
+    def __init__(
+        self,
+        figure: Any,
+        units: Mapping[str, float],
+        highlight: Highlight,
+        focus: Optional[Callable[[Optional[str]], Dict[Tuple[str, ...], Any]]] = None,
+    ):
+        self.figure = figure.to_plotly_json() if hasattr(figure, "to_plotly_json") else figure
+        self.highlight = highlight
+        self.focus = focus
+        self._countries: List[List[str]] = []
+        self._units: List[np.ndarray] = []
+        for trace in self.figure["data"]:
+            countries = [str(country) for country in trace.get("hovertext", ())]
+            self._countries.append(countries)
+            self._units.append(np.asarray([units[country] for country in countries], dtype=float))
+        self._all_units = np.concatenate(self._units) if self._units else np.empty(0)
+
+    def __contains__(self, country: str) -> bool:
+        return any(country in countries for countries in self._countries)
+
+    def patches(self, selected: Optional[str] = None) -> List[PropertyPatch]:
+        """Property patches that turn the template into the map for ``selected``.
+
+        Unknown countries (and None) give the unselected map. The patches
+        overwrite every property a selection touches, so they can be applied
+        on top of any previously highlighted version of the same template.
+        """
+        spec = self.highlight
+        if selected is not None and selected not in self:
+            selected = None
+
+        if selected is None:
+            scale, largest = spec.idle_scale, self._all_units.max(initial=0) * spec.idle_scale
+        else:
+            scale = spec.scale
+            boosted = [units[np.asarray(countries) == selected] for units, countries in zip(self._units, self._countries)]
+            largest = max(
+                self._all_units.max(initial=0) * spec.scale,
+                max((units.max(initial=0) * spec.scale * spec.boost for units in boosted), default=0),
+            )
+        sizeref = largest / spec.size_max ** 2 if largest else 1
+
+        patches: List[PropertyPatch] = []
+        for i, (countries, units) in enumerate(zip(self._countries, self._units)):
+            sizes = units * scale
+            if selected is None:
+                opacity = spec.idle_opacity if spec.idle_opacity is not None else [spec.opacity] * len(countries)
+            else:
+                is_selected = np.asarray(countries) == selected
+                sizes[is_selected] *= spec.boost
+                opacity = np.where(is_selected, spec.opacity, spec.dimmed).tolist()
+            patches.append((("data", i, "marker", "size"), sizes.tolist()))
+            patches.append((("data", i, "marker", "sizeref"), sizeref))
+            patches.append((("data", i, "marker", "opacity"), opacity))
+
+        if self.focus is not None:
+            for path, value in self.focus(selected).items():
+                patches.append((("layout", "geo", *path), value))
+        return patches
+
+    def render(self, selected: Optional[str] = None) -> Dict[str, Any]:
+        """Return the figure dict for ``selected``.
+
+        Only the containers along patched paths are copied; everything else
+        (coordinates, hover text, styling) is shared with the template, so
+        the result must be treated as read-only.
+        """
+        return apply_patches(self.figure, self.patches(selected))
+
+    def patch(self, selected: Optional[str] = None):
+        """Return a Dash ``Patch`` that highlights ``selected`` on the client's copy."""
+        from dash import Patch
+
+        patch = Patch()
+        for path, value in self.patches(selected):
+            target = patch
+            for key in path[:-1]:
+                target = target[key]
+            target[path[-1]] = value
+        return patch
+
+
+def apply_patches(figure: Dict[str, Any], patches: Sequence[PropertyPatch]) -> Dict[str, Any]:
+    """Return a copy of ``figure`` with ``patches`` applied, copying only what they touch."""
+    result = dict(figure)
+    copied = {id(result)}
+    for path, value in patches:
+        target = result
+        for key in path[:-1]:
+            child = target[key] if _has(target, key) else {}
+            if id(child) not in copied:
+                child = list(child) if isinstance(child, list) else dict(child)
+                copied.add(id(child))
+                target[key] = child
+            target = child
+        target[path[-1]] = value
+    return result
+
+
+def _has(container: Any, key: Any) -> bool:
+    if isinstance(container, list):
+        return isinstance(key, int) and -len(container) <= key < len(container)
+    return key in container
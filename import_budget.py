@@ -0,0 +1,83 @@
+"""Import-time budget check for Ancient Greek Colonization Explorer
+
+Each module is imported in a fresh interpreter. The check fails when the
+import costs more than its budget on top of importing pandas (which the data
+layer needs anyway), or when it pulls in a UI/plotting package that should
+only load on first use. Run it locally or in CI:
+
+    python import_budget.py
+"""
+
+import subprocess
+import sys
+
+# Allowed cold-import time in seconds, on top of `import pandas`
+IMPORT_BUDGETS = {
+    "colony_bands": 0.15,
+    "colony_geo": 0.15,
+    "colony_spatial": 0.15,
+    "synthetic_corpus": 0.25,
+    "colony_search": 0.15,
+    "colony_cache": 0.15,
+    "figure_templates": 0.15,
+    "figure_factory": 0.15,
+    "figure_payload": 0.15,
+    "chat_history": 0.15,
+    "GR03A_DataFrame": 0.20,
+    "agent_tools": 0.25,
+    "agent_loop": 0.25,
+    "intent_router": 0.25,
+    "visualization_stream": 0.15,
+}
+
+# Packages the data/analysis layer must not import eagerly
+FORBIDDEN_PACKAGES = ("plotly", "dash", "chainlit", "openai")
+
+# Best of N runs, to keep scheduler noise out of the result
+REPEATS = 3
+
+PROBE = (
+    "import sys, time\n"
+    "start = time.perf_counter()\n"
+    "import {module}\n"
+    "print(time.perf_counter() - start)\n"
+    "print(','.join(sorted({{name.split('.')[0] for name in sys.modules}} & {forbidden!r})))\n"
+)
+
+
+def measure(module):
+    """Return (best cold-import seconds, forbidden packages loaded) for ``module``."""
+    timings = []
+    loaded = ""
+    for _ in range(REPEATS):
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module, forbidden=set(FORBIDDEN_PACKAGES))],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.splitlines()
+        timings.append(float(output[0]))
+        loaded = output[1] if len(output) > 1 else ""
+    return min(timings), [name for name in loaded.split(",") if name]
+
+
+def main():
+    """Check every module against its budget; return a process exit code."""
+    baseline, _ = measure("pandas")
+    print(f"baseline (pandas): {baseline:.3f}s")
+
+    failures = 0
+    for module, budget in IMPORT_BUDGETS.items():
+        seconds, loaded = measure(module)
+        overhead = seconds - baseline
+        ok = overhead <= budget and not loaded
+        failures += not ok
+        status = "OK  " if ok else "FAIL"
+        extra = f" (loads {', '.join(loaded)})" if loaded else ""
+        print(f"{status} {module}: {seconds:.3f}s (+{overhead:.3f}s, budget +{budget:.2f}s){extra}")
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,247 @@
+"""Local intent routing for Ancient Greek Colonization Explorer
+
+Many chat questions have one exact answer in the dataset: "how many colonies
+in Italy?", "top 5 regions", "show me the map". ``IntentRouter`` recognizes
+those with a handful of whole-message patterns and answers them from
+``agent_tools`` without calling the LLM; the chart, if any, is rendered by
+the caller as for any other visualization request. Anything the patterns do
+not cover completely (an unknown place, a "why", a follow-up clause) falls
+through to the LLM, so a miss costs nothing but a few regex matches.
+
+The router counts hits and misses per process. Run the module to see which
+questions it would answer, e.g. on the sample conversations:
+
+    python intent_router.py SAMPLE_CONVERSATIONS.md
+"""
+
+import re
+import sys
+import threading
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional
+
+from agent_tools import compare_countries, get_colony_statistics, get_country_details, summarize_colonies
+from GR03A_DataFrame import ColonyDataset
+
+
+# Bars shown for "top regions" questions that give no number
+DEFAULT_TOP_N = 5
+MAX_TOP_N = 50
+
+_NUMBERS = {"three": 3, "five": 5, "ten": 10}
+
+# Politeness and filler stripped before matching
+_PREFIX = re.compile(r"^(?:(?:please|hey|hi|ok|okay|so|can you|could you|would you|will you)[,\s]+)+")
+_SUFFIX = re.compile(r"(?:[,\s]+(?:please|thanks|thank you))+$")
+_COLONIES = r"(?:greek )?(?:colonies|settlements|cities)"
+_REGIONS = r"(?:regions|countries|places|areas)"
+
+
+class Route(NamedTuple):
+    """A locally answered message: its intent, answer text and visualization
+    requests (the text is meant to head the first chart, when there is one)."""
+    intent: str
+    content: str
+    visualizations: List[Dict[str, Any]]
+
+
+def normalize(message: str) -> str:
+    """Lower-case ``message`` and strip filler, whitespace and end punctuation."""
+    text = re.sub(r"\s+", " ", message.lower()).strip().rstrip("?.! ")
+    text = _PREFIX.sub("", text)
+    return _SUFFIX.sub("", text).strip()
+
+
+# =============================================================================
+# Answers
+# =============================================================================
+
+def _country(dataset: ColonyDataset, name: str) -> Optional[str]:
+    #Dataset spelling of a country named in a message, if it is one
+    name = re.sub(r"^(?:the|modern(?:-day)?)\s+", "", name.strip())
+    lookup = {country.lower(): country for country in dataset.countries}
+    return lookup.get(name)
+
+
+def _country_count(dataset: ColonyDataset, match: re.Match) -> Optional[Route]:
+    country = _country(dataset, match["place"])
+    if country is None:
+        return None
+    details = get_country_details(dataset.summary_df, dataset.cities_df, country)
+    examples = ", ".join(details["cities"][:5])
+    count = details["num_colonies"]
+    content = (
+        f"**{country}** had **{count}** Greek {'colony' if count == 1 else 'colonies'} "
+        f"(intensity category: {details['category']}).\n\n"
+        f"Examples: {examples}{'…' if details['total_cities'] > 5 else ''}"
+    )
+    return Route("country_count", content, [])
+
+
+def _total(dataset: ColonyDataset, match: re.Match) -> Route:
+    stats = get_colony_statistics(dataset.summary_df)
+    content = (
+        f"The dataset records **{stats['total_colonies']}** Greek colonies "
+        f"across **{stats['total_countries']}** modern countries/regions."
+    )
+    return Route("total", content, [])
+
+
+def _average(dataset: ColonyDataset, match: re.Match) -> Route:
+    stats = get_colony_statistics(dataset.summary_df)
+    content = (
+        f"On average a region had **{stats['average_colonies']:.1f}** colonies "
+        f"(median {stats['median_colonies']:.0f}, from {stats['min_colonies']} "
+        f"to {stats['max_colonies']}, over {stats['total_countries']} regions)."
+    )
+    return Route("average", content, [])
+
+
+def _top(dataset: ColonyDataset, match: re.Match) -> Route:
+    count = match.groupdict().get("n")
+    summary = summarize_colonies(dataset.summary_df)
+    # One clamped count for both the text and the chart
+    top_n = max(1, min(MAX_TOP_N, summary["countries"], int(_NUMBERS.get(count, count or DEFAULT_TOP_N))))
+    ranked = summary["ranked"].head(top_n)
+    heading = "Top region" if top_n == 1 else f"Top {top_n} regions"
+    lines = [f"{heading} by number of Greek colonies:\n"]
+    for rank, (country, colonies) in enumerate(ranked.itertuples(index=False, name=None), 1):
+        share = colonies / summary["total"] * 100
+        noun = "colony" if colonies == 1 else "colonies"
+        lines.append(f"{rank}. **{country}**: {int(colonies)} {noun} ({share:.1f}%)")
+    return Route("top", "\n".join(lines), [{"visualization": "bar", "parameters": {"top_n": top_n}}])
+
+
+def _compare(dataset: ColonyDataset, match: re.Match) -> Optional[Route]:
+    names = re.split(r"\s*(?:,|\band\b|\bwith\b|\bvs\.?|\bversus\b)\s*", match["places"])
+    countries = [_country(dataset, name) for name in names if name]
+    if len(countries) < 2 or None in countries:
+        return None
+    table = compare_countries(dataset.summary_df, dataset.cities_df, countries)
+    return Route("compare", table, [])
+
+
+def _chart(kind: str, text: str) -> Callable[[ColonyDataset, re.Match], Optional[Route]]:
+    #Answer showing chart ``kind``, highlighting the country named in the message if any
+    def answer(dataset: ColonyDataset, match: re.Match) -> Optional[Route]:
+        parameters = {}
+        place = match.groupdict().get("place")
+        content = f"{text}:"
+        if place:
+            country = _country(dataset, place)
+            if country is None:
+                return None
+            parameters["country"] = country
+            content = f"{text}, with {country} highlighted:"
+        return Route(kind, content, [{"visualization": kind, "parameters": parameters}])
+    return answer
+
+
+_SHOW = r"(?:show(?: me)?|display|draw|plot|give me|i want to see|let me see)"
+_ALL = r"(?:(?:all|every)(?: of)?(?: the)? )?"
+_MAP = _chart("map", "📍 Here's the map visualization")
+
+# (pattern, answer) pairs, tried in order; patterns must match the whole
+# normalized message. An answer returning None falls through to the LLM.
+INTENTS = [
+    (rf"how many {_COLONIES} (?:are there |were there |did the greeks found |were founded )?in (?P<place>[a-z .'-]+)",
+     _country_count),
+    (rf"(?:number of|count of) {_COLONIES} in (?P<place>[a-z .'-]+)", _country_count),
+    (rf"how many {_COLONIES} (?:are|were) (?:there|in the dataset|recorded)(?: in total| altogether)?", _total),
+    (rf"how many {_COLONIES}(?: are there| were there)? (?:in total|altogether)", _total),
+    (rf"(?:what is |what's )?the total number of {_COLONIES}", _total),
+    (rf"(?:what is |what's )?the average (?:number of )?{_COLONIES} per (?:country|region)", _average),
+    (rf"(?:(?:show(?: me)?|list|what are|which are) )?(?:the )?top (?:(?P<n>\d+|three|five|ten) )?{_REGIONS}"
+     rf"(?: by (?:number of )?{_COLONIES})?", _top),
+    (rf"which {_REGIONS} had the most {_COLONIES}", _top),
+    (rf"compare (?:(?:greek )?(?:colonization|colonisation|{_COLONIES}) (?:in|of|between) )?(?P<places>[a-z ,.'-]+)",
+     _compare),
+    (rf"{_SHOW} (?:a |the )?map(?: of {_ALL}(?:the )?{_COLONIES})?", _MAP),
+    (rf"{_SHOW} (?:a |the )?map of {_ALL}(?:the )?{_COLONIES} in (?P<place>[a-z .'-]+)",
+     _MAP),
+    (rf"{_SHOW} (?:a |the )?(?:colony |colonies )?map (?:of|for|highlighting) (?P<place>[a-z .'-]+)",
+     _MAP),
+    (rf"{_SHOW} (?:a |the )?bar ?chart(?: of {_ALL}(?:the )?{_REGIONS})?", _chart("bar", "📊 Here's the bar chart")),
+    (rf"{_SHOW} (?:a |the )?(?:category|categories|intensity) (?:distribution|breakdown|chart)",
+     _chart("category", "📈 Here's the category distribution")),
+]
+
+
+# =============================================================================
+# Router
+# =============================================================================
+
+class IntentRouter:
+    """Answers the messages ``INTENTS`` covers; counts hits and misses."""
+
+    def __init__(self, intents=INTENTS):
+        self._intents = [(re.compile(pattern), answer) for pattern, answer in intents]
+        self._lock = threading.Lock()
+        self.hits: Counter = Counter()
+        self.misses = 0
+
+    def route(self, message: str, dataset: ColonyDataset) -> Optional[Route]:
+        """Answer ``message`` locally, or return None to hand it to the LLM."""
+        text = normalize(message)
+        found = None
+        for pattern, answer in self._intents:
+            match = pattern.fullmatch(text)
+            if match is not None:
+                found = answer(dataset, match)
+                if found is not None:
+                    break
+        with self._lock:
+            if found is None:
+                self.misses += 1
+            else:
+                self.hits[found.intent] += 1
+        return found
+
+    def stats(self) -> Dict[str, Any]:
+        """Routed and fallen-through message counts, hit rate and hits per intent."""
+        with self._lock:
+            hits = sum(self.hits.values())
+            total = hits + self.misses
+            return {
+                "hits": hits,
+                "misses": self.misses,
+                "hit_rate": hits / total if total else 0.0,
+                "intents": dict(self.hits),
+            }
+
+
+def _questions(lines: Iterable[str]) -> List[str]:
+    #One question per line, or the "**User:**" lines of a conversation transcript
+    lines = [line.strip() for line in lines if line.strip()]
+    marked = [line.split("**User:**", 1)[1].strip() for line in lines if line.startswith("**User:**")]
+    return marked or lines
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Route each question of a file (or stdin) and report the hit rate."""
+    import argparse
+
+    from GR03A_DataFrame import load_colony_dataset
+
+    parser = argparse.ArgumentParser(description="Report which questions the local intent router answers.")
+    parser.add_argument("file", nargs="?", help="questions, one per line, or a conversation transcript")
+    args = parser.parse_args(argv)
+
+    if args.file:
+        with open(args.file, encoding="utf-8") as handle:
+            questions = _questions(handle)
+    else:
+        questions = _questions(sys.stdin)
+
+    dataset = load_colony_dataset()
+    router = IntentRouter()
+    for question in questions:
+        found = router.route(question, dataset)
+        print(f"{found.intent if found else 'LLM':>13}  {question}")
+    stats = router.stats()
+    print(f"\nhit rate: {stats['hit_rate']:.0%} ({stats['hits']}/{stats['hits'] + stats['misses']})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
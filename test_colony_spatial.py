@@ -0,0 +1,32 @@
+"""Tests for the colony spatial index"""
+
+import numpy as np
+import pandas as pd
+
+from colony_spatial import SpatialIndex
+
+
+def _brute_force_bbox(points, min_lat, min_lon, max_lat, max_lon):
+    lats, lons = points['Latitude'], points['Longitude']
+    in_lon = (lons >= min_lon) & (lons <= max_lon) if min_lon <= max_lon else (lons >= min_lon) | (lons <= max_lon)
+    return int(((lats >= min_lat) & (lats <= max_lat) & in_lon).sum())
+
+
+def test_within_bbox_wrapped_box_inside_one_cell():
+    # Both longitude edges fall in the same 1-degree cell, but the box wraps
+    # around the antimeridian and covers almost every longitude
+    rng = np.random.default_rng(0)
+    points = pd.DataFrame({
+        'Latitude': rng.uniform(-90, 90, 20000),
+        'Longitude': rng.uniform(-180, 180, 20000),
+    })
+    index = SpatialIndex(points)
+    box = (-10.0, 10.5, 10.0, 10.25)
+    assert len(index.within_bbox(*box)) == _brute_force_bbox(points, *box)
+
+
+def test_within_bbox_plain_box_inside_one_cell():
+    points = pd.DataFrame({'Latitude': [0.5, 0.5, 0.5], 'Longitude': [10.1, 10.3, 10.7]})
+    index = SpatialIndex(points)
+    result = index.within_bbox(0.0, 10.25, 1.0, 10.5)
+    assert result['Longitude'].tolist() == [10.3]
@@ -0,0 +1,105 @@
+"""Streaming visualization requests for Ancient Greek Colonization Explorer
+
+Without tool calling, the model asks for a chart by writing a fenced
+```` ```json ```` block with a ``"visualization"`` key. ``VisualizationStream``
+watches the streamed tokens for such a block, so the chart can be built as
+soon as the block closes instead of after the last token, and keeps the raw
+JSON out of the text shown to the user:
+
+    stream = VisualizationStream(on_request=start_chart)
+    async for token in tokens:
+        await show(stream.feed(token))
+    await show(stream.close())
+
+Text that might be the start of a fence is held back until the next token
+settles it; other fenced JSON (not a visualization request) is shown as
+written.
+"""
+
+import json
+from typing import Any, Callable, Dict, List, Optional
+
+
+FENCE_OPEN = "```json"
+FENCE_CLOSE = "```"
+
+
+def _held_back(text: str) -> int:
+    #Length of the longest suffix of text that could begin FENCE_OPEN
+    for size in range(min(len(text), len(FENCE_OPEN) - 1), 0, -1):
+        if FENCE_OPEN.startswith(text[-size:]):
+            return size
+    return 0
+
+
+def parse_request(block: str) -> Optional[Dict[str, Any]]:
+    """The visualization request in a fenced JSON block's body, if it is one."""
+    try:
+        request = json.loads(block.strip())
+    except ValueError:
+        return None
+    if isinstance(request, dict) and "visualization" in request:
+        return request
+    return None
+
+
+class VisualizationStream:
+    """Incremental parser separating visualization requests from displayed text.
+
+    ``on_request`` is called with each request as soon as its block has
+    streamed; every request found is also kept in ``requests``.
+    """
+
+    def __init__(self, on_request: Optional[Callable[[Dict[str, Any]], Any]] = None):
+        self.on_request = on_request
+        self.requests: List[Dict[str, Any]] = []
+        self._pending = ""
+        self._in_block = False
+
+    def feed(self, token: str) -> str:
+        """Add streamed text; return the part that can be displayed now."""
+        self._pending += token
+        shown = []
+        while True:
+            if self._in_block:
+                end = self._pending.find(FENCE_CLOSE)
+                if end < 0:
+                    break
+                block, self._pending = self._pending[:end], self._pending[end + len(FENCE_CLOSE):]
+                self._in_block = False
+                if not self._dispatch(block):
+                    shown.append(FENCE_OPEN + block + FENCE_CLOSE)
+            else:
+                start = self._pending.find(FENCE_OPEN)
+                if start < 0:
+                    keep = _held_back(self._pending)
+                    cut = len(self._pending) - keep
+                    shown.append(self._pending[:cut])
+                    self._pending = self._pending[cut:]
+                    break
+                shown.append(self._pending[:start])
+                self._pending = self._pending[start + len(FENCE_OPEN):]
+                self._in_block = True
+        return "".join(shown)
+
+    def close(self) -> str:
+        """End of stream: return whatever is still held back.
+
+        A block left open by the end of the answer still counts as a request
+        if its body parses; otherwise it is returned as written.
+        """
+        text = self._pending
+        if self._in_block:
+            text = "" if self._dispatch(text) else FENCE_OPEN + text
+        self._pending, self._in_block = "", False
+        return text
+
+    def _dispatch(self, block: str) -> bool:
+        #Record and pass on the request in a block's body; False if it is none
+        request = parse_request(block)
+        if request is None:
+            return False
+        self.requests.append(request)
+        if self.on_request is not None:
+            self.on_request(request)
+        return True